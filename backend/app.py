@@ -2,19 +2,27 @@
 Flask API Backend - Hệ thống phân loại sinh viên
 """
 
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 import os
 import sys
+import threading
+import time
 
 # Add paths
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from dotenv import load_dotenv
-from sqlserver_sync import load_students_from_sqlserver, create_tables, test_connection, sync_all_to_sqlserver
+from storage import (STORAGE_BACKEND, COURSE_CODE_TO_NAME, iter_students_from_sqlserver, load_students_changed_since,
+                     load_students_by_ids, load_student_course_counts, get_current_watermark,
+                     get_source_fingerprint, create_tables, test_connection, sync_all_to_sqlserver,
+                     save_classifications_bulk, delete_classifications_bulk, refresh_statistics_summaries,
+                     get_pool_stats, SQL_POOL_MAX_SIZE)
+from snapshot_cache import load_snapshot, save_snapshot
 from student_classifier import StudentClassifier
 from skill_evaluator import SkillEvaluator
 from integrated_scoring_system import IntegratedScoringSystem
+from integrated_data_sources import INTEGRATED_DATA_SOURCE
 from course_definitions import COURSES, CLASSIFICATION_LEVELS
 
 # Import routes
@@ -34,9 +42,18 @@ data_store = {
     'classifications': [],
     'skill_evaluations': {},
     'integrated_system': None,
-    'integrated_results': []
+    'integrated_results': [],
+    'classifier': None,
+    'watermark': None
 }
 
+# Làm mới dữ liệu định kỳ (giây), 0 = chỉ làm mới khi gọi /api/refresh
+REFRESH_INTERVAL_SECONDS = int(os.getenv('REFRESH_INTERVAL_SECONDS', '0'))
+_refresh_lock = threading.Lock()
+
+# Tên môn (courses của sinh viên) -> mã môn (course_scores của điểm tích hợp)
+_COURSE_NAME_TO_CODE = {name: code for code, name in COURSE_CODE_TO_NAME.items()}
+
 # Register blueprints
 app.register_blueprint(students_bp, url_prefix='/api')
 app.register_blueprint(stats_bp, url_prefix='/api')
@@ -56,10 +73,13 @@ def index():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check"""
+    integrated_system = data_store.get('integrated_system')
     return jsonify({
         'status': 'ok',
-        'database': 'SQL Server',
-        'total_students': len(data_store['students'])
+        'database': 'SQLite' if STORAGE_BACKEND == 'sqlite' else 'SQL Server',
+        'total_students': len(data_store['students']),
+        'connection_pool': get_pool_stats(),
+        'integrated_cache': integrated_system.cache_stats() if integrated_system else None
     })
 
 
@@ -76,15 +96,24 @@ def get_courses():
 def sync_to_sqlserver():
     """Đồng bộ dữ liệu lên SQL Server"""
     try:
+        req_data = request.get_json(silent=True) or {}
+        try:
+            options = _parse_sync_options(req_data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
         students = data_store.get('students', [])
         classifications = data_store.get('classifications', [])
         skill_evaluations = data_store.get('skill_evaluations', {})
         integrated_results = data_store.get('integrated_results', [])
         
-        # Sync lên SQL Server
-        success = sync_all_to_sqlserver(students, classifications)
+        # Sync lên SQL Server (mặc định ghi theo lô, chỉ ghi phần thay đổi)
+        report = sync_all_to_sqlserver(
+            students, classifications,
+            **options
+        )
         
-        if success:
+        if report['success']:
             return jsonify({
                 'success': True,
                 'message': 'Đã đồng bộ thành công lên SQL Server',
@@ -94,12 +123,14 @@ def sync_to_sqlserver():
                     'skill_evaluations': len(skill_evaluations),
                     'integrated_scores': len(integrated_results),
                     'course_scores': sum(len(s.get('courses', {})) for s in students)
-                }
+                },
+                'report': report
             })
         else:
             return jsonify({
                 'success': False,
-                'error': 'Lỗi khi đồng bộ dữ liệu'
+                'error': 'Lỗi khi đồng bộ dữ liệu',
+                'report': report
             }), 500
             
     except Exception as e:
@@ -109,6 +140,177 @@ def sync_to_sqlserver():
         }), 500
 
 
+def _parse_sync_options(req_data):
+    """
+    Tham số sync từ JSON request: bulk / delta / prune (bool), batch_size (>= 1),
+    workers (1..SQL_POOL_MAX_SIZE); không truyền = mặc định của sync_all_to_sqlserver
+    
+    Raises:
+        ValueError: Tham số sai kiểu hoặc ngoài khoảng cho phép
+    """
+    options = {}
+    for name, default in (('bulk', True), ('delta', True), ('prune', False)):
+        value = req_data.get(name, default)
+        if not isinstance(value, bool):
+            raise ValueError(f"'{name}' phải là true/false")
+        options[name] = value
+    
+    for name, upper in (('batch_size', None), ('workers', SQL_POOL_MAX_SIZE)):
+        value = req_data.get(name)
+        if value is None:
+            options[name] = None
+            continue
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError(f"'{name}' phải là số nguyên")
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{name}' phải là số nguyên")
+        if value < 1:
+            raise ValueError(f"'{name}' phải >= 1")
+        options[name] = min(value, upper) if upper else value
+    return options
+
+
+def refresh_changed_students():
+    """
+    Load các sinh viên thay đổi kể từ watermark lần trước và cập nhật data_store tại chỗ
+    (đánh giá kỹ năng + phân loại lại + điểm tích hợp chỉ cho các sinh viên đó).
+    
+    Watermark không thấy dòng bị xóa: số môn của từng sinh viên được so với database
+    (1 truy vấn GROUP BY) để bỏ sinh viên đã xóa và load lại sinh viên bị xóa môn học.
+    """
+    with _refresh_lock:
+        start = time.perf_counter()
+        old_watermark = data_store.get('watermark')
+        changed, new_watermark = load_students_changed_since(old_watermark)
+        
+        deleted_ids, stale_ids = _find_deleted_rows(changed)
+        if stale_ids:
+            changed += load_students_by_ids(stale_ids)
+        
+        if changed:
+            skill_evaluator = SkillEvaluator()
+            for student in changed:
+                evals = skill_evaluator.evaluate_all_courses(student)
+                student["skill_evaluations"] = evals
+                data_store['skill_evaluations'][student["student_id"]] = evals
+            
+            classifier = data_store.get('classifier')
+            if classifier is not None and classifier.kmeans is not None:
+                classified = classifier.predict(changed)
+            else:
+                classified = []
+            
+            _merge_by_id(data_store['students'], changed)
+            _merge_by_id(data_store['classifications'], classified)
+            
+            # Dữ liệu thay đổi -> tính lại điểm tích hợp của các sinh viên đó (kể cả sinh viên mới)
+            integrated_system = data_store.get('integrated_system')
+            if integrated_system is not None:
+                integrated = []
+                for student in changed:
+                    sid = student["student_id"]
+                    integrated_system.update_student(
+                        sid,
+                        info={'name': student.get('name', ''), 'class': student.get('class', '')},
+                        csv_data=student.get("csv_data", {}),
+                        course_scores={
+                            _COURSE_NAME_TO_CODE.get(name, name): {
+                                'student_id': sid,
+                                'course_code': _COURSE_NAME_TO_CODE.get(name, name),
+                                'score': course.get('score', 0)
+                            }
+                            for name, course in student.get("courses", {}).items()
+                        }
+                    )
+                    result = integrated_system.calculate_integrated_score(sid)
+                    if result is not None:
+                        integrated.append(result)
+                _merge_by_id(data_store['integrated_results'], integrated)
+        
+        if deleted_ids:
+            for key in ('students', 'classifications', 'integrated_results'):
+                data_store[key] = [r for r in data_store[key] if r.get('student_id') not in deleted_ids]
+            for sid in deleted_ids:
+                data_store['skill_evaluations'].pop(sid, None)
+                if data_store.get('integrated_system') is not None:
+                    data_store['integrated_system'].remove_student(sid)
+        
+        # Các route thống kê / xếp hạng đọc database: lưu kết quả phân loại mới rồi tính lại bảng tổng hợp
+        if changed or deleted_ids:
+            if changed and classified:
+                save_classifications_bulk(classified)
+            if deleted_ids:
+                delete_classifications_bulk(list(deleted_ids))
+            refresh_statistics_summaries()
+        
+        data_store['watermark'] = new_watermark
+        return {
+            'changed': len(changed),
+            'deleted': len(deleted_ids),
+            'watermark': new_watermark,
+            'previous_watermark': old_watermark,
+            'elapsed_seconds': round(time.perf_counter() - start, 3)
+        }
+
+
+def _find_deleted_rows(changed):
+    """
+    So số môn của các sinh viên trong data_store với database
+    
+    Returns:
+        (set student_id đã bị xóa khỏi database,
+         list student_id không nằm trong changed nhưng số môn khác - có dòng course_scores bị xóa)
+    """
+    counts = load_student_course_counts()
+    if counts is None:
+        return set(), []
+    
+    changed_ids = {s.get('student_id') for s in changed}
+    deleted, stale = set(), []
+    for student in data_store['students']:
+        sid = student.get('student_id')
+        if sid not in counts:
+            deleted.add(sid)
+        elif sid not in changed_ids and counts[sid] != len(student.get('courses', {})):
+            stale.append(sid)
+    return deleted, stale
+
+
+def _merge_by_id(records, updates):
+    """Thay thế tại chỗ các bản ghi cùng student_id, thêm mới nếu chưa có"""
+    index = {r.get('student_id'): i for i, r in enumerate(records)}
+    for update in updates:
+        i = index.get(update.get('student_id'))
+        if i is None:
+            index[update.get('student_id')] = len(records)
+            records.append(update)
+        else:
+            records[i] = update
+
+
+@app.route('/api/refresh', methods=['POST'])
+def refresh_data():
+    """Làm mới dữ liệu: chỉ load các sinh viên thay đổi kể từ lần load trước"""
+    try:
+        return jsonify({'success': True, **refresh_changed_students()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _refresh_periodically(interval):
+    """Luồng nền làm mới dữ liệu định kỳ"""
+    while True:
+        time.sleep(interval)
+        try:
+            result = refresh_changed_students()
+            if result['changed']:
+                print(f"🔄 Đã làm mới {result['changed']} sinh viên ({result['elapsed_seconds']}s)")
+        except Exception as e:
+            print(f"⚠️ Lỗi làm mới dữ liệu: {e}")
+
+
 # ============== INIT ==============
 
 def init_data():
@@ -125,28 +327,52 @@ def init_data():
     
     create_tables()
     
+    # Snapshot còn khớp dữ liệu nguồn + cấu hình phân loại (gồm bảng luật bất thường)
+    # -> memory-map, bỏ qua load + đánh giá + phân loại
+    start = time.perf_counter()
+    classifier = StudentClassifier(n_clusters=4, normalization_method='minmax')
+    config_digest = classifier.config_digest()
+    fingerprint = get_source_fingerprint()
+    snapshot = load_snapshot(fingerprint, config_digest=config_digest)
+    if snapshot is not None:
+        data_store.update(snapshot)
+        # Integrated system vẫn được dựng (cache, /api/refresh, /api/classify cần nó);
+        # kết quả trong snapshot chỉ dùng lại khi nguồn là database (nằm trong fingerprint)
+        integrated_system = IntegratedScoringSystem()
+        if INTEGRATED_DATA_SOURCE == 'storage':
+            integrated_system.seed_cache(data_store['integrated_results'])
+        else:
+            data_store['integrated_results'] = integrated_system.analyze_all_students()
+        data_store['integrated_system'] = integrated_system
+        _init_routes()
+        print(f"⚡ Đã nạp snapshot: {len(data_store['students'])} sinh viên "
+              f"({time.perf_counter() - start:.2f}s)")
+        _print_endpoints()
+        return
+    
     # Khởi tạo integrated system
     data_store['integrated_system'] = IntegratedScoringSystem()
     
-    # Load từ SQL Server
-    students = load_students_from_sqlserver()
-    
-    if not students:
-        print("⚠️ Không có dữ liệu trong SQL Server")
-        return
+    # Watermark đọc trước khi load: thay đổi xảy ra trong lúc load sẽ được lấy ở lần làm mới sau
+    watermark = get_current_watermark()
     
-    print(f"✅ Đã tải {len(students)} sinh viên từ SQL Server")
-    
-    # Đánh giá kỹ năng
+    # Load từ SQL Server (stream) + đánh giá kỹ năng ngay khi từng sinh viên được đọc xong
     skill_evaluator = SkillEvaluator()
     skill_evaluations = {}
-    for student in students:
+    students = []
+    for student in iter_students_from_sqlserver():
         evals = skill_evaluator.evaluate_all_courses(student)
         student["skill_evaluations"] = evals
         skill_evaluations[student["student_id"]] = evals
+        students.append(student)
+    
+    if not students:
+        print("⚠️ Không có dữ liệu trong SQL Server")
+        return
+    
+    print(f"✅ Đã tải {len(students)} sinh viên từ SQL Server")
     
     # Phân loại
-    classifier = StudentClassifier(n_clusters=4, normalization_method='minmax')
     classifier.fit(students)
     classified_students = classifier.predict(students)
     
@@ -158,14 +384,37 @@ def init_data():
     data_store['classifications'] = classified_students
     data_store['skill_evaluations'] = skill_evaluations
     data_store['integrated_results'] = integrated_results
+    data_store['classifier'] = classifier
+    data_store['watermark'] = watermark
+    
+    # Lưu lượt phân loại lúc khởi động + tính lại bảng tổng hợp: /api/course-statistics,
+    # /api/class-comparison, /api/top-students đọc database, không được trả kết quả của lần chạy trước
+    save_result = save_classifications_bulk(
+        classified_students, record_history=True,
+        run_info={'normalization_method': 'minmax', 'note': 'startup'}
+    )
+    if save_result['success']:
+        refresh_statistics_summaries()
+    else:
+        print("⚠️ Không lưu được kết quả phân loại, thống kê trong database có thể chưa cập nhật")
+    
+    _init_routes()
     
-    # Init routes với data store
+    print(f"✅ Đã phân loại {len(classified_students)} sinh viên")
+    save_snapshot(data_store, fingerprint, config_digest=config_digest)
+    _print_endpoints()
+
+
+def _init_routes():
+    """Init routes với data store"""
     init_students(data_store)
     init_stats(data_store)
     init_classify(data_store)
     init_ranking(data_store)
-    
-    print(f"✅ Đã phân loại {len(classified_students)} sinh viên")
+
+
+def _print_endpoints():
+    """In danh sách API endpoints"""
     print("=" * 60)
     print("🌐 API Endpoints:")
     print("  GET  /                    - Frontend")
@@ -174,6 +423,7 @@ def init_data():
     print("  GET  /api/student/<id>    - Chi tiết sinh viên")
     print("  GET  /api/statistics      - Thống kê")
     print("  POST /api/classify        - Phân loại lại")
+    print("  POST /api/refresh         - Làm mới sinh viên thay đổi")
     print("  GET  /api/courses         - Danh sách môn học")
     print("  GET  /api/top-students    - Top sinh viên xuất sắc")
     print("  GET  /api/course-statistics - Thống kê theo môn")
@@ -184,4 +434,6 @@ def init_data():
 
 if __name__ == '__main__':
     init_data()
+    if REFRESH_INTERVAL_SECONDS > 0:
+        threading.Thread(target=_refresh_periodically, args=(REFRESH_INTERVAL_SECONDS,), daemon=True).start()
     app.run(debug=False, host='0.0.0.0', port=5000)
@@ -8,7 +8,9 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 
-from sqlserver_sync import load_students_from_sqlserver, save_classification
+from storage import (iter_students_from_sqlserver, get_current_watermark, get_source_fingerprint,
+                     save_classifications_bulk, refresh_statistics_summaries)
+from snapshot_cache import save_snapshot
 from student_classifier import StudentClassifier
 from skill_evaluator import SkillEvaluator
 
@@ -31,39 +33,52 @@ def classify_students():
         if normalization_method not in ['minmax', 'zscore', 'robust']:
             normalization_method = 'minmax'
         
-        # Load từ SQL Server
-        students = load_students_from_sqlserver()
+        watermark = get_current_watermark()
+        fingerprint = get_source_fingerprint()
         
-        if not students:
-            return jsonify({'success': False, 'error': 'Không có dữ liệu trong SQL Server'}), 500
-        
-        # Đánh giá kỹ năng
+        # Load từ SQL Server (stream) + đánh giá kỹ năng ngay khi từng sinh viên được đọc xong
         skill_evaluator = SkillEvaluator()
         skill_evaluations = {}
+        students = []
         
-        for student in students:
+        for student in iter_students_from_sqlserver():
             evals = skill_evaluator.evaluate_all_courses(student)
             student["skill_evaluations"] = evals
             skill_evaluations[student["student_id"]] = evals
+            students.append(student)
+        
+        if not students:
+            return jsonify({'success': False, 'error': 'Không có dữ liệu trong SQL Server'}), 500
         
         # Phân loại
         classifier = StudentClassifier(n_clusters=4, normalization_method=normalization_method)
         classifier.fit(students)
         classified_students = classifier.predict(students)
         
-        # Tính điểm tích hợp
+        # Tính điểm tích hợp (không load được integrated system -> giữ kết quả cũ)
         integrated_system = data_store.get('integrated_system')
-        integrated_results = integrated_system.analyze_all_students() if integrated_system else []
+        if integrated_system:
+            integrated_results = integrated_system.analyze_all_students()
+        else:
+            integrated_results = list(data_store.get('integrated_results', []))
         
         # Cập nhật data store
         data_store['students'] = students
         data_store['classifications'] = classified_students
         data_store['skill_evaluations'] = skill_evaluations
         data_store['integrated_results'] = integrated_results
+        data_store['classifier'] = classifier
+        data_store['watermark'] = watermark
         
-        # Lưu vào SQL Server
-        for student in classified_students:
-            save_classification(student)
+        # Lưu vào SQL Server (1 giao dịch cho cả lượt phân loại, ghi thêm 1 version lịch sử)
+        save_result = save_classifications_bulk(
+            classified_students, record_history=True,
+            run_info={'normalization_method': normalization_method}
+        )
+        if save_result['success']:
+            # Bảng thống kê tổng hợp (theo môn / theo lớp) cập nhật theo lượt phân loại mới
+            refresh_statistics_summaries()
+        save_snapshot(data_store, fingerprint, config_digest=classifier.config_digest())
         
         # Thống kê
         level_counts = {"Xuat sac": 0, "Kha": 0, "Trung binh": 0, "Yeu": 0}
@@ -83,7 +98,8 @@ def classify_students():
                 'total': len(classified_students),
                 'level_counts': level_counts,
                 'anomaly_count': anomaly_count
-            }
+            },
+            'saved': save_result
         })
     
     except Exception as e:
@@ -3,6 +3,14 @@ API Routes - Ranking & Statistics by Course
 """
 
 from flask import Blueprint, jsonify, request
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from storage import (COURSE_CODE_TO_NAME, get_course_statistics as query_course_statistics,
+                     get_class_statistics as query_class_statistics,
+                     get_top_students as query_top_students)
 
 ranking_bp = Blueprint('ranking', __name__)
 
@@ -39,6 +47,41 @@ def get_best_skills(student_id, skill_evaluations, courses):
     return best_skills, course_scores
 
 
+def _top_students_from_rankings(rankings, classifications, skill_evaluations):
+    """Dựng danh sách top sinh viên từ các dòng của bảng xếp hạng student_rankings"""
+    wanted = {row['student_id'] for row in rankings}
+    courses_by_id = {s.get('student_id'): s.get('courses', {})
+                     for s in classifications if s.get('student_id') in wanted}
+    
+    top_students = []
+    for row in rankings:
+        best_skills, course_scores = get_best_skills(
+            row['student_id'], skill_evaluations, courses_by_id.get(row['student_id'], {})
+        )
+        top_students.append({
+            'student_id': row['student_id'],
+            'name': row['name'],
+            'class': row['class_name'] or 'N/A',
+            'avg_score': round(row['avg_score'], 2),
+            'ranking_score': round(row['ranking_score'], 1),
+            'score_points': round(row['score_points'], 1),
+            'attendance': round(row['attendance'], 1),
+            'attendance_points': round(row['attendance_points'], 1),
+            'late_submissions': row['late_submissions'],
+            'ontime_points': round(row['ontime_points'], 1),
+            'total_time_hours': round(row['total_time_hours'], 1),
+            'time_points': int(row['time_points']),
+            'behavior_score': round(row['behavior_score'], 1),
+            'final_level': row['final_level'],
+            'anomaly_detected': bool(row['anomaly_detected']),
+            'rank': row['rank_overall'],
+            'rank_in_class': row['rank_in_class'],
+            'best_skills': best_skills,
+            'course_scores': course_scores
+        })
+    return top_students
+
+
 @ranking_bp.route('/top-students', methods=['GET'])
 def get_top_students():
     """Lấy top sinh viên xuất sắc nhất dựa trên điểm số + hành vi"""
@@ -47,9 +90,23 @@ def get_top_students():
     class_filter = request.args.get('class', '')  # Lọc theo lớp
     
     classifications = data_store.get('classifications', [])
-    integrated_dict = {r['student_id']: r for r in data_store.get('integrated_results', [])}
     skill_evaluations = data_store.get('skill_evaluations', {})
     
+    # Ưu tiên bảng xếp hạng tính sẵn trong database (cập nhật sau mỗi lượt phân loại)
+    rankings = query_top_students(limit, class_name=class_filter or None, course_name=course or None)
+    if rankings:
+        top_students = _top_students_from_rankings(rankings, classifications, skill_evaluations)
+        return jsonify({
+            'top_students': top_students,
+            'total': len(top_students),
+            'filter': {
+                'course': course,
+                'class': class_filter,
+                'limit': limit
+            },
+            'source': 'database'
+        })
+    
     # Tính điểm tổng hợp cho mỗi sinh viên
     students_with_scores = []
     
@@ -162,23 +219,24 @@ def get_top_students():
 
 
 
-@ranking_bp.route('/course-statistics', methods=['GET'])
-def get_course_statistics():
-    """Thống kê số lượng sinh viên theo từng môn và mức điểm"""
-    classifications = data_store.get('classifications', [])
-    
-    
-    # Định nghĩa các môn học
-    course_names = [
-        'Nhập Môn Lập Trình',
-        'Kĩ Thuật Lập Trình',
-        'Cấu trúc Dữ Liệu và Giải Thuật',
-        'Lập Trình Hướng Đối Tượng'
-    ]
-    
-    # Khởi tạo thống kê
+# Định nghĩa các môn học
+COURSE_NAMES = [
+    'Nhập Môn Lập Trình',
+    'Kĩ Thuật Lập Trình',
+    'Cấu trúc Dữ Liệu và Giải Thuật',
+    'Lập Trình Hướng Đối Tượng'
+]
+
+
+def _use_live_aggregates():
+    """?live=1: tính thống kê trực tiếp bằng GROUP BY thay vì đọc bảng tổng hợp"""
+    return request.args.get('live', '0').lower() in ('1', 'true')
+
+
+def _empty_course_stats():
+    """Khởi tạo thống kê rỗng cho các môn học"""
     stats = {}
-    for course in course_names:
+    for course in COURSE_NAMES:
         stats[course] = {
             'total_students': 0,
             'avg_score': 0,
@@ -194,6 +252,61 @@ def get_course_statistics():
                 'total_time': 0
             }
         }
+    return stats
+
+
+def _course_statistics_from_aggregates(aggregates):
+    """Dựng thống kê theo môn từ kết quả GROUP BY (nhóm theo mã môn hoặc tên môn được gộp lại)"""
+    stats = _empty_course_stats()
+    score_sums = {}
+    
+    for row in aggregates:
+        course_name = COURSE_CODE_TO_NAME.get(row['course_key'], row['course_key'])
+        if course_name not in stats:
+            continue
+        
+        course_stats = stats[course_name]
+        course_stats['total_students'] += row['total_students']
+        course_stats['time_stats']['total_time'] += row['total_time'] or 0
+        score_sums[course_name] = score_sums.get(course_name, 0) + (row['score_sum'] or 0)
+        course_stats['min_score'] = min(course_stats.get('min_score', row['min_score']), row['min_score'])
+        course_stats['max_score'] = max(course_stats.get('max_score', row['max_score']), row['max_score'])
+        
+        levels = course_stats['levels']
+        levels['Xuất sắc (≥8.5)'] += row['excellent']
+        levels['Khá (7.0-8.4)'] += row['good']
+        levels['Trung bình (5.0-6.9)'] += row['average']
+        levels['Yếu (<5.0)'] += row['weak']
+    
+    for course_name, course_stats in stats.items():
+        total = course_stats['total_students']
+        del course_stats['scores']
+        if total > 0:
+            course_stats['avg_score'] = round(score_sums[course_name] / total, 2)
+            course_stats['min_score'] = round(course_stats['min_score'], 2)
+            course_stats['max_score'] = round(course_stats['max_score'], 2)
+            course_stats['time_stats']['avg_time_minutes'] = round(
+                course_stats['time_stats']['total_time'] / total, 1
+            )
+    
+    return stats
+
+
+@ranking_bp.route('/course-statistics', methods=['GET'])
+def get_course_statistics():
+    """Thống kê số lượng sinh viên theo từng môn và mức điểm"""
+    # Ưu tiên thống kê tính sẵn trong database (GROUP BY), không duyệt từng sinh viên
+    aggregates = query_course_statistics(live=_use_live_aggregates())
+    if aggregates:
+        stats = _course_statistics_from_aggregates(aggregates)
+        return jsonify({
+            'course_statistics': stats,
+            'total_courses': len(stats),
+            'source': 'database'
+        })
+    
+    classifications = data_store.get('classifications', [])
+    stats = _empty_course_stats()
     
     # Tính toán thống kê
     for student in classifications:
@@ -305,6 +418,29 @@ def get_skill_ranking():
 @ranking_bp.route('/class-comparison', methods=['GET'])
 def get_class_comparison():
     """So sánh điểm trung bình giữa các lớp"""
+    # Ưu tiên thống kê tính sẵn trong database (GROUP BY), không duyệt từng sinh viên
+    aggregates = query_class_statistics(live=_use_live_aggregates())
+    if aggregates:
+        result = [{
+            'class': row['class_name'],
+            'total_students': row['total_students'],
+            'avg_score': round(row['score_sum'] / row['total_students'], 2),
+            'min_score': round(row['min_score'], 2),
+            'max_score': round(row['max_score'], 2),
+            'levels': {
+                'Xuat sac': row['xuat_sac'],
+                'Kha': row['kha'],
+                'Trung binh': row['trung_binh'],
+                'Yeu': row['yeu']
+            }
+        } for row in aggregates if row['total_students']]
+        result.sort(key=lambda x: x['avg_score'], reverse=True)
+        return jsonify({
+            'class_comparison': result,
+            'total_classes': len(result),
+            'source': 'database'
+        })
+    
     classifications = data_store.get('classifications', [])
     
     class_stats = {}
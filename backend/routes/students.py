@@ -68,7 +68,12 @@ def get_student_detail(student_id):
     skill_eval = data_store.get('skill_evaluations', {}).get(student_id, {})
     
     integrated_system = data_store.get('integrated_system')
-    integrated_data = integrated_system.calculate_integrated_score(student_id) if integrated_system else None
+    if integrated_system:
+        integrated_data = integrated_system.calculate_integrated_score(student_id)
+    else:
+        # Không load được integrated system: dùng kết quả tích hợp đã tính sẵn
+        integrated_data = next((r for r in data_store.get('integrated_results', [])
+                                if r.get('student_id') == student_id), None)
     
     return jsonify({
         'student': student,
@@ -0,0 +1,164 @@
+"""
+Tiện ích dùng chung cho các benchmark SQL Server
+
+Các benchmark chạy trên một database riêng (mặc định: StudentClassificationBench)
+để không đụng vào dữ liệu thật. Database được chọn qua biến môi trường
+SQL_DATABASE trước khi import sqlserver_sync.
+
+Usage:
+    from bench_common import setup_bench_database
+    sqlserver_sync = setup_bench_database("StudentClassificationBench")
+"""
+
+import os
+import sys
+import time
+import random
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+COURSE_CODES = ['NMLT', 'KTLT', 'CTDL', 'OOP']
+BASE_STUDENT_ID = 125000000
+
+BENCH_SCHEMA = [
+    """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='students' AND xtype='U')
+    CREATE TABLE students (
+        student_id INT PRIMARY KEY,
+        name NVARCHAR(100),
+        class NVARCHAR(20),
+        khoa NVARCHAR(100) DEFAULT N'Khoa Công Nghệ Thông Tin',
+        total_score FLOAT DEFAULT 0,
+        midterm_score FLOAT DEFAULT 0,
+        final_score FLOAT DEFAULT 0,
+        attendance_rate FLOAT DEFAULT 0,
+        behavior_score_100 INT DEFAULT 50,
+        late_submissions INT DEFAULT 0,
+        assignment_completion FLOAT DEFAULT 0,
+        created_at DATETIME DEFAULT GETDATE(),
+        updated_at DATETIME DEFAULT GETDATE()
+    )
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='student_csv_data' AND xtype='U')
+    CREATE TABLE student_csv_data (
+        student_id INT PRIMARY KEY,
+        total_score FLOAT DEFAULT 0,
+        midterm_score FLOAT DEFAULT 0,
+        final_score FLOAT DEFAULT 0,
+        homework_score FLOAT DEFAULT 0,
+        attendance_rate FLOAT DEFAULT 0,
+        behavior_score_100 INT DEFAULT 50,
+        late_submissions INT DEFAULT 0,
+        assignment_completion FLOAT DEFAULT 0,
+        study_hours_per_week FLOAT DEFAULT 0,
+        participation_score FLOAT DEFAULT 0
+    )
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='course_scores' AND xtype='U')
+    CREATE TABLE course_scores (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        student_id INT,
+        course_code NVARCHAR(20),
+        course_name NVARCHAR(100),
+        score FLOAT DEFAULT 0,
+        midterm_score FLOAT DEFAULT 0,
+        final_score FLOAT DEFAULT 0,
+        homework_score FLOAT DEFAULT 0,
+        time_minutes FLOAT DEFAULT 0
+    )
+    """,
+]
+
+
+def setup_bench_database(database):
+    """Chọn database benchmark, tạo database + bảng nếu chưa có, trả về module sqlserver_sync"""
+    os.environ['SQL_DATABASE'] = database
+    import sqlserver_sync
+
+    if not sqlserver_sync.create_database():
+        sys.exit(1)
+
+    # Tạo bảng theo schema thực tế (có course_code) trước, create_tables bổ sung phần còn lại
+    conn = sqlserver_sync.get_connection()
+    cursor = conn.cursor()
+    for ddl in BENCH_SCHEMA:
+        cursor.execute(ddl)
+    conn.commit()
+    conn.close()
+
+    sqlserver_sync.create_tables()
+    return sqlserver_sync
+
+
+def generate_rows(n_students, seed=42):
+    """Sinh dữ liệu giả lập dạng dòng cho 3 bảng students, student_csv_data, course_scores"""
+    from sqlserver_sync import COURSE_CODE_TO_NAME
+
+    rng = random.Random(seed)
+    students, csv_rows, course_rows = [], [], []
+
+    for i in range(n_students):
+        student_id = BASE_STUDENT_ID + i
+        base = rng.uniform(3.0, 10.0)
+        class_name = f'22CT{111 + (i % 5)}'
+        students.append((student_id, f'Sinh viên {i + 1}', class_name, 'Khoa Công Nghệ Thông Tin'))
+        csv_rows.append((
+            student_id, round(base, 2), round(base + rng.uniform(-1, 1), 2),
+            round(base + rng.uniform(-1, 1), 2), round(base + rng.uniform(-1, 1), 2),
+            round(rng.uniform(0.3, 1.0), 2), rng.randint(30, 100), rng.randint(0, 20),
+            round(rng.uniform(0.5, 1.0), 2), round(rng.uniform(5, 30), 1), rng.randint(0, 100)
+        ))
+        for code in COURSE_CODES:
+            score = max(0, min(10, base + rng.uniform(-1, 1)))
+            course_rows.append((
+                student_id, code, COURSE_CODE_TO_NAME[code], round(score, 2),
+                round(max(0, min(10, score + rng.uniform(-1.5, 1.5))), 2),
+                round(max(0, min(10, score + rng.uniform(-1, 1))), 2),
+                round(max(0, min(10, score + rng.uniform(-0.5, 0.5))), 2),
+                round(rng.uniform(30, 180), 1)
+            ))
+
+    return students, csv_rows, course_rows
+
+
+def seed_students(sqlserver_sync, n_students, batch_size=5000):
+    """Xóa dữ liệu cũ và nạp n_students sinh viên giả lập (fast_executemany)"""
+    students, csv_rows, course_rows = generate_rows(n_students)
+
+    conn = sqlserver_sync.get_connection()
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+
+    for table in ('classifications', 'skill_evaluations', 'course_scores', 'student_csv_data', 'students'):
+        cursor.execute(f"DELETE FROM {table}")
+
+    statements = [
+        ("INSERT INTO students (student_id, name, class, khoa) VALUES (?, ?, ?, ?)", students),
+        ("""INSERT INTO student_csv_data (student_id, total_score, midterm_score, final_score,
+                homework_score, attendance_rate, behavior_score_100, late_submissions,
+                assignment_completion, study_hours_per_week, participation_score)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", csv_rows),
+        ("""INSERT INTO course_scores (student_id, course_code, course_name, score, midterm_score,
+                final_score, homework_score, time_minutes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", course_rows),
+    ]
+    for sql, rows in statements:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+
+    conn.commit()
+    conn.close()
+
+
+def timed(func, *args, repeat=3, **kwargs):
+    """Chạy func nhiều lần, trả về (thời gian tốt nhất, kết quả lần cuối)"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
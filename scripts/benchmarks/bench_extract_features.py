@@ -0,0 +1,151 @@
+"""bench_extract_features.py
+
+Usage:
+    python scripts/benchmarks/bench_extract_features.py
+    python scripts/benchmarks/bench_extract_features.py --students 10000,1000000 --chunk-size 100000
+
+What it does:
+- Sinh sinh viên giả lập (dict như khi load từ SQL Server, 1-4 môn, đôi khi thiếu csv_data)
+- So sánh 3 cách tính ma trận 12 features:
+  vòng lặp Python cũ | students_to_feature_columns + features_from_columns | chỉ features_from_columns
+- Kiểm tra kết quả giống hệt vòng lặp cũ (np.array_equal) và in tốc độ tăng
+
+Note: Với số sinh viên lớn, dữ liệu được sinh và đo theo từng chunk (--chunk-size)
+      để không giữ 1 triệu dict trong bộ nhớ; thời gian là tổng của các chunk.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from student_classifier import students_to_feature_columns, features_from_columns
+
+COURSES = ["Nhập Môn Lập Trình", "Kĩ Thuật Lập Trình",
+           "Cấu trúc Dữ Liệu và Giải Thuật", "Lập Trình Hướng Đối Tượng"]
+
+
+def extract_features_loop(students):
+    """Vòng lặp Python của StudentClassifier.extract_features trước khi tính theo mảng (để so sánh)"""
+    features = []
+    for student in students:
+        csv_data = student.get("csv_data", {})
+        courses = student.get("courses", {})
+
+        course_scores = []
+        course_midterms = []
+        course_finals = []
+        course_homeworks = []
+
+        for course_data in courses.values():
+            if isinstance(course_data, dict):
+                course_scores.append(float(course_data.get("score", 0)))
+                course_midterms.append(float(course_data.get("midterm_score", 0)))
+                course_finals.append(float(course_data.get("final_score", 0)))
+                course_homeworks.append(float(course_data.get("homework_score", 0)))
+
+        total_score = sum(course_scores) / len(course_scores) if course_scores else float(csv_data.get("total_score", 0))
+        midterm = sum(course_midterms) / len(course_midterms) if course_midterms else float(csv_data.get("midterm_score", 0))
+        final = sum(course_finals) / len(course_finals) if course_finals else float(csv_data.get("final_score", 0))
+        homework = sum(course_homeworks) / len(course_homeworks) if course_homeworks else 0
+
+        attendance = float(csv_data.get("attendance_rate", 0))
+        behavior = float(csv_data.get("behavior_score_100", 0)) / 100
+        late_submissions = float(csv_data.get("late_submissions", 0))
+        assignment = float(csv_data.get("assignment_completion", 0))
+
+        total_time = sum(float(c.get("time_minutes", 0)) for c in courses.values() if isinstance(c, dict))
+        avg_time = total_time / len(courses) if courses else 0
+
+        punctuality = max(0, 1.0 - (late_submissions / 10.0))
+
+        anomaly_score = 0
+        if total_score >= 9.5 and avg_time < 30: anomaly_score = 1.0
+        elif total_score >= 9.0 and avg_time < 60: anomaly_score = 0.6
+        elif total_score >= 8.5 and avg_time < 90: anomaly_score = 0.3
+
+        features.append([
+            total_score / 10.0, midterm / 10.0, final / 10.0, homework / 10.0,
+            behavior, attendance, punctuality, assignment,
+            min(avg_time / 600, 1.0), 1.0 - anomaly_score, min(late_submissions / 10, 1.0),
+            1.0 - (np.std(course_scores) / 5.0 if len(course_scores) > 1 else 0)
+        ])
+    return np.array(features)
+
+
+def generate_students(n, rng, start_id=0):
+    """n sinh viên giả lập (điểm làm tròn 2 chữ số, 0-4 môn, ~5% không có csv_data)"""
+    students = []
+    for i in range(n):
+        csv_data = {} if rng.random() < 0.05 else {
+            "total_score": round(rng.uniform(0, 10), 2),
+            "midterm_score": round(rng.uniform(0, 10), 2),
+            "final_score": round(rng.uniform(0, 10), 2),
+            "attendance_rate": round(rng.uniform(0.5, 1), 2),
+            "behavior_score_100": rng.randint(30, 100),
+            "late_submissions": rng.randint(0, 15),
+            "assignment_completion": round(rng.uniform(0.3, 1), 2),
+        }
+        courses = {
+            name: {
+                "score": round(rng.uniform(0, 10), 2),
+                "midterm_score": round(rng.uniform(0, 10), 2),
+                "final_score": round(rng.uniform(0, 10), 2),
+                "homework_score": round(rng.uniform(0, 10), 2),
+                "time_minutes": rng.choice([round(rng.uniform(5, 120), 1), rng.randint(60, 900)]),
+            }
+            for name in rng.sample(COURSES, rng.randint(0, 4))
+        }
+        students.append({"student_id": start_id + i, "csv_data": csv_data, "courses": courses})
+    return students
+
+
+def bench(n_students, chunk_size, seed):
+    """Đo 3 cách tính trên n_students sinh viên (theo chunk), trả về tổng thời gian mỗi cách"""
+    rng = random.Random(seed)
+    timings = {"loop": 0.0, "columns": 0.0, "vectorized": 0.0}
+    for start in range(0, n_students, chunk_size):
+        students = generate_students(min(chunk_size, n_students - start), rng, start)
+
+        t = time.perf_counter()
+        expected = extract_features_loop(students)
+        timings["loop"] += time.perf_counter() - t
+
+        t = time.perf_counter()
+        columns = students_to_feature_columns(students)
+        timings["columns"] += time.perf_counter() - t
+
+        t = time.perf_counter()
+        features = features_from_columns(columns)
+        timings["vectorized"] += time.perf_counter() - t
+
+        if not np.array_equal(features, expected):
+            diff = np.argwhere(features != expected)[0]
+            raise AssertionError(f"Kết quả khác vòng lặp cũ tại sinh viên {start + diff[0]}, feature {diff[1] + 1}")
+    return timings
+
+
+def main(sizes, chunk_size, seed):
+    print(f"{'Sinh viên':>10} | {'Vòng lặp':>9} | {'Dựng cột':>9} | {'Mảng':>8} | {'Tăng tốc':>9} | {'Chỉ mảng':>9}")
+    for n in sizes:
+        timings = bench(n, chunk_size, seed)
+        total = timings["columns"] + timings["vectorized"]
+        print(f"{n:>10,} | {timings['loop']:>8.2f}s | {timings['columns']:>8.2f}s | "
+              f"{timings['vectorized']:>7.3f}s | {timings['loop'] / total:>8.1f}x | "
+              f"{timings['loop'] / timings['vectorized']:>8.1f}x")
+    print("✅ Kết quả giống hệt vòng lặp cũ ở mọi kích thước")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", default="10000,1000000",
+                        help="Các số sinh viên cần đo, cách nhau bằng dấu phẩy")
+    parser.add_argument("--chunk-size", type=int, default=100000,
+                        help="Số sinh viên sinh + đo mỗi lần")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    main([int(n) for n in args.students.split(",")], args.chunk_size, args.seed)
@@ -0,0 +1,136 @@
+"""bench_indexes.py
+
+Usage:
+    python scripts/benchmarks/bench_indexes.py --students 100000 --lookups 2000
+
+What it does:
+- Nạp N sinh viên giả lập (4 môn, 1 kết quả phân loại, 12 đánh giá kỹ năng/sinh viên)
+- Gỡ các index do migration tạo ra, đo thời gian các truy vấn tra cứu theo sinh viên
+- Chạy lại apply_migrations() rồi đo lại cùng các truy vấn để so sánh trước/sau
+
+Các truy vấn đo (mỗi truy vấn lặp --lookups lần với student_id ngẫu nhiên):
+- course_scores WHERE student_id = ?
+- MERGE 1 môn học (giống save_student)
+- classifications WHERE student_id = ?
+- skill_evaluations WHERE student_id = ? AND course_name = ?
+
+Note: Cần SQL Server local + pyodbc. Database benchmark sẽ bị xóa dữ liệu.
+"""
+import argparse
+import random
+import time
+
+from bench_common import setup_bench_database, seed_students, BASE_STUDENT_ID
+
+# Index do MIGRATIONS (version >= 2) tạo ra
+MIGRATION_INDEXES = [
+    ("course_scores", "UX_course_scores_student_course"),
+    ("classifications", "UX_classifications_student"),
+    ("skill_evaluations", "IX_skill_evaluations_student_course"),
+]
+
+SKILLS = ["Tư duy logic", "Kỹ năng code", "Giải quyết vấn đề"]
+
+QUERIES = [
+    ("course_scores theo student_id", """
+        SELECT course_name, score, midterm_score, final_score, homework_score, time_minutes
+        FROM course_scores WHERE student_id = ?
+    """, lambda sid: (sid,)),
+    ("MERGE course_scores (save_student)", """
+        MERGE course_scores AS target
+        USING (SELECT ? AS student_id, ? AS course_name) AS source
+        ON target.student_id = source.student_id AND target.course_name = source.course_name
+        WHEN MATCHED THEN UPDATE SET score = target.score
+        WHEN NOT MATCHED THEN INSERT (student_id, course_name) VALUES (source.student_id, source.course_name);
+    """, lambda sid: (sid, "Cấu trúc dữ liệu và giải thuật")),
+    ("classifications theo student_id", """
+        SELECT final_level, anomaly_detected, anomaly_reason
+        FROM classifications WHERE student_id = ?
+    """, lambda sid: (sid,)),
+    ("skill_evaluations theo (student_id, môn)", """
+        SELECT skill_name, score, level, passed
+        FROM skill_evaluations WHERE student_id = ? AND course_name = ?
+    """, lambda sid: (sid, "Nhập môn lập trình")),
+]
+
+
+def seed_results(sqlserver_sync):
+    """Sinh classifications + skill_evaluations từ dữ liệu đã nạp (set-based)"""
+    conn = sqlserver_sync.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO classifications (student_id, kmeans_prediction, knn_prediction, final_level)
+        SELECT student_id, N'Khá', N'Khá', N'Khá' FROM students
+    """)
+    skills = " UNION ALL ".join(f"SELECT N'{skill}'" for skill in SKILLS)
+    cursor.execute(f"""
+        INSERT INTO skill_evaluations (student_id, course_name, skill_name, score, level, passed)
+        SELECT cs.student_id, cs.course_name, sk.skill_name, cs.score * 10, N'Khá', 1
+        FROM course_scores cs CROSS JOIN ({skills}) AS sk(skill_name)
+    """)
+    conn.commit()
+    conn.close()
+
+
+def drop_migration_indexes(sqlserver_sync):
+    """Gỡ index của migration và đánh dấu chưa áp dụng để đo trạng thái 'trước'"""
+    conn = sqlserver_sync.get_connection()
+    cursor = conn.cursor()
+    for table, index in MIGRATION_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index} ON {table}")
+    cursor.execute("DELETE FROM schema_migrations WHERE version >= 2")
+    conn.commit()
+    conn.close()
+
+
+def time_queries(sqlserver_sync, student_ids):
+    """Thời gian trung bình (ms) mỗi truy vấn trên danh sách student_id"""
+    conn = sqlserver_sync.get_connection()
+    cursor = conn.cursor()
+    timings = {}
+    for label, sql, params in QUERIES:
+        start = time.perf_counter()
+        for sid in student_ids:
+            cursor.execute(sql, *params(sid))
+            if cursor.description:
+                cursor.fetchall()
+        timings[label] = (time.perf_counter() - start) * 1000 / len(student_ids)
+    # Không giữ lại thay đổi của MERGE
+    conn.rollback()
+    conn.close()
+    return timings
+
+
+def main(n_students, lookups, database):
+    sqlserver_sync = setup_bench_database(database)
+
+    print(f"\n📦 Nạp {n_students} sinh viên...")
+    seed_students(sqlserver_sync, n_students)
+    drop_migration_indexes(sqlserver_sync)
+    seed_results(sqlserver_sync)
+
+    rng = random.Random(7)
+    student_ids = [BASE_STUDENT_ID + rng.randrange(n_students) for _ in range(lookups)]
+
+    before = time_queries(sqlserver_sync, student_ids)
+    print("\n🔧 Áp dụng migration...")
+    sqlserver_sync.apply_migrations()
+    after = time_queries(sqlserver_sync, student_ids)
+
+    print(f"\n{'truy vấn':<42} | {'trước (ms)':>10} | {'sau (ms)':>9} | {'speedup':>8}")
+    print("-" * 78)
+    for label, _, _ in QUERIES:
+        print(f"{label:<42} | {before[label]:>10.3f} | {after[label]:>9.3f} | "
+              f"{before[label] / after[label]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=100000,
+                        help="Số sinh viên giả lập")
+    parser.add_argument("--lookups", type=int, default=2000,
+                        help="Số lần tra cứu mỗi truy vấn (student_id ngẫu nhiên)")
+    parser.add_argument("--database", default="StudentClassificationBench",
+                        help="Database dùng cho benchmark (sẽ bị xóa dữ liệu)")
+    args = parser.parse_args()
+    main(args.students, args.lookups, args.database)
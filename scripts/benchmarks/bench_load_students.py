@@ -0,0 +1,68 @@
+"""bench_load_students.py
+
+Usage:
+    python scripts/benchmarks/bench_load_students.py --sizes 300,10000,100000
+
+What it does:
+- Nạp N sinh viên giả lập (4 môn/sinh viên) vào database benchmark
+- Đo thời gian load_students_from_sqlserver (2 truy vấn set-based)
+- Đo thời gian cách cũ (1 truy vấn course_scores cho mỗi sinh viên) để so sánh
+  (bỏ qua cách cũ khi N lớn hơn --legacy-max vì quá chậm)
+
+Note: Cần SQL Server local + pyodbc. Database benchmark sẽ bị xóa dữ liệu.
+"""
+import argparse
+
+from bench_common import setup_bench_database, seed_students, timed
+
+
+def load_students_per_row(sqlserver_sync):
+    """Cách load cũ: N+1 truy vấn (giữ lại chỉ để so sánh)"""
+    conn = sqlserver_sync.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(sqlserver_sync.STUDENTS_QUERY)
+    students = [sqlserver_sync._student_from_row(row) for row in cursor.fetchall()]
+    for student in students:
+        cursor.execute("""
+            SELECT course_code, score, midterm_score, final_score,
+                   homework_score, time_minutes
+            FROM course_scores
+            WHERE student_id = ?
+        """, student["student_id"])
+        for row in cursor.fetchall():
+            course_name, course_data = sqlserver_sync._course_from_row(row)
+            student["courses"][course_name] = course_data
+    conn.close()
+    return students
+
+
+def main(sizes, database, legacy_max, repeat):
+    sqlserver_sync = setup_bench_database(database)
+
+    print(f"\n{'N':>8} | {'set-based (s)':>14} | {'N+1 (s)':>10} | {'speedup':>8}")
+    print("-" * 50)
+    for n in sizes:
+        seed_students(sqlserver_sync, n)
+
+        bulk_time, students = timed(sqlserver_sync.load_students_from_sqlserver, repeat=repeat)
+        assert len(students) == n, f"Load được {len(students)}/{n} sinh viên"
+
+        if n <= legacy_max:
+            legacy_time, _ = timed(load_students_per_row, sqlserver_sync, repeat=1)
+            print(f"{n:>8} | {bulk_time:>14.3f} | {legacy_time:>10.3f} | {legacy_time / bulk_time:>7.1f}x")
+        else:
+            print(f"{n:>8} | {bulk_time:>14.3f} | {'-':>10} | {'-':>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="300,10000,100000",
+                        help="Danh sách số sinh viên, phân cách bằng dấu phẩy")
+    parser.add_argument("--database", default="StudentClassificationBench",
+                        help="Database dùng cho benchmark (sẽ bị xóa dữ liệu)")
+    parser.add_argument("--legacy-max", type=int, default=10000,
+                        help="Chỉ đo cách load cũ khi N <= giá trị này")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Số lần lặp, lấy thời gian tốt nhất")
+    args = parser.parse_args()
+    main([int(x) for x in args.sizes.split(",")], args.database, args.legacy_max, args.repeat)
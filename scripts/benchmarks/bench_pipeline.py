@@ -0,0 +1,110 @@
+"""bench_pipeline.py
+
+Usage:
+    STORAGE_BACKEND=sqlite python scripts/benchmarks/bench_pipeline.py --students 10000
+
+What it does:
+- Sinh N sinh viên giả lập (StudentDataGenerator.generate_realistic_students)
+- Đo thời gian từng bước của pipeline qua storage backend đang chọn:
+  import (students + student_csv_data + course_scores, như import CSV) -> load (stream) ->
+  đánh giá kỹ năng -> fit + predict -> đồng bộ kết quả -> đồng bộ lại (delta, không có thay đổi)
+- Kiểm tra csv_data load về khớp dữ liệu sinh ra và lần đồng bộ lại bỏ qua toàn bộ sinh viên
+
+Note: Backend chọn bằng STORAGE_BACKEND (sqlserver | sqlite). Với sqlite, file database
+      mặc định là data/bench_pipeline.db (đổi bằng SQLITE_PATH) và bị xóa trước khi chạy.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'bench_pipeline.db')
+
+
+def step(label, timings, func, *args, **kwargs):
+    """Chạy 1 bước, ghi lại thời gian"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings.append((label, time.perf_counter() - start))
+    return result
+
+
+def main(n_students):
+    if os.getenv("STORAGE_BACKEND", "").lower() == "sqlite" and not os.getenv("SQLITE_PATH"):
+        os.environ["SQLITE_PATH"] = DEFAULT_SQLITE_PATH
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(DEFAULT_SQLITE_PATH + suffix):
+                os.remove(DEFAULT_SQLITE_PATH + suffix)
+
+    import storage
+    from data_generator import StudentDataGenerator
+    from skill_evaluator import SkillEvaluator
+    from student_classifier import StudentClassifier
+    from storage_common import CSV_DATA_COLUMNS
+
+    print(f"🗄️ Storage backend: {storage.STORAGE_BACKEND}")
+    if not storage.test_connection() or not storage.create_tables():
+        sys.exit(1)
+
+    timings = []
+    generated = step("sinh dữ liệu", timings,
+                     StudentDataGenerator(seed=42).generate_realistic_students, n_students)
+    # Dữ liệu nguồn được ghi như import CSV (student_csv_data chỉ do import ghi, sync không ghi)
+    result = step("import sinh viên", timings, storage.import_chunk, "bench_pipeline", 0, len(generated),
+                  students=generated)
+    assert result["success"], "Import lỗi"
+
+    def load_and_evaluate():
+        evaluator = SkillEvaluator()
+        students = []
+        for student in storage.iter_students_from_sqlserver():
+            student["skill_evaluations"] = evaluator.evaluate_all_courses(student)
+            students.append(student)
+        return students
+
+    students = step("load + đánh giá kỹ năng", timings, load_and_evaluate)
+    assert len(students) == n_students, f"Load được {len(students)}/{n_students} sinh viên"
+    expected = {s["student_id"]: s["csv_data"] for s in generated}
+    mismatched = [s["student_id"] for s in students
+                  if any(s["csv_data"].get(k) != v for k, v in expected[s["student_id"]].items()
+                         if k in CSV_DATA_COLUMNS)]
+    assert not mismatched, f"csv_data load về khác dữ liệu sinh ra ({len(mismatched)} sinh viên)"
+
+    classifier = StudentClassifier(n_clusters=4, normalization_method='minmax')
+    step("fit", timings, classifier.fit, students)
+    classified = step("predict", timings, classifier.predict, students)
+    report = step("đồng bộ kết quả", timings, storage.sync_all_to_sqlserver, students, classified)
+    assert report["success"], f"Đồng bộ lỗi: {report['errors']}"
+    report = step("đồng bộ lại (delta)", timings, storage.sync_all_to_sqlserver, students, classified)
+    assert report["success"], f"Đồng bộ lỗi: {report['errors']}"
+    for entity in ("students", "classifications"):
+        assert report[entity]["skipped"] == n_students, \
+            f"Đồng bộ lại ghi lại {entity}: {report[entity]} (dữ liệu không đổi phải được bỏ qua)"
+
+    total = sum(t for _, t in timings)
+    print(f"\n{'bước':<28} | {'thời gian (s)':>13} | {'%':>6}")
+    print("-" * 54)
+    for label, elapsed in timings:
+        print(f"{label:<28} | {elapsed:>13.3f} | {elapsed / total * 100:>5.1f}%")
+    print(f"{'tổng':<28} | {total:>13.3f} |")
+    print(f"\nPool: {storage.get_pool_stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=10000,
+                        help="Số sinh viên giả lập")
+    parser.add_argument("--profile", action="store_true",
+                        help="Chạy dưới cProfile và in 25 hàm tốn thời gian nhất")
+    args = parser.parse_args()
+
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.runcall(main, args.students)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    else:
+        main(args.students)
@@ -0,0 +1,97 @@
+"""bench_sync_workers.py
+
+Usage:
+    python scripts/benchmarks/bench_sync_workers.py --students 100000 --workers 1,2,4,8
+
+What it does:
+- Sinh N sinh viên giả lập (4 môn/sinh viên) kèm kết quả phân loại
+- Đo thời gian sync_all_to_sqlserver(bulk=True, delta=False) với từng số worker
+- In thời gian, số dòng/giây và tốc độ so với 1 worker
+
+Note: Cần SQL Server local + pyodbc. Database benchmark sẽ bị xóa dữ liệu.
+      SQL_POOL_MAX_SIZE phải >= số worker lớn nhất (script tự nâng khi cần).
+"""
+import argparse
+import os
+
+from bench_common import setup_bench_database, generate_rows, timed, COURSE_CODES
+
+LEVELS = ['Yếu', 'Trung bình', 'Khá', 'Giỏi', 'Xuất sắc']
+
+
+def build_records(n_students):
+    """Chuyển dữ liệu dạng dòng của bench_common sang dict sinh viên + kết quả phân loại"""
+    from sqlserver_sync import COURSE_CODE_TO_NAME
+
+    students_rows, csv_rows, course_rows = generate_rows(n_students)
+    students = {}
+    for (student_id, name, class_name, khoa), csv in zip(students_rows, csv_rows):
+        students[student_id] = {
+            "student_id": student_id,
+            "name": name,
+            "class": class_name,
+            "Khoa": khoa,
+            "csv_data": {
+                "total_score": csv[1], "midterm_score": csv[2], "final_score": csv[3],
+                "attendance_rate": csv[5], "behavior_score_100": csv[6],
+                "late_submissions": csv[7], "assignment_completion": csv[8]
+            },
+            "courses": {}
+        }
+    for student_id, code, _, score, midterm, final, homework, minutes in course_rows:
+        students[student_id]["courses"][COURSE_CODE_TO_NAME[code]] = {
+            "score": score, "midterm_score": midterm, "final_score": final,
+            "homework_score": homework, "time_minutes": minutes
+        }
+
+    students = list(students.values())
+    classifications = [
+        {
+            "student_id": s["student_id"],
+            "kmeans_prediction": LEVELS[i % len(LEVELS)],
+            "knn_prediction": LEVELS[i % len(LEVELS)],
+            "final_level": LEVELS[i % len(LEVELS)],
+            "anomaly_detected": False,
+            "anomaly_reason": ""
+        }
+        for i, s in enumerate(students)
+    ]
+    return students, classifications
+
+
+def main(n_students, worker_counts, database, repeat):
+    max_workers = max(worker_counts)
+    if int(os.getenv("SQL_POOL_MAX_SIZE", "10")) < max_workers:
+        os.environ["SQL_POOL_MAX_SIZE"] = str(max_workers)
+    sqlserver_sync = setup_bench_database(database)
+
+    students, classifications = build_records(n_students)
+    total_rows = len(students) * (1 + len(COURSE_CODES)) + len(classifications)
+
+    print(f"\n{'workers':>8} | {'time (s)':>10} | {'rows/s':>10} | {'speedup':>8}")
+    print("-" * 46)
+    baseline = None
+    for workers in worker_counts:
+        elapsed, report = timed(
+            sqlserver_sync.sync_all_to_sqlserver, students, classifications,
+            bulk=True, delta=False, workers=workers, repeat=repeat
+        )
+        assert report["success"], f"Đồng bộ lỗi: {report['errors']}"
+        baseline = baseline or elapsed
+        print(f"{workers:>8} | {elapsed:>10.3f} | {total_rows / elapsed:>10.0f} | {baseline / elapsed:>7.1f}x")
+
+    print(f"\nPool: {sqlserver_sync.get_pool_stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=100000,
+                        help="Số sinh viên giả lập")
+    parser.add_argument("--workers", default="1,2,4,8",
+                        help="Danh sách số worker, phân cách bằng dấu phẩy")
+    parser.add_argument("--database", default="StudentClassificationBench",
+                        help="Database dùng cho benchmark (sẽ bị xóa dữ liệu)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Số lần lặp, lấy thời gian tốt nhất")
+    args = parser.parse_args()
+    main(args.students, [int(x) for x in args.workers.split(",")], args.database, args.repeat)
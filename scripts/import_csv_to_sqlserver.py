@@ -0,0 +1,175 @@
+"""import_csv_to_sqlserver.py
+
+Usage:
+    python scripts/import_csv_to_sqlserver.py --csv student_classification_supabase_ready_final.csv
+    python scripts/import_csv_to_sqlserver.py --csv students.csv --exercises exercise_details.csv --chunk-size 20000
+
+What it does:
+- Đọc CSV theo từng chunk (pandas chunksize), không nạp cả file vào bộ nhớ
+- CSV sinh viên (1 dòng/sinh viên) -> students, student_csv_data, course_scores
+  (cột môn học dạng <mã môn>_<trường>, vd: nmlt_score, ctdl_time_minutes)
+- CSV bài tập (--exercises, 1 dòng/bài tập) -> exercise_details
+- Mỗi chunk: nạp theo lô vào bảng tạm (fast_executemany) rồi MERGE, ghi checkpoint
+  trong cùng giao dịch; in số dòng/giây
+- Chạy lại sau lỗi sẽ tiếp tục từ chunk cuối cùng đã commit (--restart để import lại từ đầu)
+
+Note: Ghi qua storage backend đang chọn (STORAGE_BACKEND, mặc định SQL Server).
+      Các bảng/migration được tạo trước khi import (create_tables).
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+from storage_common import CSV_DATA_COLUMNS, EXERCISE_COLUMNS
+
+# Các trường điểm của 1 môn học (cột CSV: <mã môn>_<trường>)
+COURSE_FIELDS = ("score", "midterm_score", "final_score", "homework_score", "time_minutes")
+
+# Tên cột khác nhau giữa các bản export -> tên chuẩn
+COLUMN_ALIASES = {
+    "class_code": "class",
+    "department": "khoa",
+}
+
+
+def _normalize_columns(chunk):
+    """Tên cột chữ thường, bỏ khoảng trắng, đổi alias; giá trị thiếu (NaN) -> None"""
+    chunk.columns = [COLUMN_ALIASES.get(c.strip().lower(), c.strip().lower()) for c in chunk.columns]
+    return chunk.astype(object).where(chunk.notna(), None)
+
+
+def _course_columns(columns):
+    """{tên môn: {trường: cột CSV}} cho các môn có trong CSV"""
+    courses = {}
+    for code, course_name in storage.COURSE_CODE_TO_NAME.items():
+        fields = {field: f"{code.lower()}_{field}" for field in COURSE_FIELDS
+                  if f"{code.lower()}_{field}" in columns}
+        if fields:
+            courses[course_name] = fields
+    return courses
+
+
+def students_from_chunk(chunk):
+    """Dựng dict sinh viên (cùng dạng load_students_from_sqlserver) từ 1 chunk CSV sinh viên"""
+    columns = set(chunk.columns)
+    csv_columns = [c for c in CSV_DATA_COLUMNS if c in columns]
+    course_columns = _course_columns(columns)
+
+    students = []
+    for record in chunk.to_dict("records"):
+        if record.get("student_id") is None:
+            continue
+        student = {
+            "student_id": int(record["student_id"]),
+            "name": record.get("name"),
+            "class": record.get("class"),
+            "csv_data": {c: record[c] for c in csv_columns if record[c] is not None},
+            "courses": {
+                course_name: {field: record[column] or 0 for field, column in fields.items()}
+                for course_name, fields in course_columns.items()
+                if any(record[column] is not None for column in fields.values())
+            },
+        }
+        if record.get("khoa") is not None:
+            student["Khoa"] = record["khoa"]
+        students.append(student)
+    return students
+
+
+def exercises_from_chunk(chunk):
+    """Danh sách dict bài tập (xem EXERCISE_COLUMNS) từ 1 chunk CSV bài tập"""
+    missing = [c for c in EXERCISE_COLUMNS[:4] if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"CSV bài tập thiếu cột: {', '.join(missing)}")
+    exercises = chunk[[c for c in EXERCISE_COLUMNS if c in chunk.columns]].to_dict("records")
+    for exercise in exercises:
+        for key in ("student_id", "exercise_number"):
+            if exercise[key] is not None:
+                exercise[key] = int(exercise[key])
+    return exercises
+
+
+def import_file(path, kind, chunk_size, batch_size, restart):
+    """
+    Import 1 file CSV theo chunk, tiếp tục từ checkpoint nếu có
+
+    Returns:
+        bool: True nếu import hết file
+    """
+    job = f"{kind}:{os.path.basename(path)}"
+    if restart and not storage.reset_import_checkpoint(job):
+        return False
+
+    checkpoint = storage.load_import_checkpoint(job)
+    if checkpoint is None:
+        return False
+    chunk_no, rows_done = checkpoint["chunks_done"], checkpoint["rows_done"]
+    if rows_done:
+        print(f"↪️ Tiếp tục {job} từ chunk {chunk_no} ({rows_done} dòng đã import)")
+
+    start = time.perf_counter()
+    imported = 0
+    # Bỏ qua các dòng đã commit ngay khi đọc (không parse lại)
+    reader = pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, rows_done + 1))
+    for chunk in reader:
+        if chunk.empty:
+            continue
+        chunk = _normalize_columns(chunk)
+        if kind == "students":
+            result = storage.import_chunk(job, chunk_no, rows_done + len(chunk),
+                                          students=students_from_chunk(chunk), batch_size=batch_size)
+        else:
+            result = storage.import_chunk(job, chunk_no, rows_done + len(chunk),
+                                          exercises=exercises_from_chunk(chunk), batch_size=batch_size)
+        if not result["success"]:
+            print(f"❌ Dừng ở chunk {chunk_no} (đã commit {rows_done} dòng), chạy lại để tiếp tục")
+            return False
+
+        chunk_no += 1
+        rows_done += len(chunk)
+        imported += len(chunk)
+        elapsed = time.perf_counter() - start
+        write_rate = len(chunk) / result["elapsed_seconds"] if result["elapsed_seconds"] else 0
+        print(f"   chunk {chunk_no}: {rows_done} dòng | ghi {write_rate:,.0f} dòng/s"
+              f" | tổng {imported / elapsed:,.0f} dòng/s")
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {job}: import {imported} dòng trong {elapsed:.2f}s"
+          f" ({imported / elapsed if elapsed else 0:,.0f} dòng/s), tổng {rows_done} dòng")
+    return True
+
+
+def main(csv_path, exercises_path, chunk_size, batch_size, restart):
+    if not storage.create_tables():
+        sys.exit(1)
+
+    for path, kind in ((csv_path, "students"), (exercises_path, "exercises")):
+        if not path:
+            continue
+        if not os.path.exists(path):
+            print(f"❌ Không tìm thấy file: {path}")
+            sys.exit(2)
+        if not import_file(path, kind, chunk_size, batch_size, restart):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default="student_classification_supabase_ready_final.csv",
+                        help="CSV sinh viên (1 dòng/sinh viên)")
+    parser.add_argument("--exercises", default=None,
+                        help="CSV bài tập (1 dòng/bài tập, cột như bảng exercise_details)")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="Số dòng CSV mỗi chunk (mỗi chunk = 1 giao dịch + 1 checkpoint)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Số dòng mỗi lô executemany (mặc định SQL_BATCH_SIZE)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Bỏ checkpoint, import lại từ đầu")
+    args = parser.parse_args()
+    main(args.csv, args.exercises, args.chunk_size, args.batch_size, args.restart)
@@ -0,0 +1,245 @@
+"""
+Bảng luật phát hiện bất thường cho StudentClassifier.predict
+
+Mỗi luật là 1 dict (dạng JSON được, có thể ghi đè bằng file ANOMALY_RULES_FILE):
+- name: tên luật (duy nhất)
+- group: các luật cùng group là chuỗi if/elif theo thứ tự trong bảng
+  (sinh viên chỉ khớp luật đầu tiên của group); không có group = luật độc lập
+- when: list điều kiện [cột, toán tử, ngưỡng], tất cả phải đúng (AND)
+- severity: mức độ 1-3 (severity của sinh viên = max các luật khớp)
+- reason: mẫu lý do (str.format theo tên cột, vd "{avg_score:.1f}")
+- detect: False = chỉ nâng severity, không đánh dấu anomaly_detected (mặc định True)
+- unless: list tên luật; không thêm lý do nếu đã có lý do của 1 trong các luật này
+
+Bảng luật được biên dịch 1 lần thành các hàm so sánh NumPy, đánh giá trên mảng cột
+của cả nhóm sinh viên; chuỗi lý do chỉ được tạo cho sinh viên khớp luật.
+"""
+
+import os
+import json
+import string
+import hashlib
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# File JSON (list luật) thay cho DEFAULT_ANOMALY_RULES, để trống = dùng bảng mặc định
+ANOMALY_RULES_FILE = os.getenv("ANOMALY_RULES_FILE", "")
+
+# Các cột luật được dùng (StudentClassifier.predict tính các cột này cho từng sinh viên)
+# - avg_score: điểm TB các môn (không có môn -> total_score của csv_data)
+# - time_hours: tổng thời gian làm bài (giờ)
+# - efficiency: điểm / giờ (999 nếu không có thời gian)
+# - attendance, attendance_pct, absence_pct: tỷ lệ tham gia (0-1), % tham gia, % vắng
+# - behavior: điểm hành vi (0-100)
+# - late_submissions, late_count: số lần nộp muộn, phần nguyên (để hiển thị)
+ANOMALY_COLUMNS = ("avg_score", "time_hours", "efficiency", "attendance", "attendance_pct",
+                   "absence_pct", "behavior", "late_submissions", "late_count")
+
+OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+DEFAULT_ANOMALY_RULES = [
+    # 1. Điểm cao + thời gian quá ngắn (nghi gian lận/dùng AI)
+    {"name": "high_score_very_short_time", "group": "score_time", "severity": 3,
+     "when": [["avg_score", ">=", 8.5], ["time_hours", "<", 5]],
+     "reason": "Điểm {avg_score:.1f}/10 nhưng thời gian chỉ {time_hours:.1f}h (nghi gian lận)"},
+    {"name": "high_score_short_time", "group": "score_time", "severity": 3,
+     "when": [["avg_score", ">=", 8.0], ["time_hours", "<", 4]],
+     "reason": "Điểm {avg_score:.1f}/10 nhưng thời gian chỉ {time_hours:.1f}h (đáng nghi)"},
+    # Tỷ lệ hiệu quả bất thường (bình thường ~0.8-1.2 điểm/giờ)
+    {"name": "high_efficiency", "group": "score_time", "severity": 2,
+     "when": [["avg_score", ">=", 8.0], ["efficiency", ">", 1.5]],
+     "reason": "Tỷ lệ điểm/thời gian cao bất thường ({efficiency:.1f} điểm/h) - cần xem xét"},
+
+    # 2. Điểm cao + vắng nhiều (nghi gian lận) - QUAN TRỌNG
+    {"name": "high_score_very_low_attendance", "group": "score_attendance", "severity": 3,
+     "when": [["avg_score", ">=", 8.0], ["attendance", "<", 0.5]],
+     "reason": "Điểm cao ({avg_score:.1f}/10) nhưng vắng {absence_pct:.0f}% (nghi gian lận)"},
+    {"name": "high_score_low_attendance", "group": "score_attendance", "severity": 2,
+     "when": [["avg_score", ">=", 8.0], ["attendance", "<", 0.7]],
+     "reason": "Điểm cao ({avg_score:.1f}/10) nhưng vắng {absence_pct:.0f}%"},
+
+    # 3. Điểm cao + thời gian ngắn + vắng nhiều = RẤT ĐÁNG NGỜ (chỉ nâng mức độ)
+    {"name": "combined_suspicious", "severity": 3, "detect": False,
+     "when": [["avg_score", ">=", 8.0], ["time_hours", "<", 6], ["attendance", "<", 0.7]],
+     "unless": ["high_score_very_short_time", "high_score_very_low_attendance"],
+     "reason": "Kết hợp: điểm cao + thời gian ngắn + vắng nhiều (rất đáng ngờ)"},
+
+    # 4. Nộp muộn nhiều - phạt theo mức độ
+    {"name": "late_extreme", "group": "late", "severity": 3,
+     "when": [["late_submissions", ">=", 20]],
+     "reason": "Nộp muộn quá nhiều ({late_count:.0f} lần)"},
+    {"name": "late_very_many", "group": "late", "severity": 3,
+     "when": [["late_submissions", ">=", 15]],
+     "reason": "Nộp muộn rất nhiều ({late_count:.0f} lần)"},
+    {"name": "late_many", "group": "late", "severity": 2,
+     "when": [["late_submissions", ">=", 10]],
+     "reason": "Nộp muộn nhiều ({late_count:.0f} lần)"},
+    {"name": "late_some", "group": "late", "severity": 1,
+     "when": [["late_submissions", ">=", 5]],
+     "reason": "Nộp muộn {late_count:.0f} lần"},
+
+    # 5. Vắng rất nhiều (< 50%), không lặp lại nếu đã có lý do về vắng
+    {"name": "very_low_attendance", "severity": 2,
+     "when": [["attendance", "<", 0.5]],
+     "unless": ["high_score_very_low_attendance", "high_score_low_attendance", "combined_suspicious"],
+     "reason": "Tham gia chỉ {attendance_pct:.0f}%"},
+
+    # 6. Điểm thấp nhưng chăm chỉ (cần hỗ trợ)
+    {"name": "low_score_diligent", "severity": 1,
+     "when": [["avg_score", "<", 5.0], ["behavior", ">=", 85], ["attendance", ">=", 0.95]],
+     "reason": "Điểm thấp ({avg_score:.1f}) nhưng rất chăm chỉ - cần hỗ trợ"},
+]
+
+
+class AnomalyRuleEngine:
+    """Bảng luật đã biên dịch, đánh giá trên mảng cột của cả nhóm sinh viên"""
+
+    def __init__(self, rules, columns=ANOMALY_COLUMNS):
+        """
+        Args:
+            rules: list luật (xem đầu module)
+            columns: Tên các cột được phép dùng trong điều kiện / mẫu lý do
+
+        Raises:
+            ValueError: Luật không hợp lệ (thiếu trường, cột / toán tử / luật unless không tồn tại)
+        """
+        # Digest của bảng luật (khóa snapshot: đổi luật -> phân loại lại)
+        self.digest = hashlib.sha1(
+            json.dumps(rules, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        self.rules = []
+        names = {}
+        for i, rule in enumerate(rules):
+            name = rule.get("name") or f"rule_{i + 1}"
+            if name in names:
+                raise ValueError(f"Luật bất thường trùng tên: '{name}'")
+
+            clauses = []
+            for clause in rule.get("when") or []:
+                if len(clause) != 3:
+                    raise ValueError(f"Luật '{name}': điều kiện phải là [cột, toán tử, ngưỡng], nhận {clause}")
+                column, op, threshold = clause
+                if column not in columns:
+                    raise ValueError(f"Luật '{name}': cột không hợp lệ '{column}' (hỗ trợ: {', '.join(columns)})")
+                if op not in OPERATORS:
+                    raise ValueError(f"Luật '{name}': toán tử không hợp lệ '{op}' (hỗ trợ: {', '.join(OPERATORS)})")
+                clauses.append((column, OPERATORS[op], float(threshold)))
+            if not clauses:
+                raise ValueError(f"Luật '{name}' không có điều kiện (when)")
+
+            template = rule.get("reason", "")
+            fields = {field for _, field, _, _ in string.Formatter().parse(template) if field}
+            unknown = fields - set(columns)
+            if unknown:
+                raise ValueError(f"Luật '{name}': mẫu lý do dùng cột không hợp lệ {sorted(unknown)}")
+
+            unless = []
+            for other in rule.get("unless") or []:
+                if other not in names:
+                    raise ValueError(f"Luật '{name}': unless '{other}' phải là luật đứng trước")
+                unless.append(names[other])
+
+            names[name] = i
+            self.rules.append({
+                "name": name,
+                "group": rule.get("group"),
+                "clauses": clauses,
+                "severity": int(rule.get("severity", 1)),
+                "detect": bool(rule.get("detect", True)),
+                "unless": unless,
+                "template": template,
+                "fields": sorted(fields),
+            })
+
+    def evaluate(self, values):
+        """
+        Đánh giá bảng luật trên n sinh viên
+
+        Args:
+            values: dict cột -> mảng (n,) (ANOMALY_COLUMNS)
+
+        Returns:
+            (anomaly_detected: mảng bool (n,), anomaly_severity: mảng int (n,),
+             anomaly_reasons: list n list lý do theo thứ tự luật)
+        """
+        n = len(next(iter(values.values()))) if values else 0
+        detected = np.zeros(n, dtype=bool)
+        severity = np.zeros(n, dtype=np.int64)
+        group_taken = {}
+        matched, emitted = [], []
+
+        for rule in self.rules:
+            mask = np.ones(n, dtype=bool)
+            for column, op, threshold in rule["clauses"]:
+                mask &= op(values[column], threshold)
+
+            # Chuỗi if/elif: bỏ sinh viên đã khớp luật trước trong cùng group
+            group = rule["group"]
+            if group is not None:
+                taken = group_taken.setdefault(group, np.zeros(n, dtype=bool))
+                mask &= ~taken
+                taken |= mask
+
+            matched.append(mask)
+            if rule["detect"]:
+                detected |= mask
+            severity = np.maximum(severity, np.where(mask, rule["severity"], 0))
+
+            reason_mask = mask
+            for other in rule["unless"]:
+                reason_mask = reason_mask & ~emitted[other]
+            emitted.append(reason_mask if rule["template"] else np.zeros(n, dtype=bool))
+
+        # Chỉ tạo chuỗi lý do cho sinh viên khớp luật
+        reasons = [[] for _ in range(n)]
+        for rule, mask in zip(self.rules, emitted):
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                continue
+            field_values = {field: values[field][rows].tolist() for field in rule["fields"]}
+            for k, row in enumerate(rows.tolist()):
+                reasons[row].append(rule["template"].format(
+                    **{field: field_values[field][k] for field in rule["fields"]}
+                ))
+        return detected, severity, reasons
+
+
+def load_anomaly_rules(path=None):
+    """
+    Bảng luật từ file JSON path (mặc định ANOMALY_RULES_FILE), DEFAULT_ANOMALY_RULES nếu không có file
+
+    Raises:
+        ValueError: File không đọc được hoặc không phải list luật
+    """
+    path = path or ANOMALY_RULES_FILE
+    if not path:
+        return DEFAULT_ANOMALY_RULES
+    try:
+        with open(path, encoding="utf-8") as f:
+            rules = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Không đọc được ANOMALY_RULES_FILE '{path}': {e}")
+    if not isinstance(rules, list):
+        raise ValueError(f"ANOMALY_RULES_FILE '{path}' phải chứa list luật")
+    return rules
+
+
+_engine = None
+
+
+def get_anomaly_engine(reload=False):
+    """Bảng luật đã biên dịch (biên dịch 1 lần, reload=True để đọc lại ANOMALY_RULES_FILE)"""
+    global _engine
+    if _engine is None or reload:
+        _engine = AnomalyRuleEngine(load_anomaly_rules())
+    return _engine
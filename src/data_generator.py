@@ -26,7 +26,7 @@ class StudentDataGenerator:
     def _load_from_sqlserver(self):
         """Load dữ liệu từ SQL Server"""
         try:
-            from sqlserver_sync import load_students_from_sqlserver
+            from storage import load_students_from_sqlserver
             
             print("Đang tải dữ liệu từ SQL Server...")
             students = load_students_from_sqlserver()
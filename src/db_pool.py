@@ -0,0 +1,245 @@
+"""
+Connection pool dùng chung cho các module đồng bộ database
+
+- Giới hạn số kết nối (min_size / max_size), an toàn đa luồng
+- Kiểm tra kết nối còn sống khi lấy ra (checkout)
+- Loại bỏ kết nối rảnh quá lâu (idle eviction)
+- Thống kê: số lần checkout, số lần phải chờ, số kết nối đã tạo
+"""
+
+import threading
+import time
+
+
+class PoolTimeoutError(Exception):
+    """Hết thời gian chờ kết nối rảnh từ pool"""
+
+
+class PooledConnection:
+    """
+    Bọc kết nối thật; close() trả kết nối về pool thay vì đóng hẳn.
+    Các thuộc tính/phương thức khác (cursor, commit, rollback, ...) được chuyển tiếp.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._broken = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def discard(self):
+        """Đánh dấu kết nối hỏng, close() sẽ đóng hẳn thay vì trả về pool"""
+        self._broken = True
+
+    def discard_if_broken(self, error):
+        """
+        discard() nếu error là lỗi mức kết nối (broken_errors của pool, vd mất kết nối);
+        lỗi câu lệnh thông thường giữ kết nối lại trong pool
+
+        Returns:
+            bool: True nếu kết nối bị đánh dấu hỏng
+        """
+        if isinstance(error, self._pool.broken_errors):
+            self.discard()
+            return True
+        return False
+
+    def close(self):
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        self._pool._release(raw, broken=self._broken)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Kết nối bị bỏ quên (không close) vẫn được trả về pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Pool kết nối có giới hạn
+
+    Args:
+        factory: Hàm không tham số tạo kết nối mới (vd: lambda: pyodbc.connect(conn_str))
+        min_size: Số kết nối giữ lại tối thiểu khi loại bỏ kết nối rảnh
+        max_size: Số kết nối tối đa (đang dùng + rảnh)
+        timeout: Số giây tối đa chờ kết nối rảnh khi pool đã đầy
+        idle_timeout: Kết nối rảnh lâu hơn số giây này sẽ bị đóng (trên min_size)
+        ping_query: Câu lệnh kiểm tra kết nối còn sống khi checkout (None = bỏ qua)
+        broken_errors: Các lớp lỗi mức kết nối; kết nối gặp các lỗi này (discard_if_broken)
+                       bị đóng hẳn khi close() thay vì trả về pool
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, timeout=30.0,
+                 idle_timeout=300.0, ping_query="SELECT 1", broken_errors=()):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Cấu hình pool không hợp lệ: min_size={min_size}, max_size={max_size}")
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_query = ping_query
+        self.broken_errors = tuple(broken_errors)
+
+        self._lock = threading.Condition()
+        self._idle = []         # [(raw, thời điểm trả về pool)]
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'creations': 0,
+            'evictions': 0,
+            'failed_pings': 0,
+        }
+
+    @property
+    def size(self):
+        """Tổng số kết nối đang mở (đang dùng + rảnh)"""
+        return self._in_use + len(self._idle)
+
+    def acquire(self):
+        """Lấy 1 kết nối từ pool (tạo mới nếu còn chỗ, chờ nếu pool đã đầy)"""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool đã đóng")
+            self._stats['checkouts'] += 1
+            self._evict_idle()
+
+            while True:
+                if self._idle:
+                    raw, _ = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self.size < self.max_size:
+                    # Giữ chỗ trước, tạo kết nối ngoài lock
+                    self._in_use += 1
+                    raw = None
+                    break
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                    wait_start = time.monotonic()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['wait_time'] += time.monotonic() - wait_start
+                    raise PoolTimeoutError(
+                        f"Không lấy được kết nối sau {self.timeout}s (max_size={self.max_size})"
+                    )
+                self._lock.wait(remaining)
+
+            if waited:
+                self._stats['wait_time'] += time.monotonic() - wait_start
+
+        if raw is not None and not self._is_alive(raw):
+            self._close_raw(raw)
+            raw = None
+
+        if raw is None:
+            try:
+                raw = self._create()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                    self._lock.notify()
+                raise
+
+        return PooledConnection(self, raw)
+
+    def _create(self):
+        raw = self._factory()
+        with self._lock:
+            self._stats['creations'] += 1
+        return raw
+
+    def _is_alive(self, raw):
+        if not self.ping_query:
+            return True
+        try:
+            cursor = raw.cursor()
+            cursor.execute(self.ping_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            with self._lock:
+                self._stats['failed_pings'] += 1
+            return False
+
+    def _release(self, raw, broken=False):
+        """Trả kết nối về pool (rollback phần giao dịch còn dở)"""
+        if not broken:
+            try:
+                raw.rollback()
+            except Exception:
+                broken = True
+
+        with self._lock:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._close_raw(raw)
+            else:
+                self._idle.append((raw, time.monotonic()))
+            self._lock.notify()
+
+    def _evict_idle(self):
+        """Đóng kết nối rảnh quá idle_timeout, giữ lại ít nhất min_size kết nối (gọi khi đang giữ lock)"""
+        if self.idle_timeout is None:
+            return
+        now = time.monotonic()
+        total = self.size
+        keep = []
+        # _idle: cũ nhất ở đầu danh sách
+        for raw, released_at in self._idle:
+            if now - released_at > self.idle_timeout and total > self.min_size:
+                self._close_raw(raw)
+                self._stats['evictions'] += 1
+                total -= 1
+                continue
+            keep.append((raw, released_at))
+        self._idle = keep
+
+    @staticmethod
+    def _close_raw(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """Đóng toàn bộ kết nối rảnh; kết nối đang dùng sẽ bị đóng khi được trả về"""
+        with self._lock:
+            self._closed = True
+            for raw, _ in self._idle:
+                self._close_raw(raw)
+            self._idle = []
+            self._lock.notify_all()
+
+    def stats(self):
+        """Thống kê pool"""
+        with self._lock:
+            return {
+                **self._stats,
+                'wait_time': round(self._stats['wait_time'], 3),
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'size': self.size,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            }
@@ -0,0 +1,127 @@
+"""
+Lưu bài tập chi tiết dạng cột (mảng NumPy) cho IntegratedScoringSystem
+
+- Mã môn / mã kỹ năng được intern thành số nguyên nhỏ (courses / skills là bảng tra ngược)
+- Điểm float64 (float32 làm lệch điểm trung bình ở biên làm tròn 2 chữ số),
+  thời gian làm bài float32, cờ bất thường bool
+- Bài tập của mỗi sinh viên nằm liền nhau: offsets[i]:offsets[i + 1] là khoảng của
+  student_ids[i], truy cập 1 sinh viên là slice (view, không copy)
+
+~17 byte/bài tập thay vì vài trăm byte của 1 dict dòng Supabase.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# Các cột bài tập của 1 sinh viên (view trên mảng của store)
+ExerciseSlice = namedtuple('ExerciseSlice', ['course_codes', 'skill_codes', 'scores', 'times', 'anomalies'])
+
+
+def _code_dtype(size):
+    """Kiểu số nguyên nhỏ nhất chứa được size mã"""
+    return np.int16 if size <= np.iinfo(np.int16).max else np.int32
+
+
+class ExerciseStore:
+    """
+    Bài tập của tất cả sinh viên dạng cột, chỉ đọc sau khi dựng
+
+    Sinh viên bị remove() chỉ bị bỏ khỏi chỉ mục (dữ liệu cũ nằm lại trong mảng
+    cho đến khi dựng lại store).
+    """
+
+    def __init__(self, rows=()):
+        """
+        Args:
+            rows: Các dòng exercise_details (dict có student_id, course_code, skill_code,
+                  score, completion_time, is_anomaly); thứ tự bài tập của mỗi sinh viên được giữ nguyên
+        """
+        courses, skills, students = {}, {}, {}
+        student_pos, course_codes, skill_codes, scores, times, anomalies = [], [], [], [], [], []
+        for ex in rows:
+            student_pos.append(students.setdefault(ex['student_id'], len(students)))
+            course_codes.append(courses.setdefault(ex.get('course_code', ''), len(courses)))
+            skill_codes.append(skills.setdefault(ex.get('skill_code', ''), len(skills)))
+            scores.append(float(ex.get('score', 0) or 0))
+            times.append(float(ex.get('completion_time', 0) or 0))
+            anomalies.append(bool(ex.get('is_anomaly', False)))
+
+        self.courses = list(courses)
+        self.skills = list(skills)
+        self.student_ids = list(students)
+
+        # Gom bài tập của từng sinh viên liền nhau (sắp ổn định theo thứ tự xuất hiện sinh viên)
+        student_pos = np.asarray(student_pos, dtype=np.int64)
+        order = np.argsort(student_pos, kind='stable')
+        self.course_codes = np.asarray(course_codes, dtype=_code_dtype(len(courses)))[order]
+        self.skill_codes = np.asarray(skill_codes, dtype=_code_dtype(len(skills)))[order]
+        self.scores = np.asarray(scores, dtype=np.float64)[order]
+        self.times = np.asarray(times, dtype=np.float32)[order]
+        self.anomalies = np.asarray(anomalies, dtype=bool)[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(student_pos, minlength=len(students)))))
+
+        self._index = {sid: i for i, sid in enumerate(self.student_ids)}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, student_id):
+        return student_id in self._index
+
+    @property
+    def nbytes(self):
+        """Số byte của các mảng dữ liệu"""
+        return sum(a.nbytes for a in (self.course_codes, self.skill_codes, self.scores,
+                                      self.times, self.anomalies, self.offsets))
+
+    def get(self, student_id):
+        """Bài tập của 1 sinh viên (ExerciseSlice gồm các view), None nếu không có"""
+        i = self._index.get(student_id)
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return ExerciseSlice(self.course_codes[start:end], self.skill_codes[start:end],
+                             self.scores[start:end], self.times[start:end], self.anomalies[start:end])
+
+    def rows(self, student_id):
+        """Bài tập của 1 sinh viên dạng list dict (student_id, course_code, skill_code, score, ...)"""
+        exercises = self.get(student_id)
+        if exercises is None:
+            return []
+        return [
+            {
+                'student_id': student_id,
+                'course_code': self.courses[course],
+                'skill_code': self.skills[skill],
+                'score': score,
+                'completion_time': time,
+                'is_anomaly': anomaly
+            }
+            for course, skill, score, time, anomaly in zip(
+                exercises.course_codes.tolist(), exercises.skill_codes.tolist(),
+                exercises.scores.tolist(), exercises.times.tolist(), exercises.anomalies.tolist()
+            )
+        ]
+
+    def remove(self, student_id):
+        """Bỏ 1 sinh viên khỏi store"""
+        self._index.pop(student_id, None)
+
+    def columns(self):
+        """
+        Các cột của tất cả sinh viên còn trong store (view nếu chưa remove sinh viên nào)
+
+        Returns:
+            (student_ids lặp theo từng bài tập, course_codes, skill_codes, scores, anomalies)
+        """
+        counts = np.diff(self.offsets)
+        student_ids = np.repeat(np.asarray(self.student_ids), counts)
+        columns = (student_ids, self.course_codes, self.skill_codes, self.scores, self.anomalies)
+        if len(self._index) == len(self.student_ids):
+            return columns
+
+        live = np.zeros(len(self.student_ids), dtype=bool)
+        live[list(self._index.values())] = True
+        mask = np.repeat(live, counts)
+        return tuple(column[mask] for column in columns)
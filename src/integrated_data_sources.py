@@ -0,0 +1,93 @@
+"""
+Nguồn dữ liệu cho IntegratedScoringSystem, chọn theo biến môi trường INTEGRATED_DATA_SOURCE
+
+- storage (mặc định): cùng database với backend (storage: SQL Server pool hoặc SQLite),
+  điểm bài tập được tính trung bình bằng GROUP BY trong database
+- files: file CSV export của các bảng trong thư mục INTEGRATED_DATA_DIR
+  (students.csv, student_csv_data.csv, course_scores.csv, exercise_details.csv)
+- supabase: Supabase REST API (supabase_loader), đọc từng bài tập; các bảng được cache
+  trên đĩa (table_cache), chỉ tải lại khi hết hạn và nguồn đã thay đổi
+
+Mọi nguồn trả về dict bảng -> list dòng (dict). Nguồn tính sẵn điểm bài tập trả về
+các bảng exercise_*_stats (xem storage_common.INTEGRATED_TABLES) thay cho exercise_details.
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INTEGRATED_DATA_SOURCE = os.getenv('INTEGRATED_DATA_SOURCE', 'storage').strip().lower()
+
+INTEGRATED_DATA_DIR = os.getenv(
+    'INTEGRATED_DATA_DIR',
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'integrated')
+)
+
+# Bảng -> cột cần đọc khi load từ file
+FILE_TABLES = {
+    'students': ('student_id', 'name', 'class'),
+    'student_csv_data': ('student_id', 'midterm_score', 'final_score', 'homework_score', 'total_score',
+                         'attendance_rate', 'study_hours_per_week', 'assignment_completion',
+                         'behavior_score_100'),
+    'course_scores': ('student_id', 'course_code', 'score'),
+    'exercise_details': ('student_id', 'course_code', 'skill_code', 'score', 'completion_time', 'is_anomaly'),
+}
+
+
+def load_from_storage():
+    """Đọc qua storage backend đang chọn (STORAGE_BACKEND), điểm bài tập tính bằng GROUP BY"""
+    from storage import load_integrated_tables
+    tables = load_integrated_tables()
+    if tables is None:
+        raise RuntimeError("không đọc được dữ liệu từ database")
+    return tables
+
+
+def load_from_files(directory=None):
+    """Đọc file CSV <bảng>.csv trong thư mục directory (mặc định INTEGRATED_DATA_DIR)"""
+    import pandas as pd
+
+    directory = directory or INTEGRATED_DATA_DIR
+    tables = {}
+    for table, columns in FILE_TABLES.items():
+        path = os.path.join(directory, f'{table}.csv')
+        if not os.path.exists(path):
+            print(f"⚠️ Không có file {path}, bỏ qua bảng {table}")
+            tables[table] = []
+            continue
+        frame = pd.read_csv(path, usecols=lambda c: c in columns)
+        tables[table] = frame.astype(object).where(frame.notna(), None).to_dict('records')
+    return tables
+
+
+def load_from_supabase():
+    """
+    Đọc từ Supabase theo trang, song song (supabase_loader), qua cache trên đĩa
+    (table_cache) nếu TABLE_CACHE_DIR không để trống
+    """
+    from supabase_loader import load_tables, load_tables_cached
+    from table_cache import TABLE_CACHE_DIR
+    return load_tables_cached() if TABLE_CACHE_DIR else load_tables()
+
+
+DATA_SOURCES = {
+    'storage': load_from_storage,
+    'files': load_from_files,
+    'supabase': load_from_supabase,
+}
+
+
+def load_integrated_data(source=None):
+    """
+    Load dữ liệu từ nguồn source (mặc định INTEGRATED_DATA_SOURCE)
+
+    Returns:
+        dict bảng -> list dòng
+    """
+    source = (source or INTEGRATED_DATA_SOURCE).strip().lower()
+    if source not in DATA_SOURCES:
+        raise ValueError(
+            f"INTEGRATED_DATA_SOURCE không hợp lệ: '{source}' (hỗ trợ: {', '.join(DATA_SOURCES)})"
+        )
+    return DATA_SOURCES[source]()
@@ -1,135 +1,315 @@
 """
 Hệ thống chấm điểm tích hợp
-Kết hợp điểm bài tập chi tiết với điểm tổng thể từ Supabase
+Kết hợp điểm bài tập chi tiết với điểm tổng thể (nguồn dữ liệu: xem integrated_data_sources)
 """
 
-import os
+import threading
+
 import numpy as np
+import pandas as pd
 from collections import defaultdict
-from dotenv import load_dotenv
-
-load_dotenv()
 
-SUPABASE_URL = os.getenv('SUPABASE_URL', '')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY', '')
+from exercise_store import ExerciseStore
+from integrated_data_sources import INTEGRATED_DATA_SOURCE, load_integrated_data
 
 
 class IntegratedScoringSystem:
     """
     Hệ thống chấm điểm tích hợp
-    - Điểm bài tập chi tiết (từ Supabase)
-    - Điểm tổng thể (từ Supabase)
+    - Điểm bài tập chi tiết (exercise_details, hoặc tổng/số bài đã gom sẵn trong database)
+    - Điểm tổng thể (student_csv_data, course_scores)
     """
     
-    def __init__(self):
-        print("Đang tải dữ liệu từ Supabase...")
+    def __init__(self, source=None):
+        source = source or INTEGRATED_DATA_SOURCE
+        print(f"Đang tải dữ liệu điểm tích hợp ({source})...")
         self.students_data = {}
-        self.exercises_data = {}
+        # Bài tập chi tiết dạng cột (nguồn files / supabase)
+        self.exercise_store = ExerciseStore()
+        # Tổng điểm / số bài theo sinh viên, môn, kỹ năng (gom trong database hoặc khi ingest_exercises)
+        self.exercise_aggregates = {}
         self.course_scores_data = {}
-        self._load_from_supabase()
         
-    def _load_from_supabase(self):
-        """Load dữ liệu từ Supabase"""
+        # Cache kết quả calculate_integrated_score theo sinh viên
+        # (điền bởi analyze_all_students, xóa khi bài tập / csv_data của sinh viên thay đổi)
+        self._result_cache = {}
+        self._cache_lock = threading.Lock()
+        self._cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        
+        self._load(source)
+        
+    def _load(self, source):
+        """Load dữ liệu từ nguồn source (storage | files | supabase)"""
         try:
-            from supabase import create_client
-            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+            tables = load_integrated_data(source)
             
             # Load students
-            students_result = supabase.table('students').select('*').execute()
-            for s in students_result.data:
+            for s in tables['students']:
                 self.students_data[s['student_id']] = s
             
             # Load student_csv_data (hành vi)
-            csv_data_result = supabase.table('student_csv_data').select('*').execute()
-            for c in csv_data_result.data:
+            for c in tables['student_csv_data']:
                 sid = c['student_id']
                 if sid in self.students_data:
                     self.students_data[sid]['csv_data'] = c
             
             # Load course_scores
-            scores_result = supabase.table('course_scores').select('*').execute()
-            for score in scores_result.data:
+            for score in tables['course_scores']:
                 sid = score['student_id']
                 if sid not in self.course_scores_data:
                     self.course_scores_data[sid] = {}
                 self.course_scores_data[sid][score['course_code']] = score
             
-            # Load exercise_details
-            exercises_result = supabase.table('exercise_details').select('*').execute()
-            for ex in exercises_result.data:
-                sid = ex['student_id']
-                if sid not in self.exercises_data:
-                    self.exercises_data[sid] = []
-                self.exercises_data[sid].append(ex)
+            # Load exercise_details (từng bài tập) hoặc tổng/số bài đã gom trong database
+            if 'exercise_student_stats' in tables:
+                self._load_exercise_stats(tables)
+            else:
+                self.exercise_store = ExerciseStore(tables['exercise_details'])
             
-            print(f"✓ Đã tải {len(self.students_data)} sinh viên từ Supabase")
-            print(f"✓ Đã tải {len(self.exercises_data)} sinh viên có bài tập")
+            print(f"✓ Đã tải {len(self.students_data)} sinh viên ({source})")
+            print(f"✓ Đã tải {len(self.exercise_store) + len(self.exercise_aggregates)} sinh viên có bài tập")
+            if source == 'storage' and self.students_data and not self.exercise_aggregates:
+                # Database cũ chưa import exercise_details: điểm tích hợp chỉ còn điểm môn học
+                print("⚠️ Database chưa có dữ liệu bài tập (exercise_details trống): điểm tích hợp chỉ "
+                      "dựa trên điểm môn học. Import bài tập bằng "
+                      "'python scripts/import_csv_to_sqlserver.py --csv \"\" --exercises exercise_details.csv' "
+                      "hoặc đặt INTEGRATED_DATA_SOURCE=supabase")
             
         except Exception as e:
-            print(f"⚠️ Lỗi khi load từ Supabase: {e}")
+            print(f"⚠️ Lỗi khi load dữ liệu điểm tích hợp ({source}): {e}")
             self.students_data = {}
-            self.exercises_data = {}
+            self.exercise_store = ExerciseStore()
+            self.exercise_aggregates = {}
             self.course_scores_data = {}
-        
-    def calculate_exercise_score(self, student_id):
-        """
-        Tính điểm từ bài tập chi tiết
+    
+    def _load_exercise_stats(self, tables):
         """
-        exercises = self.exercises_data.get(student_id, [])
+        Dựng exercise_aggregates từ các bảng exercise_*_stats
         
-        if not exercises:
-            # Nếu không có bài tập chi tiết, dùng điểm từ course_scores
-            course_scores = self.course_scores_data.get(student_id, {})
-            if not course_scores:
-                return None
-            
-            # Tính điểm trung bình từ course_scores
-            scores = [float(c.get('score', 0) or 0) for c in course_scores.values()]
-            exercise_avg = sum(scores) / len(scores) if scores else 0
-            
-            return {
-                'exercise_avg': round(exercise_avg, 2),
-                'course_scores': {c: float(d.get('score', 0) or 0) for c, d in course_scores.items()},
-                'skill_scores': {},
-                'total_exercises': 0,
-                'anomaly_count': 0,
-                'detailed_exercises': {}
+        Tổng điểm do SUM của database cộng theo thứ tự của engine, exercise_avg có thể lệch
+        0.01 (sau khi làm tròn) so với cộng từng bài tập khi trung bình rơi đúng ngưỡng làm tròn
+        """
+        for row in tables['exercise_student_stats']:
+            self.exercise_aggregates[row['student_id']] = {
+                'score_sum': float(row['score_sum'] or 0),
+                'count': int(row['exercise_count']),
+                'anomalies': int(row['anomaly_count'] or 0),
+                'courses': {},
+                'skills': {}
             }
+        for row in tables['exercise_course_stats']:
+            aggregate = self.exercise_aggregates[row['student_id']]
+            aggregate['courses'][row['course_code']] = [float(row['score_sum'] or 0), int(row['exercise_count'])]
+            aggregate['skills'][row['course_code']] = {}
+        for row in tables['exercise_skill_stats']:
+            aggregate = self.exercise_aggregates[row['student_id']]
+            aggregate['skills'][row['course_code']][row['skill_code']] = [
+                float(row['score_sum'] or 0), int(row['exercise_count'])
+            ]
+    
+    @staticmethod
+    def _new_aggregate(exercises=()):
+        """
+        Tổng điểm / số bài / số bất thường của 1 sinh viên từ danh sách bài tập
         
-        # Tính điểm từ bài tập chi tiết
-        course_scores = defaultdict(list)
-        skill_scores = defaultdict(lambda: defaultdict(list))
-        anomaly_count = 0
-        
+        score_sum được cộng theo thứ tự của cách tính gốc (từng môn theo lần xuất hiện đầu tiên,
+        trong môn theo thứ tự bài tập) để exercise_avg khớp tới từng bit. Các bài ingest sau đó
+        được cộng dồn vào cuối nên có thể lệch ở bit cuối (0.01 sau khi làm tròn nếu rơi đúng ngưỡng)
+        """
+        exercises = list(exercises)
+        aggregate = {'score_sum': 0.0, 'count': 0, 'anomalies': 0, 'courses': {}, 'skills': {}}
+        IntegratedScoringSystem._add_exercises(aggregate, exercises)
+        by_course = defaultdict(list)
+        for ex in exercises:
+            by_course[ex.get('course_code', '')].append(float(ex.get('score', 0) or 0))
+        aggregate['score_sum'] = sum(score for scores in by_course.values() for score in scores)
+        return aggregate
+    
+    @staticmethod
+    def _add_exercises(aggregate, exercises):
+        """Cộng dồn các bài tập vào tổng điểm / số bài / số bất thường của 1 sinh viên"""
         for ex in exercises:
             course = ex.get('course_code', '')
             skill = ex.get('skill_code', '')
             score = float(ex.get('score', 0) or 0)
-            is_anomaly = ex.get('is_anomaly', False)
             
-            course_scores[course].append(score)
-            skill_scores[course][skill].append(score)
-            if is_anomaly:
-                anomaly_count += 1
+            aggregate['score_sum'] += score
+            aggregate['count'] += 1
+            if ex.get('is_anomaly', False):
+                aggregate['anomalies'] += 1
+            
+            course_total = aggregate['courses'].setdefault(course, [0.0, 0])
+            course_total[0] += score
+            course_total[1] += 1
+            skill_total = aggregate['skills'].setdefault(course, {}).setdefault(skill, [0.0, 0])
+            skill_total[0] += score
+            skill_total[1] += 1
+    
+    @staticmethod
+    def _exercise_data_from_aggregate(aggregate):
+        """exercise_data (như calculate_exercise_score) từ tổng điểm / số bài"""
+        return {
+            'exercise_avg': round(aggregate['score_sum'] / aggregate['count'], 2) if aggregate['count'] else 0,
+            'course_scores': {c: total / count for c, (total, count) in aggregate['courses'].items()},
+            'skill_scores': {c: {sk: total / count for sk, (total, count) in skills.items()}
+                             for c, skills in aggregate['skills'].items()},
+            'total_exercises': aggregate['count'],
+            'anomaly_count': aggregate['anomalies'],
+            'detailed_exercises': {}
+        }
+    
+    def ingest_exercises(self, rows):
+        """
+        Thêm các bài tập mới (dòng exercise_details) mà không load lại toàn bộ
+        
+        - Cộng dồn tổng điểm / số bài theo (sinh viên, môn), (sinh viên, môn, kỹ năng)
+          và số bài bất thường: O(số dòng mới)
+        - Sinh viên có bài tập trong exercise_store (nguồn files / supabase) được chuyển sang
+          dạng tổng dồn ở lần ingest đầu tiên
+        - Chỉ tính lại điểm tích hợp + phân loại của các sinh viên bị ảnh hưởng (ghi vào cache)
+        
+        Args:
+            rows: Các bài tập mới (chưa ingest trước đó), mỗi dòng có student_id
+        
+        Returns:
+            set student_id có kết quả thay đổi
+        """
+        by_student = defaultdict(list)
+        for row in rows:
+            if row.get('student_id') is not None:
+                by_student[row['student_id']].append(row)
+        
+        for sid, exercises in by_student.items():
+            aggregate = self.exercise_aggregates.get(sid)
+            if aggregate is None:
+                aggregate = self._new_aggregate(self.exercise_store.rows(sid))
+                self.exercise_store.remove(sid)
+                self.exercise_aggregates[sid] = aggregate
+            self._add_exercises(aggregate, exercises)
+        
+        changed = set(by_student)
+        self.invalidate(changed)
+        for sid in changed:
+            self.calculate_integrated_score(sid)
+        return changed
+    
+    def calculate_exercise_score(self, student_id):
+        """
+        Tính điểm từ bài tập chi tiết
+        """
+        if student_id in self.exercise_aggregates:
+            return self._exercise_data_from_aggregate(self.exercise_aggregates[student_id])
         
-        # Tính trung bình
-        course_avg = {c: sum(s)/len(s) for c, s in course_scores.items() if s}
-        skill_avg = {c: {sk: sum(s)/len(s) for sk, s in skills.items() if s} 
-                     for c, skills in skill_scores.items()}
+        if student_id in self.exercise_store:
+            # Tính điểm từ bài tập chi tiết
+            aggregate = self._new_aggregate(self.exercise_store.rows(student_id))
+            return self._exercise_data_from_aggregate(aggregate)
         
-        all_scores = [s for scores in course_scores.values() for s in scores]
-        exercise_avg = sum(all_scores) / len(all_scores) if all_scores else 0
+        # Nếu không có bài tập chi tiết, dùng điểm từ course_scores
+        course_scores = self.course_scores_data.get(student_id, {})
+        if not course_scores:
+            return None
+        
+        # Tính điểm trung bình từ course_scores
+        scores = [float(c.get('score', 0) or 0) for c in course_scores.values()]
+        exercise_avg = sum(scores) / len(scores) if scores else 0
         
         return {
             'exercise_avg': round(exercise_avg, 2),
-            'course_scores': course_avg,
-            'skill_scores': skill_avg,
-            'total_exercises': len(exercises),
-            'anomaly_count': anomaly_count,
+            'course_scores': {c: float(d.get('score', 0) or 0) for c, d in course_scores.items()},
+            'skill_scores': {},
+            'total_exercises': 0,
+            'anomaly_count': 0,
             'detailed_exercises': {}
         }
     
     def calculate_integrated_score(self, student_id):
+        """
+        Điểm tích hợp của 1 sinh viên, lấy từ cache nếu đã tính
+        (xem _compute_integrated_score)
+        """
+        with self._cache_lock:
+            result = self._result_cache.get(student_id)
+            if result is not None:
+                self._cache_stats['hits'] += 1
+                return result
+            self._cache_stats['misses'] += 1
+        
+        result = self._compute_integrated_score(student_id)
+        if result is not None:
+            with self._cache_lock:
+                self._result_cache[student_id] = result
+        return result
+    
+    def invalidate(self, student_ids=None):
+        """Xóa kết quả đã cache của các sinh viên student_ids (None = tất cả)"""
+        with self._cache_lock:
+            if student_ids is None:
+                removed = len(self._result_cache)
+                self._result_cache.clear()
+            else:
+                removed = sum(self._result_cache.pop(sid, None) is not None for sid in student_ids)
+            self._cache_stats['invalidations'] += removed
+    
+    def update_exercises(self, student_id, exercises):
+        """Thay danh sách bài tập của 1 sinh viên và xóa kết quả đã cache của sinh viên đó"""
+        self.exercise_store.remove(student_id)
+        if exercises:
+            self.exercise_aggregates[student_id] = self._new_aggregate(exercises)
+        else:
+            self.exercise_aggregates.pop(student_id, None)
+        self.invalidate([student_id])
+    
+    def update_csv_data(self, student_id, csv_data):
+        """
+        Cập nhật csv_data (ghi đè các trường có trong csv_data) của 1 sinh viên
+        và xóa kết quả đã cache của sinh viên đó
+        
+        Returns:
+            bool: False nếu không có sinh viên này
+        """
+        student = self.students_data.get(student_id)
+        if not student:
+            return False
+        student['csv_data'] = {**student.get('csv_data', {}), **csv_data}
+        self.invalidate([student_id])
+        return True
+    
+    def update_student(self, student_id, info=None, csv_data=None, course_scores=None):
+        """
+        Thêm mới hoặc cập nhật 1 sinh viên và xóa kết quả đã cache của sinh viên đó
+        
+        Args:
+            info: Thông tin sinh viên (name, class), ghi đè các trường có trong info
+            csv_data: Ghi đè các trường có trong csv_data
+            course_scores: dict mã môn -> dòng điểm (có score), thay toàn bộ điểm môn học
+        """
+        student = self.students_data.setdefault(student_id, {'student_id': student_id})
+        student.update(info or {})
+        student['csv_data'] = {**student.get('csv_data', {}), **(csv_data or {})}
+        if course_scores is not None:
+            self.course_scores_data[student_id] = dict(course_scores)
+        self.invalidate([student_id])
+    
+    def remove_student(self, student_id):
+        """Bỏ 1 sinh viên (dữ liệu, bài tập và kết quả đã cache)"""
+        self.students_data.pop(student_id, None)
+        self.course_scores_data.pop(student_id, None)
+        self.exercise_aggregates.pop(student_id, None)
+        self.exercise_store.remove(student_id)
+        self.invalidate([student_id])
+    
+    def seed_cache(self, results):
+        """Điền cache bằng các kết quả đã tính sẵn (vd: integrated_results của snapshot)"""
+        with self._cache_lock:
+            self._result_cache = {r['student_id']: r for r in results}
+    
+    def cache_stats(self):
+        """Thống kê cache kết quả (hits, misses, invalidations, size)"""
+        with self._cache_lock:
+            return {**self._cache_stats, 'size': len(self._result_cache)}
+    
+    def _compute_integrated_score(self, student_id):
         """
         Tính điểm tích hợp
         
@@ -206,20 +386,165 @@ class IntegratedScoringSystem:
             }
         }
     
-    def analyze_all_students(self):
-        """Phân tích tất cả sinh viên"""
-        results = []
+    def _exercise_table(self):
+        """
+        Bảng bài tập của các sinh viên trong exercise_store (1 dòng/bài tập):
+        student_id, course_code, skill_code (mã số nguyên của store), score, is_anomaly
+
+        Các dòng của mỗi sinh viên liền nhau, giữ đúng thứ tự bài tập
+        """
+        student_ids, course_codes, skill_codes, scores, anomalies = self.exercise_store.columns()
+        return pd.DataFrame({
+            'student_id': student_ids,
+            'course_code': course_codes,
+            'skill_code': skill_codes,
+            'score': scores,
+            'is_anomaly': anomalies,
+        })
+    
+    def calculate_exercise_scores_batch(self):
+        """
+        Tính điểm bài tập của tất cả sinh viên có bài tập chi tiết cùng lúc
+        (cùng kết quả với calculate_exercise_score)
+        
+        - Gom nhóm (sinh viên), (sinh viên, môn), (sinh viên, môn, kỹ năng) bằng ngroup
+        - Tổng/số lượng mỗi nhóm bằng np.bincount (cộng tuần tự). Tổng của sinh viên cộng
+          theo thứ tự của cách tính gốc: các dòng được sắp ổn định theo mã nhóm (sinh viên, môn)
+          (môn theo lần xuất hiện đầu tiên, trong môn giữ thứ tự bài tập) nên trung bình khớp
+          tới từng bit với tính từng sinh viên
+        - Sinh viên đã có tổng điểm / số bài (exercise_aggregates) tính từ tổng đó
+        
+        Returns:
+            dict student_id -> exercise_data
+        """
+        table = self._exercise_table()
+        aggregated = {sid: self._exercise_data_from_aggregate(aggregate)
+                      for sid, aggregate in self.exercise_aggregates.items()}
+        if table.empty:
+            return aggregated
+        
+        scores = table['score'].to_numpy()
+        student_codes = table.groupby('student_id', sort=False).ngroup().to_numpy()
+        course_codes = table.groupby(['student_id', 'course_code'], sort=False).ngroup().to_numpy()
+        skill_codes = table.groupby(['student_id', 'course_code', 'skill_code'], sort=False).ngroup().to_numpy()
         
+        exercise_counts = np.bincount(student_codes)
+        anomaly_counts = np.bincount(student_codes, weights=table['is_anomaly'].to_numpy()).astype(int)
+        course_means = np.bincount(course_codes, weights=scores) / np.bincount(course_codes)
+        skill_means = np.bincount(skill_codes, weights=scores) / np.bincount(skill_codes)
+        by_course = np.argsort(course_codes, kind='stable')
+        exercise_avgs = np.bincount(student_codes[by_course], weights=scores[by_course]) / exercise_counts
+        
+        # Khóa của từng nhóm, cùng thứ tự với mã ngroup (lần xuất hiện đầu tiên)
+        course_keys = table.drop_duplicates(['student_id', 'course_code'])
+        skill_keys = table.drop_duplicates(['student_id', 'course_code', 'skill_code'])
+        
+        results = aggregated
+        results.update({
+            sid: {
+                'exercise_avg': round(avg, 2),
+                'course_scores': {},
+                'skill_scores': {},
+                'total_exercises': count,
+                'anomaly_count': anomalies,
+                'detailed_exercises': {}
+            }
+            for sid, avg, count, anomalies in zip(
+                table['student_id'].drop_duplicates().tolist(), exercise_avgs.tolist(),
+                exercise_counts.tolist(), anomaly_counts.tolist()
+            )
+        })
+        courses, skills = self.exercise_store.courses, self.exercise_store.skills
+        for sid, course, mean in zip(course_keys['student_id'].tolist(),
+                                     course_keys['course_code'].tolist(), course_means.tolist()):
+            results[sid]['course_scores'][courses[course]] = mean
+            results[sid]['skill_scores'][courses[course]] = {}
+        for sid, course, skill, mean in zip(skill_keys['student_id'].tolist(), skill_keys['course_code'].tolist(),
+                                            skill_keys['skill_code'].tolist(), skill_means.tolist()):
+            results[sid]['skill_scores'][courses[course]][skills[skill]] = mean
+        return results
+    
+    def analyze_all_students(self):
+        """
+        Phân tích tất cả sinh viên trong 1 lượt tính theo mảng
+        (cùng kết quả với gọi calculate_integrated_score cho từng sinh viên),
+        kết quả được dùng làm cache cho calculate_integrated_score
+        """
         print("\nĐang phân tích tất cả sinh viên...")
-        total = len(self.students_data)
+        student_ids = list(self.students_data.keys())
+        if not student_ids:
+            print("✓ Đã phân tích 0 sinh viên")
+            return []
         
-        for idx, student_id in enumerate(self.students_data.keys()):
-            result = self.calculate_integrated_score(student_id)
-            if result:
-                results.append(result)
-            
-            if (idx + 1) % 50 == 0:
-                print(f"  Đã xử lý {idx + 1}/{total} sinh viên...")
+        exercise_data = self.calculate_exercise_scores_batch()
+        # Sinh viên không có bài tập chi tiết: dùng course_scores (None nếu cũng không có)
+        for sid in student_ids:
+            if sid not in exercise_data:
+                exercise_data[sid] = self.calculate_exercise_score(sid)
+        
+        csv_rows = [self.students_data[sid].get('csv_data', {}) for sid in student_ids]
+        
+        def column(name):
+            return np.array([float(c.get(name, 0) or 0) for c in csv_rows], dtype=float)
+        
+        midterm = column('midterm_score')
+        final = column('final_score')
+        homework = column('homework_score')
+        total_score = column('total_score')
+        
+        # Không có exercise_data -> dùng homework
+        has_exercise = np.array([exercise_data[sid] is not None for sid in student_ids])
+        exercise_avg = np.where(
+            has_exercise,
+            [data['exercise_avg'] if data else 0.0 for data in (exercise_data[sid] for sid in student_ids)],
+            homework
+        )
+        
+        # Công thức tích hợp: 30% bài tập, 30% giữa kỳ, 40% cuối kỳ
+        integrated_score = exercise_avg * 0.30 + midterm * 0.30 + final * 0.40
+        classification = np.select(
+            [integrated_score >= 8.0, integrated_score >= 7.0, integrated_score >= 5.0],
+            ['Giỏi', 'Khá', 'Trung Bình'],
+            default='Yếu'
+        )
+        original_score = np.where(total_score > 0, total_score, midterm * 0.3 + final * 0.5 + homework * 0.2)
+        score_difference = integrated_score - original_score
+        
+        results = []
+        for i, sid in enumerate(student_ids):
+            student = self.students_data[sid]
+            csv_data = csv_rows[i]
+            results.append({
+                'student_id': sid,
+                'name': student.get('name', ''),
+                'class': student.get('class', ''),
+                'original_score': round(float(original_score[i]), 2),
+                'integrated_score': round(float(integrated_score[i]), 2),
+                'score_difference': round(float(score_difference[i]), 2),
+                'classification': str(classification[i]),
+                'components': {
+                    'exercise_avg': float(exercise_avg[i]),
+                    'midterm': float(midterm[i]),
+                    'final': float(final[i]),
+                    'homework': float(homework[i])
+                },
+                'exercise_data': exercise_data[sid] or {
+                    'exercise_avg': float(homework[i]),
+                    'course_scores': {},
+                    'skill_scores': {},
+                    'total_exercises': 0,
+                    'anomaly_count': 0
+                },
+                'original_data': {
+                    'attendance_rate': float(csv_data.get('attendance_rate', 0) or 0),
+                    'study_hours': float(csv_data.get('study_hours_per_week', 0) or 0),
+                    'assignment_completion': float(csv_data.get('assignment_completion', 0) or 0),
+                    'behavior_score': float(csv_data.get('behavior_score_100', 0) or 0)
+                }
+            })
+        
+        with self._cache_lock:
+            self._result_cache = {r['student_id']: r for r in results}
         
         print(f"✓ Đã phân tích {len(results)} sinh viên")
         return results
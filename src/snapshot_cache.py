@@ -0,0 +1,303 @@
+"""
+Snapshot dữ liệu backend trên đĩa (dạng cột, memory-map) để khởi động nhanh
+
+Mỗi snapshot là 1 thư mục:
+- manifest.json: phiên bản định dạng, fingerprint nguồn dữ liệu, digest cấu hình phân loại,
+  watermark, danh sách bảng
+- <bảng>.ids.npy: student_id của từng bản ghi (int64)
+- <bảng>.offsets.npy: vị trí bắt đầu/kết thúc của từng bản ghi trong .data.npy (int64, n+1 phần tử)
+- <bảng>.data.npy: các bản ghi JSON (UTF-8) nối bằng dấu phẩy (uint8)
+- classifier.pkl: StudentClassifier đã fit (joblib)
+
+Khi đọc, các file .npy được memory-map (mmap_mode='r') và bản ghi chỉ được giải mã
+khi được truy cập lần đầu, nên thời gian khởi động gần như không phụ thuộc số sinh viên.
+"""
+
+import os
+import json
+import shutil
+import time
+from collections.abc import MutableSequence, MutableMapping
+
+import numpy as np
+
+# 2: snapshot chỉ được ghi sau khi kết quả phân loại đã lưu vào database (bảng thống kê khớp snapshot)
+SNAPSHOT_FORMAT_VERSION = 2
+
+# Thư mục snapshot (mặc định: <project>/cache/snapshot), để trống để tắt snapshot
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'snapshot')
+)
+
+# Các bảng của data_store được lưu: tên -> kiểu ("list" = list bản ghi, "map" = dict student_id -> dữ liệu)
+SNAPSHOT_TABLES = {
+    "students": "list",
+    "classifications": "list",
+    "integrated_results": "list",
+    "skill_evaluations": "map",
+}
+
+_MISSING = object()
+
+
+def _json_default(value):
+    """Chuyển kiểu numpy sang kiểu Python khi ghi JSON"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Không ghi được kiểu {type(value).__name__} vào snapshot")
+
+
+def _encode_column(values):
+    """
+    Mã hóa danh sách giá trị thành (offsets, data): các bản ghi JSON UTF-8 nối bằng dấu phẩy,
+    bản ghi i nằm trong data[offsets[i]:offsets[i + 1] - 1] (bỏ dấu phẩy phía sau)
+    """
+    chunks = [json.dumps(v, ensure_ascii=False, default=_json_default).encode("utf-8") for v in values]
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(c) + 1 for c in chunks], out=offsets[1:])
+    data = np.frombuffer(b",".join(chunks) + b",", dtype=np.uint8)
+    return offsets, data
+
+
+class _Column:
+    """Cột JSON memory-map: giải mã bản ghi thứ i khi cần"""
+
+    def __init__(self, path, name):
+        self.ids = np.load(os.path.join(path, f"{name}.ids.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, f"{name}.offsets.npy"), mmap_mode="r")
+        self.data = np.load(os.path.join(path, f"{name}.data.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def decode(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1]) - 1
+        return json.loads(self.data[start:end].tobytes().decode("utf-8"))
+
+    def decode_all(self):
+        """Giải mã toàn bộ cột bằng 1 lần json.loads (nhanh hơn nhiều so với từng bản ghi)"""
+        if not len(self):
+            return []
+        return json.loads(b"[" + self.data[:-1].tobytes() + b"]")
+
+
+class LazyRecords(MutableSequence):
+    """
+    List bản ghi đọc từ snapshot, giải mã lười từng phần tử (có cache).
+    Hỗ trợ đầy đủ thao tác của list nên dùng thay list trong data_store được.
+    """
+
+    def __init__(self, column):
+        self._column = column
+        self._items = [_MISSING] * len(column)
+        # Vị trí trong _items -> vị trí trong cột (bị lệch sau insert/delete)
+        self._source = list(range(len(column)))
+
+    def _load(self, i):
+        item = self._items[i]
+        if item is _MISSING:
+            item = self._column.decode(self._source[i])
+            self._items[i] = item
+        return item
+
+    def _load_all(self):
+        """Giải mã tất cả bản ghi chưa giải mã (dùng khi duyệt toàn bộ list)"""
+        if _MISSING not in self._items:
+            return
+        decoded = self._column.decode_all()
+        for i, item in enumerate(self._items):
+            if item is _MISSING:
+                self._items[i] = decoded[self._source[i]]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        self._load_all()
+        return iter(list(self._items))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._load(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("list index out of range")
+        return self._load(index)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            raise TypeError("LazyRecords không hỗ trợ gán theo slice")
+        self._items[index] = value
+
+    def __delitem__(self, index):
+        del self._items[index]
+        del self._source[index]
+
+    def insert(self, index, value):
+        self._items.insert(index, value)
+        self._source.insert(index, -1)
+
+    def __repr__(self):
+        return f"<LazyRecords n={len(self)}>"
+
+
+class LazyMapping(MutableMapping):
+    """Dict student_id -> dữ liệu đọc từ snapshot, giải mã lười từng giá trị (có cache)"""
+
+    def __init__(self, column):
+        self._column = column
+        self._index = {int(sid): i for i, sid in enumerate(column.ids)}
+        self._items = {}
+
+    def __getitem__(self, key):
+        if key in self._items:
+            return self._items[key]
+        i = self._index[key]
+        value = self._column.decode(i)
+        self._items[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._items[key] = value
+        self._index.setdefault(key, None)
+
+    def __delitem__(self, key):
+        del self._index[key]
+        self._items.pop(key, None)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def items(self):
+        # Duyệt toàn bộ -> giải mã cả cột 1 lần
+        if len(self._items) < len(self._index):
+            decoded = self._column.decode_all()
+            for key, i in self._index.items():
+                if key not in self._items:
+                    self._items[key] = decoded[i]
+        return {key: self._items[key] for key in self._index}.items()
+
+    def __repr__(self):
+        return f"<LazyMapping n={len(self)}>"
+
+
+def save_snapshot(data_store, fingerprint, path=None, config_digest=None):
+    """
+    Ghi snapshot của data_store (các bảng trong SNAPSHOT_TABLES + classifier).
+    Ghi vào thư mục tạm rồi đổi tên để không bao giờ để lại snapshot ghi dở.
+
+    Args:
+        data_store: dict dữ liệu backend
+        fingerprint: fingerprint nguồn dữ liệu tại thời điểm load (get_source_fingerprint)
+        path: Thư mục snapshot (mặc định SNAPSHOT_DIR)
+        config_digest: digest cấu hình phân loại (StudentClassifier.config_digest)
+
+    Returns:
+        bool: True nếu ghi thành công
+    """
+    path = path or SNAPSHOT_DIR
+    if not path or fingerprint is None:
+        return False
+
+    start = time.perf_counter()
+    tmp_path = f"{path}.tmp"
+    try:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        tables = {}
+        for name, kind in SNAPSHOT_TABLES.items():
+            value = data_store.get(name) or ({} if kind == "map" else [])
+            if kind == "map":
+                ids = list(value.keys())
+                records = [value[k] for k in ids]
+            else:
+                records = list(value)
+                ids = [r.get("student_id") for r in records]
+            offsets, data = _encode_column(records)
+            np.save(os.path.join(tmp_path, f"{name}.ids.npy"), np.asarray(ids, dtype=np.int64))
+            np.save(os.path.join(tmp_path, f"{name}.offsets.npy"), offsets)
+            np.save(os.path.join(tmp_path, f"{name}.data.npy"), data)
+            tables[name] = {"kind": kind, "count": len(records)}
+
+        if data_store.get("classifier") is not None:
+            import joblib
+            joblib.dump(data_store["classifier"], os.path.join(tmp_path, "classifier.pkl"))
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "config_digest": config_digest,
+            "watermark": data_store.get("watermark"),
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "tables": tables,
+        }
+        with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, default=_json_default)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        print(f"💾 Đã lưu snapshot ({tables['students']['count']} sinh viên, "
+              f"{time.perf_counter() - start:.2f}s): {path}")
+        return True
+
+    except Exception as e:
+        print(f"⚠️ Không lưu được snapshot: {e}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        return False
+
+
+def load_snapshot(fingerprint, path=None, config_digest=None):
+    """
+    Đọc snapshot nếu còn khớp với nguồn dữ liệu.
+
+    Args:
+        fingerprint: fingerprint nguồn dữ liệu hiện tại (get_source_fingerprint)
+        path: Thư mục snapshot (mặc định SNAPSHOT_DIR)
+        config_digest: digest cấu hình phân loại hiện tại (StudentClassifier.config_digest)
+
+    Returns:
+        dict các bảng (LazyRecords / LazyMapping) + 'classifier', 'watermark';
+        None nếu không có snapshot, snapshot cũ hoặc lỗi
+    """
+    path = path or SNAPSHOT_DIR
+    manifest_path = os.path.join(path, "manifest.json") if path else None
+    if fingerprint is None or not manifest_path or not os.path.exists(manifest_path):
+        return None
+
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            return None
+        if manifest.get("fingerprint") != fingerprint:
+            print("ℹ️ Dữ liệu nguồn đã thay đổi, bỏ qua snapshot")
+            return None
+        if manifest.get("config_digest") != config_digest:
+            print("ℹ️ Cấu hình phân loại / bảng luật bất thường đã thay đổi, bỏ qua snapshot")
+            return None
+
+        result = {}
+        for name, info in manifest["tables"].items():
+            column = _Column(path, name)
+            result[name] = LazyMapping(column) if info["kind"] == "map" else LazyRecords(column)
+
+        result["classifier"] = None
+        classifier_path = os.path.join(path, "classifier.pkl")
+        if os.path.exists(classifier_path):
+            import joblib
+            result["classifier"] = joblib.load(classifier_path)
+
+        result["watermark"] = manifest.get("watermark")
+        return result
+
+    except Exception as e:
+        print(f"⚠️ Không đọc được snapshot: {e}")
+        return None
@@ -0,0 +1,1165 @@
+"""
+Module lưu trữ SQLite - cùng API với sqlserver_sync
+
+Dùng để chạy toàn bộ pipeline (load, phân loại, đồng bộ) trên máy không có
+SQL Server (Linux, CI, benchmark). Chọn bằng STORAGE_BACKEND=sqlite (xem storage.py).
+Tên hàm giữ nguyên như sqlserver_sync (load_students_from_sqlserver, ...) để
+các module gọi không phải đổi.
+
+Khác biệt so với SQL Server:
+- row_version được giả lập bằng trigger + bảng rowversion_counter
+- Index/ràng buộc được tạo ngay trong create_tables (không có bảng schema_migrations)
+- SQLite chỉ cho 1 giao dịch ghi tại 1 thời điểm nên sync_all_to_sqlserver luôn ghi tuần tự
+"""
+
+import os
+import sqlite3
+import time
+from dotenv import load_dotenv
+
+from db_pool import ConnectionPool
+from storage_common import (COURSE_CODE_TO_NAME, STUDENTS_QUERY, COURSE_SCORES_QUERY, STUDENTS_WITH_COURSES_QUERY,
+                            STUDENTS_BY_IDS_QUERY,
+                            _student_from_row, _course_from_row, _assemble_students,
+                            _classification_row, _batches, _student_row, _course_rows,
+                            student_fingerprint, classification_fingerprint, diff_fingerprints, SYNC_OWNED_TABLES,
+                            _fetch_dicts, COURSE_STATISTICS_COLUMNS, COURSE_STATISTICS_QUERY,
+                            CLASS_STATISTICS_COLUMNS, CLASS_STATISTICS_QUERY,
+                            CLASSIFICATION_RUN_COLUMNS, CLASSIFICATION_HISTORY_COLUMNS,
+                            CLASSIFICATION_DIFF_COLUMNS, CLASSIFICATION_DIFF_QUERY,
+                            CSV_DATA_COLUMNS, _csv_data_row, _exercise_row,
+                            INTEGRATED_TABLES, _run_on_connection, _read_course_counts,
+                            _rebuild_statistics_summaries, _read_statistics, _read_top_students,
+                            _read_import_checkpoint, _delete_import_checkpoint, _read_fingerprints,
+                            _fingerprint_hashes, _save_row_by_row)
+
+load_dotenv()
+
+# Đường dẫn file database SQLite
+SQLITE_PATH = os.getenv(
+    "SQLITE_PATH",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'student_classification.db')
+)
+
+# Dùng chung cấu hình với sqlserver_sync
+SQL_POOL_MAX_SIZE = int(os.getenv("SQL_POOL_MAX_SIZE", "10"))
+SQL_POOL_TIMEOUT = float(os.getenv("SQL_POOL_TIMEOUT", "30"))
+SQL_BATCH_SIZE = int(os.getenv("SQL_BATCH_SIZE", "1000"))
+SQL_FETCH_SIZE = int(os.getenv("SQL_FETCH_SIZE", "1000"))
+
+# Bảng có row_version (load tăng dần theo watermark)
+VERSIONED_TABLES = ("students", "student_csv_data", "course_scores")
+
+# Sinh viên có dòng thay đổi (students / student_csv_data / course_scores) sau watermark
+CHANGED_STUDENTS_QUERY = """
+    WITH changed AS (
+        SELECT student_id FROM students WHERE row_version > ?
+        UNION
+        SELECT student_id FROM student_csv_data WHERE row_version > ?
+        UNION
+        SELECT student_id FROM course_scores WHERE row_version > ?
+    )
+    SELECT s.student_id, s.name, s.class, s.khoa,
+           c.total_score, c.midterm_score, c.final_score,
+           c.attendance_rate, c.behavior_score_100,
+           c.late_submissions, c.assignment_completion,
+           c.study_hours_per_week, c.participation_score,
+           cs.id, COALESCE(cs.course_code, cs.course_name), cs.score, cs.midterm_score, cs.final_score,
+           cs.homework_score, cs.time_minutes
+    FROM changed ch
+    INNER JOIN students s ON s.student_id = ch.student_id
+    LEFT JOIN student_csv_data c ON s.student_id = c.student_id
+    LEFT JOIN course_scores cs ON s.student_id = cs.student_id
+    ORDER BY s.student_id
+"""
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS students (
+        student_id INTEGER PRIMARY KEY,
+        name TEXT,
+        class TEXT,
+        khoa TEXT DEFAULT 'Khoa Công Nghệ Thông Tin',
+        total_score REAL DEFAULT 0,
+        midterm_score REAL DEFAULT 0,
+        final_score REAL DEFAULT 0,
+        attendance_rate REAL DEFAULT 0,
+        behavior_score_100 INTEGER DEFAULT 50,
+        late_submissions INTEGER DEFAULT 0,
+        assignment_completion REAL DEFAULT 0,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        row_version INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS student_csv_data (
+        student_id INTEGER PRIMARY KEY,
+        total_score REAL DEFAULT 0,
+        midterm_score REAL DEFAULT 0,
+        final_score REAL DEFAULT 0,
+        homework_score REAL DEFAULT 0,
+        attendance_rate REAL DEFAULT 0,
+        behavior_score_100 INTEGER DEFAULT 50,
+        late_submissions INTEGER DEFAULT 0,
+        assignment_completion REAL DEFAULT 0,
+        study_hours_per_week REAL DEFAULT 0,
+        participation_score REAL DEFAULT 0,
+        row_version INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS course_scores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER REFERENCES students(student_id),
+        course_code TEXT,
+        course_name TEXT,
+        score REAL DEFAULT 0,
+        midterm_score REAL DEFAULT 0,
+        final_score REAL DEFAULT 0,
+        homework_score REAL DEFAULT 0,
+        time_minutes REAL DEFAULT 0,
+        row_version INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS classifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER REFERENCES students(student_id),
+        kmeans_prediction TEXT,
+        knn_prediction TEXT,
+        final_level TEXT,
+        anomaly_detected INTEGER DEFAULT 0,
+        anomaly_reason TEXT,
+        classified_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS skill_evaluations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER REFERENCES students(student_id),
+        course_name TEXT,
+        skill_name TEXT,
+        score REAL DEFAULT 0,
+        level TEXT,
+        passed INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_fingerprints (
+        entity TEXT NOT NULL,
+        student_id INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,
+        synced_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (entity, student_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rowversion_counter (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        value INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO rowversion_counter (id, value) VALUES (1, 0)",
+    """
+    CREATE TABLE IF NOT EXISTS course_statistics_summary (
+        course_key TEXT NOT NULL PRIMARY KEY,
+        total_students INTEGER,
+        score_sum REAL,
+        min_score REAL,
+        max_score REAL,
+        excellent INTEGER,
+        good INTEGER,
+        average INTEGER,
+        weak INTEGER,
+        total_time REAL,
+        refreshed_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS class_statistics_summary (
+        class_name TEXT NOT NULL PRIMARY KEY,
+        total_students INTEGER,
+        score_sum REAL,
+        min_score REAL,
+        max_score REAL,
+        xuat_sac INTEGER,
+        kha INTEGER,
+        trung_binh INTEGER,
+        yeu INTEGER,
+        refreshed_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS classification_runs (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        total_students INTEGER,
+        anomaly_count INTEGER,
+        normalization_method TEXT,
+        note TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS classification_history (
+        version INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        kmeans_prediction TEXT,
+        knn_prediction TEXT,
+        final_level TEXT,
+        anomaly_detected INTEGER,
+        anomaly_reason TEXT,
+        PRIMARY KEY (version, student_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE VIEW IF NOT EXISTS classification_latest AS
+    SELECT h.version, h.student_id, h.kmeans_prediction, h.knn_prediction,
+           h.final_level, h.anomaly_detected, h.anomaly_reason
+    FROM classification_history h
+    WHERE h.version = (SELECT MAX(x.version) FROM classification_history x
+                       WHERE x.student_id = h.student_id)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS exercise_details (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL,
+        course_code TEXT NOT NULL,
+        skill_code TEXT NOT NULL,
+        exercise_number INTEGER NOT NULL,
+        score REAL DEFAULT 0,
+        completion_time REAL DEFAULT 0,
+        is_anomaly INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        job TEXT NOT NULL PRIMARY KEY,
+        chunks_done INTEGER NOT NULL,
+        rows_done INTEGER NOT NULL,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS student_rankings (
+        student_id INTEGER NOT NULL PRIMARY KEY,
+        name TEXT,
+        class_name TEXT NOT NULL,
+        avg_score REAL,
+        ranking_score REAL,
+        score_points REAL,
+        attendance REAL,
+        attendance_points REAL,
+        late_submissions INTEGER,
+        ontime_points REAL,
+        total_time_hours REAL,
+        time_points REAL,
+        behavior_score REAL,
+        final_level TEXT,
+        anomaly_detected INTEGER,
+        rank_overall INTEGER,
+        rank_in_class INTEGER,
+        refreshed_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Cùng index/ràng buộc với MIGRATIONS của sqlserver_sync
+    "CREATE UNIQUE INDEX IF NOT EXISTS UX_course_scores_student_course ON course_scores (student_id, course_name)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS UX_classifications_student ON classifications (student_id)",
+    "CREATE INDEX IF NOT EXISTS IX_skill_evaluations_student_course ON skill_evaluations (student_id, course_name)",
+    "CREATE INDEX IF NOT EXISTS IX_classification_history_student ON classification_history (student_id, version DESC)",
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS UX_exercise_details_student_exercise
+    ON exercise_details (student_id, course_code, skill_code, exercise_number)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS IX_student_rankings_overall
+    ON student_rankings (anomaly_detected, rank_overall, student_id)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS IX_student_rankings_class
+    ON student_rankings (class_name, anomaly_detected, rank_in_class, student_id)
+    """,
+]
+
+# Trigger giả lập ROWVERSION: mỗi lần thêm/sửa dòng lấy giá trị mới từ rowversion_counter
+# (trigger UPDATE bỏ qua chính lệnh gán row_version của trigger)
+ROWVERSION_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_row_version_{event}
+    AFTER {event} ON {table}
+    {when}
+    BEGIN
+        UPDATE rowversion_counter SET value = value + 1 WHERE id = 1;
+        UPDATE {table} SET row_version = (SELECT value FROM rowversion_counter WHERE id = 1)
+        WHERE rowid = NEW.rowid;
+    END
+"""
+
+_pool = None
+
+
+def _connect():
+    """Tạo kết nối SQLite (WAL cho phép đọc song song trong lúc ghi)"""
+    conn = sqlite3.connect(SQLITE_PATH, timeout=SQL_POOL_TIMEOUT, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = OFF")
+    return conn
+
+
+def get_pool():
+    """Lấy (hoặc tạo) connection pool cho file SQLite"""
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(_connect, min_size=1, max_size=SQL_POOL_MAX_SIZE,
+                               timeout=SQL_POOL_TIMEOUT, idle_timeout=None)
+    return _pool
+
+
+def get_connection(database=None):
+    """
+    Lấy kết nối SQLite từ connection pool (database được bỏ qua, dùng SQLITE_PATH).
+    Gọi conn.close() để trả kết nối về pool.
+    """
+    try:
+        return get_pool().acquire()
+    except Exception as e:
+        print(f"❌ Lỗi kết nối SQLite: {e}")
+        return None
+
+
+def get_pool_stats():
+    """Thống kê connection pool"""
+    return {SQLITE_PATH: _pool.stats()} if _pool is not None else {}
+
+
+def close_pools():
+    """Đóng connection pool"""
+    global _pool
+    if _pool is not None:
+        _pool.close_all()
+        _pool = None
+
+
+def create_database():
+    """Tạo thư mục chứa file database nếu chưa có (SQLite tự tạo file khi kết nối)"""
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(SQLITE_PATH)), exist_ok=True)
+        print(f"✅ Database SQLite '{SQLITE_PATH}' đã sẵn sàng")
+        return True
+    except Exception as e:
+        print(f"❌ Lỗi tạo database: {e}")
+        return False
+
+
+def test_connection():
+    """Test kết nối SQLite"""
+    if not create_database():
+        return False
+
+    conn = get_connection()
+    if conn:
+        print(f"✅ Kết nối thành công đến SQLite: {SQLITE_PATH}")
+        conn.close()
+        return True
+    return False
+
+
+def create_tables():
+    """Tạo các bảng, index và trigger row_version trong SQLite"""
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cursor = conn.cursor()
+        for sql in SCHEMA:
+            cursor.execute(sql)
+        for table in VERSIONED_TABLES:
+            for event in ("INSERT", "UPDATE"):
+                when = "WHEN NEW.row_version IS OLD.row_version" if event == "UPDATE" else ""
+                cursor.execute(ROWVERSION_TRIGGER.format(table=table, event=event, when=when))
+        conn.commit()
+        print("✅ Đã tạo các bảng trong SQLite")
+        return True
+    except Exception as e:
+        print(f"❌ Lỗi tạo bảng: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def load_students_from_sqlserver():
+    """Load danh sách sinh viên (2 truy vấn: sinh viên + hành vi, toàn bộ course_scores)"""
+    conn = get_connection()
+    if not conn:
+        return []
+
+    cursor = conn.cursor()
+    students = []
+
+    try:
+        cursor.execute(STUDENTS_QUERY)
+        students = [_student_from_row(row) for row in cursor.fetchall()]
+        by_id = {s["student_id"]: s for s in students}
+
+        cursor.execute(COURSE_SCORES_QUERY)
+        for row in cursor.fetchall():
+            student = by_id.get(row[0])
+            if student is None:
+                continue
+            course_name, course_data = _course_from_row(row[1:])
+            student["courses"][course_name] = course_data
+
+        print(f"✅ Đã load {len(students)} sinh viên từ SQLite")
+
+    except Exception as e:
+        print(f"❌ Lỗi load dữ liệu: {e}")
+
+    conn.close()
+    return students
+
+
+def iter_students_from_sqlserver(chunk_size=None):
+    """
+    Đọc sinh viên dạng generator (1 cursor, fetchmany(chunk_size)), yield từng sinh viên
+    ngay khi đã gom đủ điểm các môn.
+    """
+    chunk_size = chunk_size or SQL_FETCH_SIZE
+    conn = get_connection()
+    if not conn:
+        return
+
+    count = 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute(STUDENTS_WITH_COURSES_QUERY)
+        for student in _assemble_students(cursor, chunk_size):
+            count += 1
+            yield student
+
+        print(f"✅ Đã load {count} sinh viên từ SQLite")
+
+    except Exception as e:
+        print(f"❌ Lỗi load dữ liệu: {e}")
+    finally:
+        conn.close()
+
+
+def get_current_watermark():
+    """Watermark hiện tại = giá trị row_version lớn nhất đã cấp"""
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM rowversion_counter WHERE id = 1")
+        row = cursor.fetchone()
+        return int(row[0]) if row else 0
+    except Exception as e:
+        print(f"❌ Lỗi đọc watermark: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def get_source_fingerprint():
+    """
+    Fingerprint dữ liệu nguồn: số dòng + row_version lớn nhất của từng bảng VERSIONED_TABLES,
+    số dòng + id lớn nhất của exercise_details (cùng quy ước với sqlserver_sync)
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        parts = []
+        # exercise_details không có row_version: số dòng + id lớn nhất (thấy thêm/xóa bài tập)
+        for table, version_column in (*((t, "row_version") for t in VERSIONED_TABLES), ("exercise_details", "id")):
+            cursor.execute(f"SELECT COUNT(*), COALESCE(MAX({version_column}), 0) FROM {table}")
+            count, max_version = cursor.fetchone()
+            parts.append(f"{table}:{count}:{max_version}")
+        return f"sqlite:{os.path.abspath(SQLITE_PATH)}|" + "|".join(parts)
+    except Exception as e:
+        print(f"❌ Lỗi đọc fingerprint dữ liệu nguồn: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def load_students_changed_since(watermark, chunk_size=None):
+    """
+    Load các sinh viên có thay đổi sau watermark (cùng quy ước với sqlserver_sync)
+
+    Returns:
+        (danh sách sinh viên thay đổi, watermark mới)
+    """
+    chunk_size = chunk_size or SQL_FETCH_SIZE
+
+    new_watermark = get_current_watermark()
+    if new_watermark is None:
+        return [], watermark
+
+    if watermark is None:
+        return list(iter_students_from_sqlserver(chunk_size)), new_watermark
+
+    conn = get_connection()
+    if not conn:
+        return [], watermark
+
+    students = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute(CHANGED_STUDENTS_QUERY, (watermark, watermark, watermark))
+        students = list(_assemble_students(cursor, chunk_size))
+        print(f"✅ Có {len(students)} sinh viên thay đổi kể từ watermark {watermark}")
+    except Exception as e:
+        print(f"❌ Lỗi load dữ liệu thay đổi: {e}")
+        new_watermark = watermark
+    finally:
+        conn.close()
+
+    return students, new_watermark
+
+
+def load_students_by_ids(student_ids, chunk_size=None):
+    """Load lại các sinh viên theo student_id (sinh viên không còn trong database bị bỏ qua)"""
+    chunk_size = chunk_size or SQL_FETCH_SIZE
+    if not student_ids:
+        return []
+
+    conn = get_connection()
+    if not conn:
+        return []
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS id_stage (student_id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM id_stage")
+        for batch in _batches([(sid,) for sid in set(student_ids)], SQL_BATCH_SIZE):
+            cursor.executemany("INSERT INTO id_stage (student_id) VALUES (?)", batch)
+        cursor.execute(STUDENTS_BY_IDS_QUERY.format(id_table="id_stage"))
+        students = list(_assemble_students(cursor, chunk_size))
+        cursor.execute("DELETE FROM id_stage")
+        conn.commit()
+        return students
+    except Exception as e:
+        print(f"❌ Lỗi load sinh viên theo id: {e}")
+        conn.rollback()
+        return []
+    finally:
+        conn.close()
+
+
+def load_student_course_counts():
+    """
+    Số môn của từng sinh viên hiện có trong database
+
+    Returns:
+        dict student_id -> số môn, None nếu lỗi
+    """
+    return _run_on_connection(get_connection, _read_course_counts, "Lỗi đọc số môn của sinh viên")
+
+
+def refresh_statistics_summaries():
+    """Tính lại bảng tổng hợp thống kê theo môn / theo lớp (GROUP BY) và bảng xếp hạng (RANK()) trong 1 giao dịch"""
+    return _run_on_connection(get_connection, _rebuild_statistics_summaries, "Lỗi cập nhật bảng thống kê",
+                              default=False, commit=True)
+
+
+def get_course_statistics(live=False):
+    """Thống kê theo môn học (xem COURSE_STATISTICS_COLUMNS), None nếu lỗi"""
+    return _run_on_connection(get_connection, lambda cursor: _read_statistics(
+        cursor, "course_statistics_summary", COURSE_STATISTICS_COLUMNS, COURSE_STATISTICS_QUERY, live
+    ), "Lỗi đọc thống kê")
+
+
+def get_class_statistics(live=False):
+    """Thống kê theo lớp (xem CLASS_STATISTICS_COLUMNS), None nếu lỗi"""
+    return _run_on_connection(get_connection, lambda cursor: _read_statistics(
+        cursor, "class_statistics_summary", CLASS_STATISTICS_COLUMNS, CLASS_STATISTICS_QUERY, live
+    ), "Lỗi đọc thống kê")
+
+
+def get_top_students(limit=10, class_name=None, course_name=None):
+    """Top N sinh viên (không bất thường) từ student_rankings (xem STUDENT_RANKINGS_COLUMNS), None nếu lỗi"""
+    return _run_on_connection(get_connection, lambda cursor: _read_top_students(
+        cursor, "LIMIT ?", limit, class_name, course_name
+    ), "Lỗi đọc bảng xếp hạng")
+
+
+def load_integrated_tables():
+    """Dữ liệu cho IntegratedScoringSystem (xem INTEGRATED_TABLES), điểm bài tập tính bằng GROUP BY; None nếu lỗi"""
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        tables = {}
+        for table, (columns, query) in INTEGRATED_TABLES.items():
+            cursor.execute(query)
+            tables[table] = _fetch_dicts(cursor, columns)
+        return tables
+    except Exception as e:
+        print(f"❌ Lỗi đọc dữ liệu điểm tích hợp: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+UPSERT_STUDENT = """
+    INSERT INTO students (student_id, name, class, khoa, total_score, midterm_score,
+                          final_score, attendance_rate, behavior_score_100,
+                          late_submissions, assignment_completion)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (student_id) DO UPDATE SET
+        name = excluded.name,
+        class = excluded.class,
+        khoa = excluded.khoa,
+        total_score = excluded.total_score,
+        midterm_score = excluded.midterm_score,
+        final_score = excluded.final_score,
+        attendance_rate = excluded.attendance_rate,
+        behavior_score_100 = excluded.behavior_score_100,
+        late_submissions = excluded.late_submissions,
+        assignment_completion = excluded.assignment_completion,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+UPSERT_COURSE = """
+    INSERT INTO course_scores (student_id, course_name, score, midterm_score,
+                               final_score, homework_score, time_minutes)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (student_id, course_name) DO UPDATE SET
+        score = excluded.score,
+        midterm_score = excluded.midterm_score,
+        final_score = excluded.final_score,
+        homework_score = excluded.homework_score,
+        time_minutes = excluded.time_minutes
+"""
+
+UPSERT_CLASSIFICATION = """
+    INSERT INTO classifications (student_id, kmeans_prediction, knn_prediction,
+                                 final_level, anomaly_detected, anomaly_reason)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (student_id) DO UPDATE SET
+        kmeans_prediction = excluded.kmeans_prediction,
+        knn_prediction = excluded.knn_prediction,
+        final_level = excluded.final_level,
+        anomaly_detected = excluded.anomaly_detected,
+        anomaly_reason = excluded.anomaly_reason,
+        classified_at = CURRENT_TIMESTAMP
+"""
+
+UPSERT_CSV_DATA = f"""
+    INSERT INTO student_csv_data (student_id, {', '.join(CSV_DATA_COLUMNS)})
+    VALUES ({', '.join('?' * (len(CSV_DATA_COLUMNS) + 1))})
+    ON CONFLICT (student_id) DO UPDATE SET
+        {', '.join(f'{column} = excluded.{column}' for column in CSV_DATA_COLUMNS)}
+"""
+
+UPSERT_EXERCISE = """
+    INSERT INTO exercise_details (student_id, course_code, skill_code, exercise_number,
+                                  score, completion_time, is_anomaly)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (student_id, course_code, skill_code, exercise_number) DO UPDATE SET
+        score = excluded.score,
+        completion_time = excluded.completion_time,
+        is_anomaly = excluded.is_anomaly
+"""
+
+UPSERT_FINGERPRINT = """
+    INSERT INTO sync_fingerprints (entity, student_id, content_hash)
+    VALUES (?, ?, ?)
+    ON CONFLICT (entity, student_id) DO UPDATE SET
+        content_hash = excluded.content_hash,
+        synced_at = CURRENT_TIMESTAMP
+"""
+
+
+def save_student(student):
+    """Lưu thông tin + điểm môn học của 1 sinh viên"""
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(UPSERT_STUDENT, _student_row(student))
+        cursor.executemany(UPSERT_COURSE, _course_rows(student))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"❌ Lỗi lưu sinh viên {student.get('student_id')}: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def save_classification(student):
+    """Lưu kết quả phân loại của 1 sinh viên"""
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        conn.execute(UPSERT_CLASSIFICATION, _classification_row(student))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"❌ Lỗi lưu phân loại: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def _merge_fingerprints(cursor, entity, hashes, batch_size):
+    """Ghi fingerprint {student_id: hash} trong giao dịch hiện tại của cursor"""
+    rows = [(entity, student_id, content_hash) for student_id, content_hash in hashes.items()]
+    for batch in _batches(rows, batch_size):
+        cursor.executemany(UPSERT_FINGERPRINT, batch)
+
+
+INSERT_CLASSIFICATION_HISTORY = """
+    INSERT INTO classification_history (version, student_id, kmeans_prediction, knn_prediction,
+                                        final_level, anomaly_detected, anomaly_reason)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def save_classifications_bulk(students, batch_size=None, record_history=False, run_info=None):
+    """
+    Lưu kết quả phân loại của cả lượt chạy trong 1 giao dịch (upsert theo student_id)
+
+    Args:
+        record_history: True = ghi lượt chạy thành 1 version mới trong classification_runs
+                        và thêm kết quả vào classification_history (cùng giao dịch)
+        run_info: dict thông tin lượt chạy (normalization_method, note)
+
+    Returns:
+        dict: success, rows, updated, inserted, version, elapsed_seconds
+    """
+    start = time.perf_counter()
+    batch_size = batch_size or SQL_BATCH_SIZE
+    run_info = run_info or {}
+
+    rows_by_id = {}
+    for student in students:
+        if student.get("student_id") is not None:
+            rows_by_id[student.get("student_id")] = _classification_row(student)
+    rows = list(rows_by_id.values())
+
+    result = {"success": False, "rows": len(rows), "updated": 0, "inserted": 0,
+              "version": None, "elapsed_seconds": 0}
+
+    conn = get_connection()
+    if not conn:
+        return result
+
+    try:
+        cursor = conn.cursor()
+        # Ghi tuần tự (1 giao dịch ghi) nên đếm trước/sau là chính xác
+        before = cursor.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        for batch in _batches(rows, batch_size):
+            cursor.executemany(UPSERT_CLASSIFICATION, batch)
+        result["inserted"] = cursor.execute("SELECT COUNT(*) FROM classifications").fetchone()[0] - before
+        result["updated"] = len(rows) - result["inserted"]
+
+        if record_history:
+            cursor.execute("""
+                INSERT INTO classification_runs (total_students, anomaly_count, normalization_method, note)
+                VALUES (?, ?, ?, ?)
+            """, (len(rows), sum(row[4] for row in rows),
+                  run_info.get("normalization_method"), run_info.get("note")))
+            result["version"] = cursor.lastrowid
+            for batch in _batches(rows, batch_size):
+                cursor.executemany(INSERT_CLASSIFICATION_HISTORY,
+                                   [(result["version"], *row) for row in batch])
+
+        _merge_fingerprints(cursor, "classification", {
+            student.get("student_id"): classification_fingerprint(student)
+            for student in students if student.get("student_id") is not None
+        }, batch_size)
+        conn.commit()
+        result["success"] = True
+
+    except Exception as e:
+        print(f"❌ Lỗi lưu phân loại hàng loạt: {e}")
+        result["error"] = str(e)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _fetch_history(query, params, columns, action):
+    """Chạy 1 truy vấn đọc lịch sử phân loại, trả list dict hoặc None nếu lỗi"""
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return _fetch_dicts(cursor, columns)
+    except Exception as e:
+        print(f"❌ Lỗi {action}: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def get_classification_runs(limit=20):
+    """Các lượt phân loại gần nhất, mới nhất trước (xem CLASSIFICATION_RUN_COLUMNS)"""
+    return _fetch_history(f"""
+        SELECT {', '.join(CLASSIFICATION_RUN_COLUMNS)}
+        FROM classification_runs
+        ORDER BY version DESC
+        LIMIT ?
+    """, (limit,), CLASSIFICATION_RUN_COLUMNS, "đọc lượt phân loại")
+
+
+def load_classification_version(version=None):
+    """Kết quả phân loại của 1 version, mặc định version mới nhất (xem CLASSIFICATION_HISTORY_COLUMNS)"""
+    return _fetch_history(f"""
+        SELECT {', '.join(CLASSIFICATION_HISTORY_COLUMNS)}
+        FROM classification_history
+        WHERE version = COALESCE(?, (SELECT MAX(version) FROM classification_runs))
+        ORDER BY student_id
+    """, (version,), CLASSIFICATION_HISTORY_COLUMNS, "đọc lịch sử phân loại")
+
+
+def diff_classification_versions(old_version, new_version):
+    """Các sinh viên có kết quả khác nhau giữa 2 version (xem CLASSIFICATION_DIFF_COLUMNS)"""
+    return _fetch_history(CLASSIFICATION_DIFF_QUERY, (old_version, new_version),
+                          CLASSIFICATION_DIFF_COLUMNS, "so sánh lịch sử phân loại")
+
+
+def save_students_bulk(students, batch_size=None):
+    """
+    Lưu thông tin + điểm môn học của nhiều sinh viên trong 1 giao dịch (executemany + upsert)
+
+    Returns:
+        dict: success, students, courses, elapsed_seconds
+    """
+    start = time.perf_counter()
+    batch_size = batch_size or SQL_BATCH_SIZE
+
+    student_rows = {}
+    course_rows = {}
+    for student in students:
+        if student.get("student_id") is None:
+            continue
+        student_rows[student.get("student_id")] = _student_row(student)
+        for row in _course_rows(student):
+            course_rows[(row[0], row[1])] = row
+
+    result = {"success": False, "students": len(student_rows), "courses": len(course_rows), "elapsed_seconds": 0}
+
+    conn = get_connection()
+    if not conn:
+        return result
+
+    try:
+        cursor = conn.cursor()
+        for batch in _batches(list(student_rows.values()), batch_size):
+            cursor.executemany(UPSERT_STUDENT, batch)
+        for batch in _batches(list(course_rows.values()), batch_size):
+            cursor.executemany(UPSERT_COURSE, batch)
+
+        _merge_fingerprints(cursor, "student", {
+            student.get("student_id"): student_fingerprint(student)
+            for student in students if student.get("student_id") is not None
+        }, batch_size)
+        conn.commit()
+        result["success"] = True
+
+    except Exception as e:
+        print(f"❌ Lỗi lưu sinh viên hàng loạt: {e}")
+        result["error"] = str(e)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def load_import_checkpoint(job):
+    """Checkpoint của 1 lượt import: dict chunks_done, rows_done (0 nếu chưa có), None nếu lỗi"""
+    return _run_on_connection(get_connection, lambda cursor: _read_import_checkpoint(cursor, job),
+                              "Lỗi đọc checkpoint import")
+
+
+def reset_import_checkpoint(job):
+    """Xóa checkpoint để import lại từ đầu"""
+    return _run_on_connection(get_connection, lambda cursor: _delete_import_checkpoint(cursor, job),
+                              "Lỗi xóa checkpoint import", default=False, commit=True)
+
+
+def import_chunk(job, chunk_no, rows_done, students=(), exercises=(), batch_size=None):
+    """
+    Ghi 1 chunk dữ liệu import và checkpoint của chunk trong cùng 1 giao dịch
+
+    Returns:
+        dict: success, students, courses, exercises, elapsed_seconds
+    """
+    start = time.perf_counter()
+    batch_size = batch_size or SQL_BATCH_SIZE
+
+    student_rows = {}
+    csv_rows = {}
+    course_rows = {}
+    for student in students:
+        if student.get("student_id") is None:
+            continue
+        student_rows[student.get("student_id")] = _student_row(student)
+        csv_rows[student.get("student_id")] = _csv_data_row(student)
+        for row in _course_rows(student):
+            course_rows[(row[0], row[1])] = row
+    exercise_rows = {}
+    for exercise in exercises:
+        row = _exercise_row(exercise)
+        if None not in row[:4]:
+            exercise_rows[row[:4]] = row
+
+    result = {"success": False, "students": len(student_rows), "courses": len(course_rows),
+              "exercises": len(exercise_rows), "elapsed_seconds": 0}
+
+    conn = get_connection()
+    if not conn:
+        return result
+
+    try:
+        cursor = conn.cursor()
+        for sql, rows in ((UPSERT_STUDENT, student_rows), (UPSERT_CSV_DATA, csv_rows),
+                          (UPSERT_COURSE, course_rows), (UPSERT_EXERCISE, exercise_rows)):
+            for batch in _batches(list(rows.values()), batch_size):
+                cursor.executemany(sql, batch)
+
+        cursor.execute("""
+            INSERT INTO import_checkpoints (job, chunks_done, rows_done)
+            VALUES (?, ?, ?)
+            ON CONFLICT (job) DO UPDATE SET
+                chunks_done = excluded.chunks_done,
+                rows_done = excluded.rows_done,
+                updated_at = CURRENT_TIMESTAMP
+        """, (job, chunk_no + 1, rows_done))
+        conn.commit()
+        result["success"] = True
+
+    except Exception as e:
+        print(f"❌ Lỗi import chunk {chunk_no}: {e}")
+        result["error"] = str(e)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _delete_by_ids(tables, student_ids, batch_size, entity=None):
+    """Xóa các dòng theo student_id trong các bảng (1 giao dịch), trả về số dòng xóa ở bảng cuối"""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Không lấy được kết nối SQLite")
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS id_stage (student_id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM id_stage")
+        for batch in _batches([(sid,) for sid in set(student_ids)], batch_size):
+            cursor.executemany("INSERT INTO id_stage (student_id) VALUES (?)", batch)
+
+        deleted = 0
+        for table in tables:
+            cursor.execute(f"DELETE FROM {table} WHERE student_id IN (SELECT student_id FROM id_stage)")
+            deleted = cursor.rowcount
+
+        fingerprint_filter = "AND entity = ?" if entity else ""
+        cursor.execute(f"""
+            DELETE FROM sync_fingerprints
+            WHERE student_id IN (SELECT student_id FROM id_stage) {fingerprint_filter}
+        """, (entity,) if entity else ())
+        cursor.execute("DELETE FROM id_stage")
+        conn.commit()
+        return deleted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def delete_students_bulk(student_ids, batch_size=None):
+    """
+    Xóa sinh viên (và dữ liệu do sync ghi: SYNC_OWNED_TABLES, fingerprint) theo danh sách
+    student_id trong 1 giao dịch. Không xóa dữ liệu nguồn của import (student_csv_data, exercise_details).
+
+    Returns:
+        dict: success, deleted, elapsed_seconds
+    """
+    start = time.perf_counter()
+    result = {"success": False, "deleted": 0, "elapsed_seconds": 0}
+    if not student_ids:
+        result["success"] = True
+        return result
+
+    try:
+        # Chỉ bảng do sync ghi (bảng con trước, students sau cùng)
+        result["deleted"] = _delete_by_ids(SYNC_OWNED_TABLES, student_ids, batch_size or SQL_BATCH_SIZE)
+        result["success"] = True
+    except Exception as e:
+        print(f"❌ Lỗi xóa sinh viên: {e}")
+        result["error"] = str(e)
+
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def delete_classifications_bulk(student_ids, batch_size=None):
+    """
+    Xóa kết quả phân loại theo danh sách student_id trong 1 giao dịch
+
+    Returns:
+        dict: success, deleted, elapsed_seconds
+    """
+    start = time.perf_counter()
+    result = {"success": False, "deleted": 0, "elapsed_seconds": 0}
+    if not student_ids:
+        result["success"] = True
+        return result
+
+    try:
+        result["deleted"] = _delete_by_ids(
+            ("classifications",), student_ids, batch_size or SQL_BATCH_SIZE, entity="classification"
+        )
+        result["success"] = True
+    except Exception as e:
+        print(f"❌ Lỗi xóa phân loại: {e}")
+        result["error"] = str(e)
+
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def load_fingerprints(entity):
+    """
+    Load fingerprint đã đồng bộ của 1 loại dữ liệu ('student' | 'classification')
+
+    Returns:
+        dict {student_id: content_hash}, hoặc None nếu không đọc được
+    """
+    return _run_on_connection(get_connection, lambda cursor: _read_fingerprints(cursor, entity),
+                              "Lỗi load fingerprint")
+
+
+def save_fingerprints(entity, records, fingerprint_func, batch_size=None):
+    """Ghi fingerprint cho các bản ghi đã được lưu bằng đường ghi từng dòng"""
+    hashes = _fingerprint_hashes(records, fingerprint_func)
+    if not hashes:
+        return True
+    return _run_on_connection(get_connection, lambda cursor: _merge_fingerprints(
+        cursor, entity, hashes, batch_size or SQL_BATCH_SIZE
+    ) or True, "Lỗi lưu fingerprint", default=False, commit=True)
+
+
+def sync_all_to_sqlserver(students, classifications, bulk=True, batch_size=None, delta=True, workers=None,
+                          prune=False):
+    """
+    Đồng bộ tất cả dữ liệu vào SQLite (cùng tham số và báo cáo với sqlserver_sync).
+    workers được bỏ qua: SQLite chỉ có 1 luồng ghi tại 1 thời điểm.
+    """
+    print("\n📤 Đang đồng bộ dữ liệu vào SQLite...")
+    start = time.perf_counter()
+
+    create_tables()
+
+    report = {
+        "success": True,
+        "mode": "bulk" if bulk else "row",
+        "delta": delta,
+        "workers": 1,
+        "students_saved": 0,
+        "courses_saved": 0,
+        "classifications_saved": 0,
+        "errors": [],
+        "elapsed_seconds": 0
+    }
+
+    students_to_write, students_to_delete = students, []
+    classifications_to_write, classifications_to_delete = classifications, []
+    if delta:
+        students_to_write, students_to_delete, report["students"] = diff_fingerprints(
+            load_fingerprints("student"), students, student_fingerprint)
+        classifications_to_write, classifications_to_delete, report["classifications"] = diff_fingerprints(
+            load_fingerprints("classification"), classifications, classification_fingerprint)
+        if not prune:
+            # Danh sách truyền vào có thể chỉ là 1 phần dữ liệu: không xóa bản ghi vắng mặt
+            for stats, missing in ((report["students"], students_to_delete),
+                                   (report["classifications"], classifications_to_delete)):
+                stats["missing"] = len(missing)
+                stats["deleted"] = 0
+            students_to_delete, classifications_to_delete = [], []
+
+    if bulk:
+        result = save_students_bulk(students_to_write, batch_size)
+        if result["success"]:
+            report["students_saved"] = result["students"]
+            report["courses_saved"] = result["courses"]
+        else:
+            report["errors"].append({"table": "students", **result})
+
+        result = save_classifications_bulk(classifications_to_write, batch_size)
+        if result["success"]:
+            report["classifications_saved"] = result["rows"]
+        else:
+            report["errors"].append({"table": "classifications", **result})
+    else:
+        saved_students, error = _save_row_by_row(students_to_write, save_student, "students")
+        report["students_saved"] = len(saved_students)
+        report["courses_saved"] = sum(len(s.get("courses", {})) for s in saved_students)
+        if error:
+            report["errors"].append(error)
+
+        saved_classifications, error = _save_row_by_row(classifications_to_write, save_classification,
+                                                        "classifications")
+        report["classifications_saved"] = len(saved_classifications)
+        if error:
+            report["errors"].append(error)
+
+        save_fingerprints("student", saved_students, student_fingerprint, batch_size)
+        save_fingerprints("classification", saved_classifications, classification_fingerprint, batch_size)
+
+    if classifications_to_delete:
+        result = delete_classifications_bulk(classifications_to_delete, batch_size)
+        if not result["success"]:
+            report["errors"].append({"table": "classifications", **result})
+    if students_to_delete:
+        result = delete_students_bulk(students_to_delete, batch_size)
+        if not result["success"]:
+            report["errors"].append({"table": "students", **result})
+
+    report["success"] = not report["errors"]
+    print(f"   ✅ Đã lưu {report['students_saved']}/{len(students)} sinh viên")
+    print(f"   ✅ Đã lưu {report['classifications_saved']}/{len(classifications)} kết quả phân loại")
+    if delta:
+        print(f"   ⏭️ Bỏ qua (không đổi): {report['students']['skipped']} sinh viên, "
+              f"{report['classifications']['skipped']} kết quả phân loại")
+    if report["errors"]:
+        print(f"   ⚠️ {len(report['errors'])} phần đồng bộ bị lỗi")
+
+    # Dữ liệu thay đổi -> tính lại bảng thống kê tổng hợp
+    if report["students_saved"] or report["classifications_saved"] or students_to_delete or classifications_to_delete:
+        refresh_statistics_summaries()
+
+    report["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return report
@@ -4,8 +4,27 @@ Module kết nối và đồng bộ dữ liệu với SQL Server
 
 import pyodbc
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
+from db_pool import ConnectionPool
+from storage_common import (COURSE_CODE_TO_NAME, STUDENTS_QUERY, COURSE_SCORES_QUERY, STUDENTS_WITH_COURSES_QUERY,
+                            STUDENTS_BY_IDS_QUERY,
+                            _student_from_row, _course_from_row, _assemble_students,
+                            _classification_row, _batches, _student_row, _course_rows,
+                            student_fingerprint, classification_fingerprint, diff_fingerprints, SYNC_OWNED_TABLES,
+                            _partition_by_id, _fetch_dicts, COURSE_STATISTICS_COLUMNS, COURSE_STATISTICS_QUERY,
+                            CLASS_STATISTICS_COLUMNS, CLASS_STATISTICS_QUERY,
+                            CLASSIFICATION_RUN_COLUMNS, CLASSIFICATION_HISTORY_COLUMNS,
+                            CLASSIFICATION_DIFF_COLUMNS, CLASSIFICATION_DIFF_QUERY,
+                            CSV_DATA_COLUMNS, _csv_data_row, EXERCISE_COLUMNS, _exercise_row,
+                            INTEGRATED_TABLES, _run_on_connection, _read_course_counts,
+                            _rebuild_statistics_summaries, _read_statistics, _read_top_students,
+                            _read_import_checkpoint, _delete_import_checkpoint, _read_fingerprints,
+                            _fingerprint_hashes, _save_row_by_row)
+
 load_dotenv()
 
 # Cấu hình SQL Server
@@ -15,59 +34,120 @@ SQL_USERNAME = os.getenv("SQL_USERNAME", "")  # Để trống nếu dùng Window
 SQL_PASSWORD = os.getenv("SQL_PASSWORD", "")  # Để trống nếu dùng Windows Auth
 SQL_DRIVER = os.getenv("SQL_DRIVER", "ODBC Driver 17 for SQL Server")
 
+# Sinh viên có dòng thay đổi (students / student_csv_data / course_scores) sau watermark
+CHANGED_STUDENTS_QUERY = """
+    WITH changed AS (
+        SELECT student_id FROM students
+        WHERE row_version > CAST(CAST(? AS BIGINT) AS BINARY(8))
+        UNION
+        SELECT student_id FROM student_csv_data
+        WHERE row_version > CAST(CAST(? AS BIGINT) AS BINARY(8))
+        UNION
+        SELECT student_id FROM course_scores
+        WHERE row_version > CAST(CAST(? AS BIGINT) AS BINARY(8))
+    )
+    SELECT s.student_id, s.name, s.class, s.khoa,
+           c.total_score, c.midterm_score, c.final_score, 
+           c.attendance_rate, c.behavior_score_100, 
+           c.late_submissions, c.assignment_completion,
+           c.study_hours_per_week, c.participation_score,
+           cs.id, COALESCE(cs.course_code, cs.course_name), cs.score, cs.midterm_score, cs.final_score,
+           cs.homework_score, cs.time_minutes
+    FROM changed ch
+    INNER JOIN students s ON s.student_id = ch.student_id
+    LEFT JOIN student_csv_data c ON s.student_id = c.student_id
+    LEFT JOIN course_scores cs ON s.student_id = cs.student_id
+    ORDER BY s.student_id
+"""
+
+# Cấu hình connection pool
+SQL_POOL_MIN_SIZE = int(os.getenv("SQL_POOL_MIN_SIZE", "1"))
+SQL_POOL_MAX_SIZE = int(os.getenv("SQL_POOL_MAX_SIZE", "10"))
+SQL_POOL_TIMEOUT = float(os.getenv("SQL_POOL_TIMEOUT", "30"))
+SQL_POOL_IDLE_TIMEOUT = float(os.getenv("SQL_POOL_IDLE_TIMEOUT", "300"))
+
+# Số dòng mỗi lô khi ghi hàng loạt (fast_executemany)
+SQL_BATCH_SIZE = int(os.getenv("SQL_BATCH_SIZE", "1000"))
+
+# Số luồng ghi song song mặc định của sync_all_to_sqlserver (mỗi luồng 1 kết nối)
+SQL_SYNC_WORKERS = int(os.getenv("SQL_SYNC_WORKERS", "1"))
+
+# Số dòng mỗi lần fetchmany khi đọc dạng stream
+SQL_FETCH_SIZE = int(os.getenv("SQL_FETCH_SIZE", "1000"))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _connection_string(database):
+    """Tạo connection string cho database"""
+    if SQL_USERNAME and SQL_PASSWORD:
+        # SQL Server Authentication
+        return (
+            f"DRIVER={{{SQL_DRIVER}}};"
+            f"SERVER={SQL_SERVER};"
+            f"DATABASE={database};"
+            f"UID={SQL_USERNAME};"
+            f"PWD={SQL_PASSWORD};"
+            "TrustServerCertificate=yes;"
+        )
+    # Windows Authentication
+    return (
+        f"DRIVER={{{SQL_DRIVER}}};"
+        f"SERVER={SQL_SERVER};"
+        f"DATABASE={database};"
+        "Trusted_Connection=yes;"
+        "TrustServerCertificate=yes;"
+    )
+
+def get_pool(database=None):
+    """Lấy (hoặc tạo) connection pool cho database"""
+    db = database or SQL_DATABASE
+    with _pools_lock:
+        pool = _pools.get(db)
+        if pool is None:
+            conn_str = _connection_string(db)
+            pool = ConnectionPool(
+                lambda: pyodbc.connect(conn_str),
+                min_size=SQL_POOL_MIN_SIZE,
+                max_size=SQL_POOL_MAX_SIZE,
+                timeout=SQL_POOL_TIMEOUT,
+                idle_timeout=SQL_POOL_IDLE_TIMEOUT,
+                # Lỗi mức kết nối (mất kết nối, ...): đóng hẳn, không trả kết nối về pool
+                broken_errors=(pyodbc.OperationalError, pyodbc.InterfaceError)
+            )
+            _pools[db] = pool
+        return pool
+
 def get_connection(database=None):
-    """Tạo kết nối đến SQL Server"""
+    """
+    Lấy kết nối đến SQL Server từ connection pool.
+    Gọi conn.close() để trả kết nối về pool.
+    """
     try:
-        db = database or SQL_DATABASE
-        if SQL_USERNAME and SQL_PASSWORD:
-            # SQL Server Authentication
-            conn_str = (
-                f"DRIVER={{{SQL_DRIVER}}};"
-                f"SERVER={SQL_SERVER};"
-                f"DATABASE={db};"
-                f"UID={SQL_USERNAME};"
-                f"PWD={SQL_PASSWORD};"
-                "TrustServerCertificate=yes;"
-            )
-        else:
-            # Windows Authentication
-            conn_str = (
-                f"DRIVER={{{SQL_DRIVER}}};"
-                f"SERVER={SQL_SERVER};"
-                f"DATABASE={db};"
-                "Trusted_Connection=yes;"
-                "TrustServerCertificate=yes;"
-            )
-        
-        conn = pyodbc.connect(conn_str)
-        return conn
+        return get_pool(database).acquire()
     except Exception as e:
         print(f"❌ Lỗi kết nối SQL Server: {e}")
         return None
 
+def get_pool_stats():
+    """Thống kê các connection pool (checkouts, waits, creations, ...)"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {db: pool.stats() for db, pool in pools.items()}
+
+def close_pools():
+    """Đóng toàn bộ connection pool"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
 def create_database():
     """Tạo database nếu chưa tồn tại"""
     try:
         # Kết nối đến master database
-        if SQL_USERNAME and SQL_PASSWORD:
-            conn_str = (
-                f"DRIVER={{{SQL_DRIVER}}};"
-                f"SERVER={SQL_SERVER};"
-                f"DATABASE=master;"
-                f"UID={SQL_USERNAME};"
-                f"PWD={SQL_PASSWORD};"
-                "TrustServerCertificate=yes;"
-            )
-        else:
-            conn_str = (
-                f"DRIVER={{{SQL_DRIVER}}};"
-                f"SERVER={SQL_SERVER};"
-                f"DATABASE=master;"
-                "Trusted_Connection=yes;"
-                "TrustServerCertificate=yes;"
-            )
-        
-        conn = pyodbc.connect(conn_str, autocommit=True)
+        conn = pyodbc.connect(_connection_string("master"), autocommit=True)
         cursor = conn.cursor()
         
         # Kiểm tra và tạo database
@@ -99,6 +179,295 @@ def test_connection():
         return True
     return False
 
+# Chuyển code môn học -> tên đầy đủ trong SQL (dùng khi backfill course_name)
+_COURSE_NAME_CASE = "CASE course_code " + " ".join(
+    f"WHEN '{code}' THEN N'{name}'" for code, name in COURSE_CODE_TO_NAME.items()
+) + " ELSE course_code END"
+
+# Migration schema theo phiên bản: (version, mô tả, [câu lệnh]).
+# Mỗi câu lệnh tự kiểm tra trạng thái (IF NOT EXISTS / COL_LENGTH) nên chạy lại vẫn an toàn.
+# Chỉ thêm migration mới vào cuối danh sách, không sửa migration đã phát hành.
+MIGRATIONS = [
+    (1, "course_scores: đủ cột course_code + course_name, backfill course_name", [
+        """
+        IF COL_LENGTH('course_scores', 'course_code') IS NULL
+        ALTER TABLE course_scores ADD course_code NVARCHAR(20) NULL
+        """,
+        """
+        IF COL_LENGTH('course_scores', 'course_name') IS NULL
+        ALTER TABLE course_scores ADD course_name NVARCHAR(100) NULL
+        """,
+        f"""
+        UPDATE course_scores SET course_name = {_COURSE_NAME_CASE}
+        WHERE course_name IS NULL AND course_code IS NOT NULL
+        """,
+    ]),
+    (2, "course_scores: unique (student_id, course_name) cho MERGE + tra cứu theo sinh viên", [
+        # Giữ lại dòng mới nhất nếu trùng môn
+        """
+        WITH ranked AS (
+            SELECT ROW_NUMBER() OVER (PARTITION BY student_id, course_name ORDER BY id DESC) AS rn
+            FROM course_scores
+        )
+        DELETE FROM ranked WHERE rn > 1
+        """,
+        # student_id đứng đầu nên index này phục vụ luôn WHERE student_id = ?
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'UX_course_scores_student_course' AND object_id = OBJECT_ID('course_scores'))
+        CREATE UNIQUE INDEX UX_course_scores_student_course
+            ON course_scores (student_id, course_name)
+            INCLUDE (course_code, score, midterm_score, final_score, homework_score, time_minutes)
+        """,
+    ]),
+    (3, "classifications: unique student_id (1 kết quả/sinh viên)", [
+        """
+        WITH ranked AS (
+            SELECT ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY id DESC) AS rn
+            FROM classifications
+        )
+        DELETE FROM ranked WHERE rn > 1
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'UX_classifications_student' AND object_id = OBJECT_ID('classifications'))
+        CREATE UNIQUE INDEX UX_classifications_student
+            ON classifications (student_id)
+            INCLUDE (kmeans_prediction, knn_prediction, final_level,
+                     anomaly_detected, anomaly_reason, classified_at)
+        """,
+    ]),
+    (4, "skill_evaluations: index (student_id, course_name)", [
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'IX_skill_evaluations_student_course' AND object_id = OBJECT_ID('skill_evaluations'))
+        CREATE INDEX IX_skill_evaluations_student_course
+            ON skill_evaluations (student_id, course_name)
+            INCLUDE (skill_name, score, level, passed)
+        """,
+    ]),
+    (5, "bảng tổng hợp thống kê theo môn / theo lớp", [
+        """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='course_statistics_summary' AND xtype='U')
+        CREATE TABLE course_statistics_summary (
+            course_key NVARCHAR(100) NOT NULL PRIMARY KEY,
+            total_students INT,
+            score_sum FLOAT,
+            min_score FLOAT,
+            max_score FLOAT,
+            excellent INT,
+            good INT,
+            average INT,
+            weak INT,
+            total_time FLOAT,
+            refreshed_at DATETIME DEFAULT GETDATE()
+        )
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='class_statistics_summary' AND xtype='U')
+        CREATE TABLE class_statistics_summary (
+            class_name NVARCHAR(50) NOT NULL PRIMARY KEY,
+            total_students INT,
+            score_sum FLOAT,
+            min_score FLOAT,
+            max_score FLOAT,
+            xuat_sac INT,
+            kha INT,
+            trung_binh INT,
+            yeu INT,
+            refreshed_at DATETIME DEFAULT GETDATE()
+        )
+        """,
+    ]),
+    (6, "lịch sử phân loại theo version (classification_runs + classification_history)", [
+        """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='classification_runs' AND xtype='U')
+        CREATE TABLE classification_runs (
+            version INT IDENTITY(1,1) PRIMARY KEY,
+            created_at DATETIME DEFAULT GETDATE(),
+            total_students INT,
+            anomaly_count INT,
+            normalization_method NVARCHAR(20),
+            note NVARCHAR(500)
+        )
+        """,
+        # Clustered theo (version, student_id): lượt mới luôn ghi vào cuối index (không phân mảnh),
+        # đọc / so sánh 1 version là range seek
+        """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='classification_history' AND xtype='U')
+        CREATE TABLE classification_history (
+            version INT NOT NULL,
+            student_id INT NOT NULL,
+            kmeans_prediction NVARCHAR(50),
+            knn_prediction NVARCHAR(50),
+            final_level NVARCHAR(50),
+            anomaly_detected BIT,
+            anomaly_reason NVARCHAR(500),
+            CONSTRAINT PK_classification_history PRIMARY KEY CLUSTERED (version, student_id)
+        )
+        """,
+        # Lịch sử của 1 sinh viên / version mới nhất của sinh viên: seek theo student_id
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'IX_classification_history_student' AND object_id = OBJECT_ID('classification_history'))
+        CREATE INDEX IX_classification_history_student
+            ON classification_history (student_id, version DESC)
+            INCLUDE (kmeans_prediction, knn_prediction, final_level, anomaly_detected, anomaly_reason)
+        """,
+        # Kết quả mới nhất của từng sinh viên theo lịch sử
+        # (bảng classifications vẫn là kết quả hiện tại, unique theo student_id)
+        """
+        IF OBJECT_ID('classification_latest', 'V') IS NULL
+        EXEC('CREATE VIEW classification_latest AS
+              SELECT h.version, h.student_id, h.kmeans_prediction, h.knn_prediction,
+                     h.final_level, h.anomaly_detected, h.anomaly_reason
+              FROM classification_history h
+              WHERE h.version = (SELECT MAX(x.version) FROM classification_history x
+                                 WHERE x.student_id = h.student_id)')
+        """,
+    ]),
+    (7, "bảng cho import CSV: student_csv_data, exercise_details, import_checkpoints", [
+        """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='student_csv_data' AND xtype='U')
+        CREATE TABLE student_csv_data (
+            student_id INT PRIMARY KEY,
+            total_score FLOAT DEFAULT 0,
+            midterm_score FLOAT DEFAULT 0,
+            final_score FLOAT DEFAULT 0,
+            homework_score FLOAT DEFAULT 0,
+            attendance_rate FLOAT DEFAULT 0,
+            behavior_score_100 INT DEFAULT 50,
+            late_submissions INT DEFAULT 0,
+            assignment_completion FLOAT DEFAULT 0,
+            study_hours_per_week FLOAT DEFAULT 0,
+            participation_score FLOAT DEFAULT 0,
+            row_version ROWVERSION
+        )
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='exercise_details' AND xtype='U')
+        CREATE TABLE exercise_details (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            student_id INT NOT NULL,
+            course_code NVARCHAR(20) NOT NULL,
+            skill_code NVARCHAR(50) NOT NULL,
+            exercise_number INT NOT NULL,
+            score FLOAT DEFAULT 0,
+            completion_time FLOAT DEFAULT 0,
+            is_anomaly BIT DEFAULT 0
+        )
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'UX_exercise_details_student_exercise' AND object_id = OBJECT_ID('exercise_details'))
+        CREATE UNIQUE INDEX UX_exercise_details_student_exercise
+            ON exercise_details (student_id, course_code, skill_code, exercise_number)
+            INCLUDE (score, completion_time, is_anomaly)
+        """,
+        # Chunk cuối cùng đã commit của mỗi lượt import (để chạy tiếp sau khi lỗi)
+        """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='import_checkpoints' AND xtype='U')
+        CREATE TABLE import_checkpoints (
+            job NVARCHAR(200) NOT NULL PRIMARY KEY,
+            chunks_done INT NOT NULL,
+            rows_done BIGINT NOT NULL,
+            updated_at DATETIME DEFAULT GETDATE()
+        )
+        """,
+    ]),
+    (8, "bảng xếp hạng student_rankings (RANK() toàn trường / theo lớp)", [
+        """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='student_rankings' AND xtype='U')
+        CREATE TABLE student_rankings (
+            student_id INT NOT NULL PRIMARY KEY,
+            name NVARCHAR(100),
+            class_name NVARCHAR(50) NOT NULL,
+            avg_score FLOAT,
+            ranking_score FLOAT,
+            score_points FLOAT,
+            attendance FLOAT,
+            attendance_points FLOAT,
+            late_submissions INT,
+            ontime_points FLOAT,
+            total_time_hours FLOAT,
+            time_points FLOAT,
+            behavior_score FLOAT,
+            final_level NVARCHAR(50),
+            anomaly_detected BIT,
+            rank_overall INT,
+            rank_in_class INT,
+            refreshed_at DATETIME DEFAULT GETDATE()
+        )
+        """,
+        # Top N toàn trường / theo lớp: đọc theo thứ tự index, dừng sau N dòng
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'IX_student_rankings_overall' AND object_id = OBJECT_ID('student_rankings'))
+        CREATE INDEX IX_student_rankings_overall
+            ON student_rankings (anomaly_detected, rank_overall, student_id)
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'IX_student_rankings_class' AND object_id = OBJECT_ID('student_rankings'))
+        CREATE INDEX IX_student_rankings_class
+            ON student_rankings (class_name, anomaly_detected, rank_in_class, student_id)
+        """,
+    ]),
+]
+
+def get_applied_migrations(cursor):
+    """Danh sách version migration đã áp dụng"""
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def apply_migrations():
+    """
+    Áp dụng các migration chưa chạy (theo thứ tự version).
+    Mỗi migration chạy trong 1 giao dịch riêng và được ghi vào schema_migrations.
+
+    Returns:
+        bool: True nếu tất cả migration đã được áp dụng
+    """
+    conn = get_connection()
+    if not conn:
+        return False
+    
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='schema_migrations' AND xtype='U')
+            CREATE TABLE schema_migrations (
+                version INT PRIMARY KEY,
+                description NVARCHAR(200),
+                applied_at DATETIME DEFAULT GETDATE()
+            )
+        """)
+        conn.commit()
+        
+        applied = get_applied_migrations(cursor)
+        for version, description, statements in MIGRATIONS:
+            if version in applied:
+                continue
+            start = time.perf_counter()
+            for sql in statements:
+                cursor.execute(sql)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                version, description
+            )
+            conn.commit()
+            print(f"   ✅ Migration {version}: {description} ({time.perf_counter() - start:.2f}s)")
+        return True
+        
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi migration schema: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
 def create_tables():
     """Tạo các bảng cần thiết trong SQL Server"""
     conn = get_connection()
@@ -174,13 +543,43 @@ def create_tables():
         )
     """)
     
+    # Bảng sync_fingerprints - Mã băm nội dung đã đồng bộ (delta sync)
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='sync_fingerprints' AND xtype='U')
+        CREATE TABLE sync_fingerprints (
+            entity NVARCHAR(20) NOT NULL,
+            student_id INT NOT NULL,
+            content_hash CHAR(64) NOT NULL,
+            synced_at DATETIME DEFAULT GETDATE(),
+            PRIMARY KEY (entity, student_id)
+        )
+    """)
+    
+    # Cột row_version (ROWVERSION) để load tăng dần theo watermark
+    for table in ("students", "student_csv_data", "course_scores"):
+        try:
+            cursor.execute(f"""
+                IF OBJECT_ID('{table}', 'U') IS NOT NULL AND COL_LENGTH('{table}', 'row_version') IS NULL
+                ALTER TABLE {table} ADD row_version ROWVERSION
+            """)
+        except Exception as e:
+            conn.discard_if_broken(e)
+            print(f"⚠️ Không thêm được row_version cho {table}: {e}")
+    
     conn.commit()
     conn.close()
     print("✅ Đã tạo các bảng trong SQL Server")
-    return True
+    
+    # Index + ràng buộc cho các truy vấn theo student_id
+    return apply_migrations()
 
 def load_students_from_sqlserver():
-    """Load danh sách sinh viên từ SQL Server"""
+    """
+    Load danh sách sinh viên từ SQL Server.
+
+    Chỉ dùng 2 truy vấn (sinh viên + hành vi, toàn bộ course_scores) thay vì
+    1 truy vấn cho mỗi sinh viên; điểm môn học được gom theo student_id ở Python.
+    """
     conn = get_connection()
     if not conn:
         return []
@@ -188,79 +587,277 @@ def load_students_from_sqlserver():
     cursor = conn.cursor()
     students = []
     
-    # Mapping course_code -> tên đầy đủ
-    COURSE_CODE_TO_NAME = {
-        'NMLT': 'Nhập Môn Lập Trình',
-        'KTLT': 'Kĩ Thuật Lập Trình',
-        'CTDL': 'Cấu trúc Dữ Liệu và Giải Thuật',
-        'OOP': 'Lập Trình Hướng Đối Tượng'
-    }
-    
     try:
         # Load thông tin sinh viên + csv_data (JOIN 2 bảng)
-        cursor.execute("""
-            SELECT s.student_id, s.name, s.class, s.khoa,
-                   c.total_score, c.midterm_score, c.final_score, 
-                   c.attendance_rate, c.behavior_score_100, 
-                   c.late_submissions, c.assignment_completion,
-                   c.study_hours_per_week, c.participation_score
-            FROM students s
-            LEFT JOIN student_csv_data c ON s.student_id = c.student_id
-        """)
+        cursor.execute(STUDENTS_QUERY)
+        students = [_student_from_row(row) for row in cursor.fetchall()]
+        by_id = {s["student_id"]: s for s in students}
         
-        rows = cursor.fetchall()
-        
-        for row in rows:
-            student = {
-                "student_id": row[0],
-                "name": row[1],
-                "class": row[2],
-                "Khoa": row[3],
-                "csv_data": {
-                    "total_score": row[4] or 0,
-                    "midterm_score": row[5] or 0,
-                    "final_score": row[6] or 0,
-                    "attendance_rate": row[7] or 0,
-                    "behavior_score_100": row[8] or 50,
-                    "late_submissions": row[9] or 0,
-                    "assignment_completion": row[10] or 0,
-                    "study_hours_per_week": row[11] or 0,
-                    "participation_score": row[12] or 0,
-                    "class": row[2]
-                },
-                "courses": {}
-            }
-            
-            # Load điểm các môn học
-            cursor.execute("""
-                SELECT course_code, score, midterm_score, final_score, 
-                       homework_score, time_minutes
-                FROM course_scores
-                WHERE student_id = ?
-            """, row[0])
-            
-            course_rows = cursor.fetchall()
-            for course in course_rows:
-                course_code = course[0]
-                course_name = COURSE_CODE_TO_NAME.get(course_code, course_code)
-                student["courses"][course_name] = {
-                    "score": course[1] or 0,
-                    "midterm_score": course[2] or 0,
-                    "final_score": course[3] or 0,
-                    "homework_score": course[4] or 0,
-                    "time_minutes": course[5] or 0
-                }
-            
-            students.append(student)
+        # Load điểm các môn học của tất cả sinh viên trong 1 lần
+        cursor.execute(COURSE_SCORES_QUERY)
+        for row in cursor.fetchall():
+            student = by_id.get(row[0])
+            if student is None:
+                continue
+            course_name, course_data = _course_from_row(row[1:])
+            student["courses"][course_name] = course_data
         
         print(f"✅ Đã load {len(students)} sinh viên từ SQL Server")
         
     except Exception as e:
+        conn.discard_if_broken(e)
         print(f"❌ Lỗi load dữ liệu: {e}")
     
     conn.close()
     return students
 
+def iter_students_from_sqlserver(chunk_size=None):
+    """
+    Đọc sinh viên từ SQL Server dạng generator, bộ nhớ không tăng theo kích thước bảng.
+
+    Dùng 1 cursor duy nhất (students JOIN student_csv_data JOIN course_scores,
+    sắp xếp theo student_id), đọc bằng fetchmany(chunk_size) và yield từng
+    sinh viên ngay khi đã gom đủ điểm các môn.
+
+    Args:
+        chunk_size: Số dòng mỗi lần fetchmany (mặc định SQL_FETCH_SIZE)
+
+    Yields:
+        dict sinh viên (cùng cấu trúc với load_students_from_sqlserver)
+    """
+    chunk_size = chunk_size or SQL_FETCH_SIZE
+    conn = get_connection()
+    if not conn:
+        return
+    
+    count = 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute(STUDENTS_WITH_COURSES_QUERY)
+        for student in _assemble_students(cursor, chunk_size):
+            count += 1
+            yield student
+        
+        print(f"✅ Đã load {count} sinh viên từ SQL Server")
+        
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi load dữ liệu: {e}")
+    finally:
+        conn.close()
+
+def get_current_watermark():
+    """
+    Watermark hiện tại của database (rowversion lớn nhất đã commit, dạng số nguyên).
+
+    Dùng MIN_ACTIVE_ROWVERSION() - 1 thay vì @@DBTS để không bỏ sót các
+    giao dịch đang chạy dở tại thời điểm đọc.
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1")
+        return int(cursor.fetchone()[0])
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi đọc watermark: {e}")
+        return None
+    finally:
+        conn.close()
+
+def get_source_fingerprint():
+    """
+    Fingerprint của dữ liệu nguồn (students, student_csv_data, course_scores):
+    số dòng + row_version lớn nhất của từng bảng. Thêm/sửa dòng làm tăng
+    row_version, xóa dòng làm giảm số dòng, nên fingerprint đổi khi dữ liệu đổi.
+    exercise_details (nguồn điểm tích hợp) không có row_version: số dòng + id lớn nhất,
+    chỉ thấy bài tập được thêm / xóa (sửa điểm tại chỗ cần xóa snapshot).
+
+    Returns:
+        str hoặc None nếu lỗi
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    try:
+        cursor = conn.cursor()
+        parts = []
+        for table, version_column in (("students", "row_version"), ("student_csv_data", "row_version"),
+                                      ("course_scores", "row_version"), ("exercise_details", "id")):
+            cursor.execute(f"""
+                IF OBJECT_ID('{table}', 'U') IS NULL
+                    SELECT CAST(0 AS BIGINT), CAST(0 AS BIGINT)
+                ELSE
+                    SELECT COUNT_BIG(*), ISNULL(CAST(MAX({version_column}) AS BIGINT), 0) FROM {table}
+            """)
+            count, max_version = cursor.fetchone()
+            parts.append(f"{table}:{count}:{max_version}")
+        return f"{SQL_SERVER}/{SQL_DATABASE}|" + "|".join(parts)
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi đọc fingerprint dữ liệu nguồn: {e}")
+        return None
+    finally:
+        conn.close()
+
+def load_students_changed_since(watermark, chunk_size=None):
+    """
+    Load các sinh viên có thay đổi sau watermark.
+
+    Một sinh viên được coi là thay đổi khi dòng của họ trong students,
+    student_csv_data hoặc course_scores có row_version > watermark. Sinh viên
+    thay đổi được load lại đầy đủ (thông tin + hành vi + tất cả các môn).
+    Sinh viên / dòng course_scores bị xóa không được phát hiện
+    (so sánh với load_student_course_counts để tìm).
+
+    Args:
+        watermark: Giá trị trả về từ lần load trước (None = load toàn bộ)
+        chunk_size: Số dòng mỗi lần fetchmany (mặc định SQL_FETCH_SIZE)
+
+    Returns:
+        (danh sách sinh viên thay đổi, watermark mới) - watermark mới là None nếu lỗi
+    """
+    chunk_size = chunk_size or SQL_FETCH_SIZE
+    
+    # Đọc watermark mới TRƯỚC khi load để thay đổi xảy ra trong lúc load
+    # sẽ được lấy lại ở lần sau
+    new_watermark = get_current_watermark()
+    if new_watermark is None:
+        return [], watermark
+    
+    if watermark is None:
+        return list(iter_students_from_sqlserver(chunk_size)), new_watermark
+    
+    conn = get_connection()
+    if not conn:
+        return [], watermark
+    
+    students = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute(CHANGED_STUDENTS_QUERY, watermark, watermark, watermark)
+        students = list(_assemble_students(cursor, chunk_size))
+        print(f"✅ Có {len(students)} sinh viên thay đổi kể từ watermark {watermark}")
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi load dữ liệu thay đổi: {e}")
+        new_watermark = watermark
+    finally:
+        conn.close()
+    
+    return students, new_watermark
+
+def load_students_by_ids(student_ids, chunk_size=None):
+    """Load lại các sinh viên theo student_id (sinh viên không còn trong database bị bỏ qua)"""
+    chunk_size = chunk_size or SQL_FETCH_SIZE
+    if not student_ids:
+        return []
+    
+    conn = get_connection()
+    if not conn:
+        return []
+    
+    try:
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        _stage_ids(cursor, student_ids, SQL_BATCH_SIZE)
+        cursor.execute(STUDENTS_BY_IDS_QUERY.format(id_table="#id_stage"))
+        students = list(_assemble_students(cursor, chunk_size))
+        cursor.execute("DROP TABLE #id_stage")
+        return students
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi load sinh viên theo id: {e}")
+        return []
+    finally:
+        conn.close()
+
+def load_student_course_counts():
+    """
+    Số môn của từng sinh viên hiện có trong database
+    
+    Returns:
+        dict student_id -> số môn, None nếu lỗi
+    """
+    return _run_on_connection(get_connection, _read_course_counts, "Lỗi đọc số môn của sinh viên")
+
+def refresh_statistics_summaries():
+    """
+    Tính lại bảng tổng hợp course_statistics_summary / class_statistics_summary
+    bằng GROUP BY và bảng xếp hạng student_rankings bằng RANK() trong SQL Server
+    (1 giao dịch, không đọc dữ liệu từng sinh viên về Python)
+    """
+    return _run_on_connection(get_connection, _rebuild_statistics_summaries, "Lỗi cập nhật bảng thống kê",
+                              default=False, commit=True)
+
+def get_course_statistics(live=False):
+    """
+    Thống kê theo môn học (1 dòng/nhóm course_key, xem COURSE_STATISTICS_COLUMNS)
+
+    Returns:
+        list dict, hoặc None nếu lỗi
+    """
+    return _run_on_connection(get_connection, lambda cursor: _read_statistics(
+        cursor, "course_statistics_summary", COURSE_STATISTICS_COLUMNS, COURSE_STATISTICS_QUERY, live
+    ), "Lỗi đọc thống kê")
+
+def get_class_statistics(live=False):
+    """
+    Thống kê theo lớp (1 dòng/lớp, xem CLASS_STATISTICS_COLUMNS)
+
+    Returns:
+        list dict, hoặc None nếu lỗi
+    """
+    return _run_on_connection(get_connection, lambda cursor: _read_statistics(
+        cursor, "class_statistics_summary", CLASS_STATISTICS_COLUMNS, CLASS_STATISTICS_QUERY, live
+    ), "Lỗi đọc thống kê")
+
+def get_top_students(limit=10, class_name=None, course_name=None):
+    """
+    Top N sinh viên (không bất thường) từ bảng xếp hạng student_rankings
+
+    Args:
+        class_name: Chỉ lấy sinh viên của lớp này (xếp theo rank_in_class)
+        course_name: Chỉ lấy sinh viên có học môn này (tên môn đầy đủ)
+
+    Returns:
+        list dict (xem STUDENT_RANKINGS_COLUMNS), hoặc None nếu lỗi
+    """
+    # OFFSET/FETCH thay cho TOP (?): tham số giới hạn đứng cuối câu lệnh như LIMIT ? của SQLite
+    return _run_on_connection(get_connection, lambda cursor: _read_top_students(
+        cursor, "OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY", limit, class_name, course_name
+    ), "Lỗi đọc bảng xếp hạng")
+
+def load_integrated_tables():
+    """
+    Dữ liệu cho IntegratedScoringSystem (xem INTEGRATED_TABLES) qua 1 kết nối của pool:
+    sinh viên, csv_data, điểm môn học và điểm bài tập đã tính trung bình bằng GROUP BY
+    
+    Returns:
+        dict bảng -> list dict, hoặc None nếu lỗi
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    try:
+        cursor = conn.cursor()
+        tables = {}
+        for table, (columns, query) in INTEGRATED_TABLES.items():
+            cursor.execute(query)
+            tables[table] = _fetch_dicts(cursor, columns)
+        return tables
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi đọc dữ liệu điểm tích hợp: {e}")
+        return None
+    finally:
+        conn.close()
+
 def save_student(student):
     """Lưu thông tin 1 sinh viên vào SQL Server"""
     conn = get_connection()
@@ -359,14 +956,34 @@ def save_student(student):
         return True
         
     except Exception as e:
+        conn.discard_if_broken(e)
         print(f"❌ Lỗi lưu sinh viên {student.get('student_id')}: {e}")
         conn.rollback()
         return False
     finally:
         conn.close()
 
+# Cập nhật tại chỗ kết quả phân loại hiện tại từ #classification_stage (không DELETE + INSERT lại)
+MERGE_CLASSIFICATIONS = """
+    MERGE INTO classifications AS target
+    USING #classification_stage AS source
+    ON target.student_id = source.student_id
+    WHEN MATCHED THEN
+        UPDATE SET kmeans_prediction = source.kmeans_prediction,
+                   knn_prediction = source.knn_prediction,
+                   final_level = source.final_level,
+                   anomaly_detected = source.anomaly_detected,
+                   anomaly_reason = source.anomaly_reason,
+                   classified_at = GETDATE()
+    WHEN NOT MATCHED THEN
+        INSERT (student_id, kmeans_prediction, knn_prediction,
+                final_level, anomaly_detected, anomaly_reason)
+        VALUES (source.student_id, source.kmeans_prediction, source.knn_prediction,
+                source.final_level, source.anomaly_detected, source.anomaly_reason);
+"""
+
 def save_classification(student):
-    """Lưu kết quả phân loại vào SQL Server"""
+    """Lưu kết quả phân loại vào SQL Server (cập nhật tại chỗ nếu sinh viên đã có kết quả)"""
     conn = get_connection()
     if not conn:
         return False
@@ -374,58 +991,811 @@ def save_classification(student):
     cursor = conn.cursor()
     
     try:
-        # Xóa kết quả cũ
-        cursor.execute("DELETE FROM classifications WHERE student_id = ?", student.get("student_id"))
-        
-        # Thêm kết quả mới
         cursor.execute("""
-            INSERT INTO classifications (student_id, kmeans_prediction, knn_prediction, 
-                                        final_level, anomaly_detected, anomaly_reason)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """,
-            student.get("student_id"),
-            student.get("kmeans_prediction"),
-            student.get("knn_prediction"),
-            student.get("final_level"),
-            1 if student.get("anomaly_detected") else 0,
-            student.get("anomaly_reason", "")
-        )
+            MERGE INTO classifications AS target
+            USING (SELECT ? AS student_id, ? AS kmeans_prediction, ? AS knn_prediction,
+                          ? AS final_level, ? AS anomaly_detected, ? AS anomaly_reason) AS source
+            ON target.student_id = source.student_id
+            WHEN MATCHED THEN
+                UPDATE SET kmeans_prediction = source.kmeans_prediction,
+                           knn_prediction = source.knn_prediction,
+                           final_level = source.final_level,
+                           anomaly_detected = source.anomaly_detected,
+                           anomaly_reason = source.anomaly_reason,
+                           classified_at = GETDATE()
+            WHEN NOT MATCHED THEN
+                INSERT (student_id, kmeans_prediction, knn_prediction,
+                        final_level, anomaly_detected, anomaly_reason)
+                VALUES (source.student_id, source.kmeans_prediction, source.knn_prediction,
+                        source.final_level, source.anomaly_detected, source.anomaly_reason);
+        """, *_classification_row(student))
         
         conn.commit()
         return True
         
     except Exception as e:
+        conn.discard_if_broken(e)
         print(f"❌ Lỗi lưu phân loại: {e}")
         conn.rollback()
         return False
     finally:
         conn.close()
 
-def sync_all_to_sqlserver(students, classifications):
-    """Đồng bộ tất cả dữ liệu lên SQL Server"""
+def save_classifications_bulk(students, batch_size=None, record_history=False, run_info=None):
+    """
+    Lưu kết quả phân loại của cả lượt chạy trong 1 giao dịch.
+
+    Dữ liệu được nạp theo lô vào bảng tạm #classification_stage bằng
+    fast_executemany, sau đó cập nhật tại chỗ bảng classifications bằng 1 lệnh MERGE.
+
+    Args:
+        students: Danh sách sinh viên đã phân loại
+        batch_size: Số dòng mỗi lô (mặc định SQL_BATCH_SIZE)
+        record_history: True = ghi lượt chạy thành 1 version mới trong classification_runs
+                        và thêm kết quả vào classification_history (cùng giao dịch)
+        run_info: dict thông tin lượt chạy (normalization_method, note)
+
+    Returns:
+        dict: success, rows, updated, inserted, version, elapsed_seconds
+    """
+    start = time.perf_counter()
+    batch_size = batch_size or SQL_BATCH_SIZE
+    run_info = run_info or {}
+    
+    # Mỗi sinh viên chỉ giữ 1 kết quả (kết quả sau cùng)
+    rows_by_id = {}
+    for student in students:
+        if student.get("student_id") is not None:
+            rows_by_id[student.get("student_id")] = _classification_row(student)
+    rows = list(rows_by_id.values())
+    
+    result = {"success": False, "rows": len(rows), "updated": 0, "inserted": 0,
+              "version": None, "elapsed_seconds": 0}
+    
+    conn = get_connection()
+    if not conn:
+        return result
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    
+    try:
+        cursor.execute("""
+            CREATE TABLE #classification_stage (
+                student_id INT PRIMARY KEY,
+                kmeans_prediction NVARCHAR(50),
+                knn_prediction NVARCHAR(50),
+                final_level NVARCHAR(50),
+                anomaly_detected BIT,
+                anomaly_reason NVARCHAR(500)
+            )
+        """)
+        
+        for batch in _batches(rows, batch_size):
+            cursor.executemany("""
+                INSERT INTO #classification_stage (student_id, kmeans_prediction, knn_prediction,
+                                                   final_level, anomaly_detected, anomaly_reason)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, batch)
+        
+        cursor.execute("""
+            SELECT COUNT(*) FROM #classification_stage s
+            INNER JOIN classifications c ON c.student_id = s.student_id
+        """)
+        result["updated"] = cursor.fetchone()[0]
+        
+        cursor.execute(MERGE_CLASSIFICATIONS)
+        result["inserted"] = len(rows) - result["updated"]
+        
+        if record_history:
+            # 1 dòng thông tin lượt chạy + 1 lệnh INSERT ... SELECT cho toàn bộ kết quả
+            cursor.execute("""
+                INSERT INTO classification_runs (total_students, anomaly_count, normalization_method, note)
+                OUTPUT INSERTED.version
+                VALUES (?, ?, ?, ?)
+            """,
+                len(rows),
+                sum(row[4] for row in rows),
+                run_info.get("normalization_method"),
+                run_info.get("note")
+            )
+            result["version"] = cursor.fetchone()[0]
+            
+            cursor.execute("""
+                INSERT INTO classification_history (version, student_id, kmeans_prediction, knn_prediction,
+                                                    final_level, anomaly_detected, anomaly_reason)
+                SELECT ?, student_id, kmeans_prediction, knn_prediction,
+                       final_level, anomaly_detected, anomaly_reason
+                FROM #classification_stage
+            """, result["version"])
+        
+        cursor.execute("DROP TABLE #classification_stage")
+        
+        # Fingerprint ghi cùng giao dịch để delta sync luôn khớp với dữ liệu
+        _merge_fingerprints(cursor, "classification", {
+            student.get("student_id"): classification_fingerprint(student)
+            for student in students if student.get("student_id") is not None
+        }, batch_size)
+        conn.commit()
+        result["success"] = True
+        
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi lưu phân loại hàng loạt: {e}")
+        result["error"] = str(e)
+        conn.rollback()
+    finally:
+        conn.close()
+    
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+def get_classification_runs(limit=20):
+    """
+    Các lượt phân loại gần nhất (mới nhất trước)
+
+    Returns:
+        list dict (xem CLASSIFICATION_RUN_COLUMNS), hoặc None nếu lỗi
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT TOP (?) {', '.join(CLASSIFICATION_RUN_COLUMNS)}
+            FROM classification_runs
+            ORDER BY version DESC
+        """, limit)
+        return _fetch_dicts(cursor, CLASSIFICATION_RUN_COLUMNS)
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi đọc lượt phân loại: {e}")
+        return None
+    finally:
+        conn.close()
+
+def load_classification_version(version=None):
+    """
+    Kết quả phân loại của 1 version (mặc định version mới nhất)
+
+    Returns:
+        list dict (xem CLASSIFICATION_HISTORY_COLUMNS), hoặc None nếu lỗi
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    try:
+        cursor = conn.cursor()
+        if version is None:
+            cursor.execute("SELECT MAX(version) FROM classification_runs")
+            version = cursor.fetchone()[0]
+            if version is None:
+                return []
+        cursor.execute(f"""
+            SELECT {', '.join(CLASSIFICATION_HISTORY_COLUMNS)}
+            FROM classification_history
+            WHERE version = ?
+            ORDER BY student_id
+        """, version)
+        return _fetch_dicts(cursor, CLASSIFICATION_HISTORY_COLUMNS)
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi đọc lịch sử phân loại: {e}")
+        return None
+    finally:
+        conn.close()
+
+def diff_classification_versions(old_version, new_version):
+    """
+    Các sinh viên có kết quả khác nhau giữa 2 version (1 truy vấn JOIN trên index)
+
+    Returns:
+        list dict (xem CLASSIFICATION_DIFF_COLUMNS), hoặc None nếu lỗi
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    try:
+        cursor = conn.cursor()
+        cursor.execute(CLASSIFICATION_DIFF_QUERY, old_version, new_version)
+        return _fetch_dicts(cursor, CLASSIFICATION_DIFF_COLUMNS)
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi so sánh lịch sử phân loại: {e}")
+        return None
+    finally:
+        conn.close()
+
+def load_fingerprints(entity):
+    """
+    Load fingerprint đã đồng bộ của 1 loại dữ liệu ('student' | 'classification')
+
+    Returns:
+        dict {student_id: content_hash}, hoặc None nếu không đọc được
+    """
+    return _run_on_connection(get_connection, lambda cursor: _read_fingerprints(cursor, entity),
+                              "Lỗi load fingerprint")
+
+def _merge_fingerprints(cursor, entity, hashes, batch_size):
+    """Ghi fingerprint {student_id: hash} trong giao dịch hiện tại của cursor"""
+    if not hashes:
+        return
+    cursor.fast_executemany = True
+    cursor.execute("""
+        CREATE TABLE #fingerprint_stage (
+            student_id INT PRIMARY KEY,
+            content_hash CHAR(64)
+        )
+    """)
+    for batch in _batches(list(hashes.items()), batch_size):
+        cursor.executemany("INSERT INTO #fingerprint_stage (student_id, content_hash) VALUES (?, ?)", batch)
+    cursor.execute("""
+        MERGE INTO sync_fingerprints AS target
+        USING #fingerprint_stage AS source
+        ON target.entity = ? AND target.student_id = source.student_id
+        WHEN MATCHED THEN
+            UPDATE SET content_hash = source.content_hash, synced_at = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (entity, student_id, content_hash)
+            VALUES (?, source.student_id, source.content_hash);
+    """, entity, entity)
+    cursor.execute("DROP TABLE #fingerprint_stage")
+
+def _stage_ids(cursor, student_ids, batch_size):
+    """Nạp danh sách student_id vào bảng tạm #id_stage"""
+    cursor.execute("CREATE TABLE #id_stage (student_id INT PRIMARY KEY)")
+    for batch in _batches([(sid,) for sid in set(student_ids)], batch_size):
+        cursor.executemany("INSERT INTO #id_stage (student_id) VALUES (?)", batch)
+
+def delete_students_bulk(student_ids, batch_size=None):
+    """
+    Xóa sinh viên (và dữ liệu do sync ghi: SYNC_OWNED_TABLES, fingerprint) theo danh sách
+    student_id trong 1 giao dịch. Không xóa dữ liệu nguồn của import (student_csv_data, exercise_details).
+
+    Returns:
+        dict: success, deleted, elapsed_seconds
+    """
+    start = time.perf_counter()
+    batch_size = batch_size or SQL_BATCH_SIZE
+    result = {"success": False, "deleted": 0, "elapsed_seconds": 0}
+    if not student_ids:
+        result["success"] = True
+        return result
+    
+    conn = get_connection()
+    if not conn:
+        return result
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    
+    try:
+        _stage_ids(cursor, student_ids, batch_size)
+        # Chỉ bảng do sync ghi (bảng con trước, students sau cùng - khóa ngoại)
+        for table in SYNC_OWNED_TABLES:
+            cursor.execute(f"DELETE t FROM {table} t INNER JOIN #id_stage i ON t.student_id = i.student_id")
+        result["deleted"] = cursor.rowcount
+        cursor.execute("""
+            DELETE f FROM sync_fingerprints f
+            INNER JOIN #id_stage i ON f.student_id = i.student_id
+        """)
+        cursor.execute("DROP TABLE #id_stage")
+        conn.commit()
+        result["success"] = True
+        
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi xóa sinh viên: {e}")
+        result["error"] = str(e)
+        conn.rollback()
+    finally:
+        conn.close()
+    
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+def delete_classifications_bulk(student_ids, batch_size=None):
+    """
+    Xóa kết quả phân loại theo danh sách student_id trong 1 giao dịch
+
+    Returns:
+        dict: success, deleted, elapsed_seconds
+    """
+    start = time.perf_counter()
+    batch_size = batch_size or SQL_BATCH_SIZE
+    result = {"success": False, "deleted": 0, "elapsed_seconds": 0}
+    if not student_ids:
+        result["success"] = True
+        return result
+    
+    conn = get_connection()
+    if not conn:
+        return result
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    
+    try:
+        _stage_ids(cursor, student_ids, batch_size)
+        cursor.execute("""
+            DELETE c FROM classifications c
+            INNER JOIN #id_stage i ON c.student_id = i.student_id
+        """)
+        result["deleted"] = cursor.rowcount
+        cursor.execute("""
+            DELETE f FROM sync_fingerprints f
+            INNER JOIN #id_stage i ON f.entity = 'classification' AND f.student_id = i.student_id
+        """)
+        cursor.execute("DROP TABLE #id_stage")
+        conn.commit()
+        result["success"] = True
+        
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi xóa phân loại: {e}")
+        result["error"] = str(e)
+        conn.rollback()
+    finally:
+        conn.close()
+    
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+def save_fingerprints(entity, records, fingerprint_func, batch_size=None):
+    """Ghi fingerprint cho các bản ghi đã được lưu bằng đường ghi từng dòng"""
+    hashes = _fingerprint_hashes(records, fingerprint_func)
+    if not hashes:
+        return True
+    return _run_on_connection(get_connection, lambda cursor: _merge_fingerprints(
+        cursor, entity, hashes, batch_size or SQL_BATCH_SIZE
+    ) or True, "Lỗi lưu fingerprint", default=False, commit=True)
+
+def _plan_delta(entity, records, fingerprint_func):
+    """
+    So sánh fingerprint hiện tại với fingerprint đã đồng bộ
+
+    Returns:
+        (records cần ghi, danh sách student_id cần xóa, thống kê)
+    """
+    return diff_fingerprints(load_fingerprints(entity), records, fingerprint_func)
+
+def _merge_students(cursor, student_rows, course_rows, batch_size):
+    """
+    Upsert students + course_scores trong giao dịch hiện tại của cursor:
+    nạp theo lô vào bảng tạm (#student_stage, #course_stage) rồi 1 lệnh MERGE cho mỗi bảng
+    """
+    cursor.execute("""
+        CREATE TABLE #student_stage (
+            student_id INT PRIMARY KEY,
+            name NVARCHAR(100),
+            class NVARCHAR(20),
+            khoa NVARCHAR(100),
+            total_score FLOAT,
+            midterm_score FLOAT,
+            final_score FLOAT,
+            attendance_rate FLOAT,
+            behavior_score_100 INT,
+            late_submissions INT,
+            assignment_completion FLOAT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE #course_stage (
+            student_id INT,
+            course_name NVARCHAR(100),
+            score FLOAT,
+            midterm_score FLOAT,
+            final_score FLOAT,
+            homework_score FLOAT,
+            time_minutes FLOAT,
+            PRIMARY KEY (student_id, course_name)
+        )
+    """)
+    
+    for batch in _batches(student_rows, batch_size):
+        cursor.executemany("""
+            INSERT INTO #student_stage (student_id, name, class, khoa, total_score, midterm_score,
+                                        final_score, attendance_rate, behavior_score_100,
+                                        late_submissions, assignment_completion)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, batch)
+    
+    for batch in _batches(course_rows, batch_size):
+        cursor.executemany("""
+            INSERT INTO #course_stage (student_id, course_name, score, midterm_score,
+                                       final_score, homework_score, time_minutes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, batch)
+    
+    # Upsert students (1 lệnh cho cả lô)
+    cursor.execute("""
+        MERGE INTO students AS target
+        USING #student_stage AS source
+        ON target.student_id = source.student_id
+        WHEN MATCHED THEN
+            UPDATE SET 
+                name = source.name,
+                class = source.class,
+                khoa = source.khoa,
+                total_score = source.total_score,
+                midterm_score = source.midterm_score,
+                final_score = source.final_score,
+                attendance_rate = source.attendance_rate,
+                behavior_score_100 = source.behavior_score_100,
+                late_submissions = source.late_submissions,
+                assignment_completion = source.assignment_completion,
+                updated_at = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (student_id, name, class, khoa, total_score, midterm_score, 
+                    final_score, attendance_rate, behavior_score_100, 
+                    late_submissions, assignment_completion)
+            VALUES (source.student_id, source.name, source.class, source.khoa,
+                    source.total_score, source.midterm_score, source.final_score,
+                    source.attendance_rate, source.behavior_score_100,
+                    source.late_submissions, source.assignment_completion);
+    """)
+    
+    # Upsert course_scores (1 lệnh cho cả lô)
+    cursor.execute("""
+        MERGE INTO course_scores AS target
+        USING #course_stage AS source
+        ON target.student_id = source.student_id AND target.course_name = source.course_name
+        WHEN MATCHED THEN
+            UPDATE SET 
+                score = source.score,
+                midterm_score = source.midterm_score,
+                final_score = source.final_score,
+                homework_score = source.homework_score,
+                time_minutes = source.time_minutes
+        WHEN NOT MATCHED THEN
+            INSERT (student_id, course_name, score, midterm_score, final_score, homework_score, time_minutes)
+            VALUES (source.student_id, source.course_name, source.score, source.midterm_score,
+                    source.final_score, source.homework_score, source.time_minutes);
+    """)
+    
+    cursor.execute("DROP TABLE #student_stage")
+    cursor.execute("DROP TABLE #course_stage")
+
+def save_students_bulk(students, batch_size=None):
+    """
+    Lưu thông tin + điểm môn học của nhiều sinh viên trong 1 giao dịch.
+
+    Sinh viên và điểm môn học được nạp theo lô vào bảng tạm (#student_stage,
+    #course_stage) bằng fast_executemany, sau đó chạy 1 lệnh MERGE cho mỗi bảng.
+
+    Returns:
+        dict: success, students, courses, elapsed_seconds
+    """
+    start = time.perf_counter()
+    batch_size = batch_size or SQL_BATCH_SIZE
+    
+    student_rows = {}
+    course_rows = {}
+    for student in students:
+        if student.get("student_id") is None:
+            continue
+        student_rows[student.get("student_id")] = _student_row(student)
+        for row in _course_rows(student):
+            course_rows[(row[0], row[1])] = row
+    
+    result = {"success": False, "students": len(student_rows), "courses": len(course_rows), "elapsed_seconds": 0}
+    
+    conn = get_connection()
+    if not conn:
+        return result
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    
+    try:
+        _merge_students(cursor, list(student_rows.values()), list(course_rows.values()), batch_size)
+        
+        # Fingerprint ghi cùng giao dịch để delta sync luôn khớp với dữ liệu
+        _merge_fingerprints(cursor, "student", {
+            student.get("student_id"): student_fingerprint(student)
+            for student in students if student.get("student_id") is not None
+        }, batch_size)
+        conn.commit()
+        result["success"] = True
+        
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi lưu sinh viên hàng loạt: {e}")
+        result["error"] = str(e)
+        conn.rollback()
+    finally:
+        conn.close()
+    
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+def _merge_staged(cursor, table, stage_columns, keys, rows, batch_size):
+    """
+    Upsert rows vào table trong giao dịch hiện tại của cursor:
+    nạp theo lô vào bảng tạm #{table}_stage rồi 1 lệnh MERGE theo các cột khóa keys
+
+    Args:
+        stage_columns: list (tên cột, kiểu SQL) theo thứ tự giá trị trong mỗi dòng
+    """
+    columns = [name for name, _ in stage_columns]
+    stage = f"#{table}_stage"
+    cursor.execute(f"""
+        CREATE TABLE {stage} (
+            {', '.join(f'{name} {sql_type}' for name, sql_type in stage_columns)},
+            PRIMARY KEY ({', '.join(keys)})
+        )
+    """)
+    for batch in _batches(rows, batch_size):
+        cursor.executemany(
+            f"INSERT INTO {stage} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            batch
+        )
+    cursor.execute(f"""
+        MERGE INTO {table} AS target
+        USING {stage} AS source
+        ON {' AND '.join(f'target.{k} = source.{k}' for k in keys)}
+        WHEN MATCHED THEN
+            UPDATE SET {', '.join(f'{c} = source.{c}' for c in columns if c not in keys)}
+        WHEN NOT MATCHED THEN
+            INSERT ({', '.join(columns)})
+            VALUES ({', '.join(f'source.{c}' for c in columns)});
+    """)
+    cursor.execute(f"DROP TABLE {stage}")
+
+# Kiểu cột bảng tạm khi import student_csv_data / exercise_details
+_CSV_DATA_STAGE = [("student_id", "INT")] + [
+    (column, "INT" if column in ("behavior_score_100", "late_submissions") else "FLOAT")
+    for column in CSV_DATA_COLUMNS
+]
+_EXERCISE_STAGE = list(zip(EXERCISE_COLUMNS, (
+    "INT", "NVARCHAR(20)", "NVARCHAR(50)", "INT", "FLOAT", "FLOAT", "BIT",
+)))
+
+def load_import_checkpoint(job):
+    """
+    Checkpoint của 1 lượt import (chunk cuối cùng đã commit)
+
+    Returns:
+        dict: chunks_done, rows_done (0 nếu chưa có), hoặc None nếu lỗi
+    """
+    return _run_on_connection(get_connection, lambda cursor: _read_import_checkpoint(cursor, job),
+                              "Lỗi đọc checkpoint import")
+
+def reset_import_checkpoint(job):
+    """Xóa checkpoint để import lại từ đầu"""
+    return _run_on_connection(get_connection, lambda cursor: _delete_import_checkpoint(cursor, job),
+                              "Lỗi xóa checkpoint import", default=False, commit=True)
+
+def import_chunk(job, chunk_no, rows_done, students=(), exercises=(), batch_size=None):
+    """
+    Ghi 1 chunk dữ liệu import (students, student_csv_data, course_scores, exercise_details)
+    và checkpoint của chunk trong cùng 1 giao dịch: chunk đã commit thì checkpoint cũng đã ghi,
+    chạy lại sau lỗi chỉ cần bắt đầu từ chunk chunks_done.
+
+    Args:
+        job: Tên lượt import (khóa của import_checkpoints)
+        chunk_no: Số thứ tự chunk (bắt đầu từ 0)
+        rows_done: Tổng số dòng nguồn đã xử lý sau chunk này
+        students: Danh sách dict sinh viên (csv_data, courses)
+        exercises: Danh sách dict bài tập (xem EXERCISE_COLUMNS)
+
+    Returns:
+        dict: success, students, courses, exercises, elapsed_seconds
+    """
+    start = time.perf_counter()
+    batch_size = batch_size or SQL_BATCH_SIZE
+    
+    student_rows = {}
+    csv_rows = {}
+    course_rows = {}
+    for student in students:
+        if student.get("student_id") is None:
+            continue
+        student_rows[student.get("student_id")] = _student_row(student)
+        csv_rows[student.get("student_id")] = _csv_data_row(student)
+        for row in _course_rows(student):
+            course_rows[(row[0], row[1])] = row
+    exercise_rows = {}
+    for exercise in exercises:
+        row = _exercise_row(exercise)
+        if None not in row[:4]:
+            exercise_rows[row[:4]] = row
+    
+    result = {"success": False, "students": len(student_rows), "courses": len(course_rows),
+              "exercises": len(exercise_rows), "elapsed_seconds": 0}
+    
+    conn = get_connection()
+    if not conn:
+        return result
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    
+    try:
+        if student_rows:
+            _merge_students(cursor, list(student_rows.values()), list(course_rows.values()), batch_size)
+            _merge_staged(cursor, "student_csv_data", _CSV_DATA_STAGE, ["student_id"],
+                          list(csv_rows.values()), batch_size)
+        if exercise_rows:
+            _merge_staged(cursor, "exercise_details", _EXERCISE_STAGE, list(EXERCISE_COLUMNS[:4]),
+                          list(exercise_rows.values()), batch_size)
+        
+        cursor.execute("""
+            MERGE INTO import_checkpoints AS target
+            USING (SELECT ? AS job, ? AS chunks_done, ? AS rows_done) AS source
+            ON target.job = source.job
+            WHEN MATCHED THEN
+                UPDATE SET chunks_done = source.chunks_done, rows_done = source.rows_done,
+                           updated_at = GETDATE()
+            WHEN NOT MATCHED THEN
+                INSERT (job, chunks_done, rows_done)
+                VALUES (source.job, source.chunks_done, source.rows_done);
+        """, job, chunk_no + 1, rows_done)
+        conn.commit()
+        result["success"] = True
+        
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ Lỗi import chunk {chunk_no}: {e}")
+        result["error"] = str(e)
+        conn.rollback()
+    finally:
+        conn.close()
+    
+    result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+def _run_partitions(func, records, workers, batch_size):
+    """
+    Chạy func(partition, batch_size=...) song song trên các khoảng student_id,
+    mỗi worker dùng 1 kết nối riêng từ pool và commit riêng.
+
+    Returns:
+        (danh sách kết quả thành công, danh sách lỗi)
+    """
+    partitions = _partition_by_id(records, max(1, workers))
+    results, errors = [], []
+    if not partitions:
+        return results, errors
+    
+    with ThreadPoolExecutor(max_workers=len(partitions)) as executor:
+        futures = {executor.submit(func, part, batch_size=batch_size): (i, part) for i, part in enumerate(partitions)}
+        for future in as_completed(futures):
+            i, part = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            result["partition"] = i
+            result["student_id_range"] = [part[0].get("student_id"), part[-1].get("student_id")]
+            if result["success"]:
+                results.append(result)
+            else:
+                errors.append(result)
+    
+    return results, errors
+
+def sync_all_to_sqlserver(students, classifications, bulk=True, batch_size=None, delta=True, workers=None,
+                          prune=False):
+    """
+    Đồng bộ tất cả dữ liệu lên SQL Server
+
+    Args:
+        students: Danh sách sinh viên (kèm courses, csv_data)
+        classifications: Danh sách kết quả phân loại
+        bulk: True = ghi theo lô bằng bảng tạm + MERGE set-based,
+              False = ghi từng sinh viên (save_student / save_classification)
+        batch_size: Số dòng mỗi lô khi bulk=True (mặc định SQL_BATCH_SIZE)
+        delta: True = chỉ ghi bản ghi mới/thay đổi (so sánh fingerprint nội dung),
+               False = ghi lại toàn bộ
+        workers: Số luồng ghi song song khi bulk=True, mỗi luồng 1 kết nối và
+                 1 khoảng student_id (mặc định SQL_SYNC_WORKERS)
+        prune: Chỉ khi delta=True: xóa sinh viên / phân loại đã đồng bộ nhưng không còn trong
+               danh sách (chỉ bảng do sync ghi, xem SYNC_OWNED_TABLES). Mặc định False:
+               chỉ đếm vào thống kê "missing"
+
+    Returns:
+        dict: success, mode, delta, workers, students_saved, courses_saved,
+              classifications_saved, students/classifications (thống kê delta: inserted,
+              changed, deleted, skipped, missing nếu prune=False),
+              errors, elapsed_seconds
+    """
     print("\n📤 Đang đồng bộ dữ liệu lên SQL Server...")
+    start = time.perf_counter()
+    workers = max(1, workers or SQL_SYNC_WORKERS)
     
     # Tạo bảng nếu chưa có
     create_tables()
     
-    success_count = 0
+    report = {
+        "success": True,
+        "mode": "bulk" if bulk else "row",
+        "delta": delta,
+        "workers": workers if bulk else 1,
+        "students_saved": 0,
+        "courses_saved": 0,
+        "classifications_saved": 0,
+        "errors": [],
+        "elapsed_seconds": 0
+    }
     
-    # Lưu sinh viên
-    for student in students:
-        if save_student(student):
-            success_count += 1
+    students_to_write, students_to_delete = students, []
+    classifications_to_write, classifications_to_delete = classifications, []
+    if delta:
+        students_to_write, students_to_delete, report["students"] = _plan_delta(
+            "student", students, student_fingerprint)
+        classifications_to_write, classifications_to_delete, report["classifications"] = _plan_delta(
+            "classification", classifications, classification_fingerprint)
+        if not prune:
+            # Danh sách truyền vào có thể chỉ là 1 phần dữ liệu: không xóa bản ghi vắng mặt
+            for stats, missing in ((report["students"], students_to_delete),
+                                   (report["classifications"], classifications_to_delete)):
+                stats["missing"] = len(missing)
+                stats["deleted"] = 0
+            students_to_delete, classifications_to_delete = [], []
+    
+    if bulk:
+        # Sinh viên trước, phân loại sau (khóa ngoại classifications -> students)
+        results, errors = _run_partitions(save_students_bulk, students_to_write, workers, batch_size)
+        report["students_saved"] = sum(r["students"] for r in results)
+        report["courses_saved"] = sum(r["courses"] for r in results)
+        report["errors"] += [{"table": "students", **e} for e in errors]
+        
+        results, errors = _run_partitions(save_classifications_bulk, classifications_to_write, workers, batch_size)
+        report["classifications_saved"] = sum(r["rows"] for r in results)
+        report["errors"] += [{"table": "classifications", **e} for e in errors]
+        
+        report["success"] = not report["errors"]
+    else:
+        # Lưu sinh viên (id lỗi ghi vào errors như đường bulk)
+        saved_students, error = _save_row_by_row(students_to_write, save_student, "students")
+        report["students_saved"] = len(saved_students)
+        report["courses_saved"] = sum(len(s.get("courses", {})) for s in saved_students)
+        if error:
+            report["errors"].append(error)
+        
+        # Lưu kết quả phân loại
+        saved_classifications, error = _save_row_by_row(classifications_to_write, save_classification,
+                                                        "classifications")
+        report["classifications_saved"] = len(saved_classifications)
+        if error:
+            report["errors"].append(error)
+        
+        save_fingerprints("student", saved_students, student_fingerprint, batch_size)
+        save_fingerprints("classification", saved_classifications, classification_fingerprint, batch_size)
+        
+        report["success"] = not report["errors"]
     
-    print(f"   ✅ Đã lưu {success_count}/{len(students)} sinh viên")
+    # Xóa bản ghi không còn trong dữ liệu hiện tại (chỉ khi delta)
+    if classifications_to_delete:
+        result = delete_classifications_bulk(classifications_to_delete, batch_size)
+        if not result["success"]:
+            report["success"] = False
+            report["errors"].append({"table": "classifications", **result})
+    if students_to_delete:
+        result = delete_students_bulk(students_to_delete, batch_size)
+        if not result["success"]:
+            report["success"] = False
+            report["errors"].append({"table": "students", **result})
     
-    # Lưu kết quả phân loại
-    class_count = 0
-    for student in classifications:
-        if save_classification(student):
-            class_count += 1
+    print(f"   ✅ Đã lưu {report['students_saved']}/{len(students)} sinh viên")
+    print(f"   ✅ Đã lưu {report['classifications_saved']}/{len(classifications)} kết quả phân loại")
+    if delta:
+        print(f"   ⏭️ Bỏ qua (không đổi): {report['students']['skipped']} sinh viên, "
+              f"{report['classifications']['skipped']} kết quả phân loại")
+    if report["errors"]:
+        print(f"   ⚠️ {len(report['errors'])} phần đồng bộ bị lỗi")
     
-    print(f"   ✅ Đã lưu {class_count}/{len(classifications)} kết quả phân loại")
+    # Dữ liệu thay đổi -> tính lại bảng thống kê tổng hợp
+    if report["students_saved"] or report["classifications_saved"] or students_to_delete or classifications_to_delete:
+        refresh_statistics_summaries()
     
-    return True
+    report["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return report
 
 
 if __name__ == "__main__":
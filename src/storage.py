@@ -0,0 +1,78 @@
+"""
+Chọn storage backend theo biến môi trường STORAGE_BACKEND
+
+- sqlserver (mặc định): sqlserver_sync (pyodbc + SQL Server)
+- sqlite: sqlite_sync (file SQLite, chạy được trên mọi máy)
+
+Các module khác import từ đây thay vì import trực tiếp sqlserver_sync:
+    from storage import iter_students_from_sqlserver, sync_all_to_sqlserver
+"""
+
+import os
+import importlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKENDS = {
+    "sqlserver": "sqlserver_sync",
+    "sqlite": "sqlite_sync",
+}
+
+# API chung mà mọi backend phải cung cấp
+STORAGE_API = (
+    "COURSE_CODE_TO_NAME",
+    "SQL_POOL_MAX_SIZE",
+    "get_connection",
+    "get_pool_stats",
+    "close_pools",
+    "create_database",
+    "test_connection",
+    "create_tables",
+    "load_students_from_sqlserver",
+    "iter_students_from_sqlserver",
+    "get_current_watermark",
+    "get_source_fingerprint",
+    "load_students_changed_since",
+    "load_students_by_ids",
+    "load_student_course_counts",
+    "save_student",
+    "save_classification",
+    "save_students_bulk",
+    "save_classifications_bulk",
+    "delete_students_bulk",
+    "delete_classifications_bulk",
+    "load_fingerprints",
+    "save_fingerprints",
+    "student_fingerprint",
+    "classification_fingerprint",
+    "sync_all_to_sqlserver",
+    "refresh_statistics_summaries",
+    "get_course_statistics",
+    "get_class_statistics",
+    "get_top_students",
+    "load_integrated_tables",
+    "get_classification_runs",
+    "load_classification_version",
+    "diff_classification_versions",
+    "load_import_checkpoint",
+    "reset_import_checkpoint",
+    "import_chunk",
+)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlserver").strip().lower()
+
+if STORAGE_BACKEND not in BACKENDS:
+    raise ValueError(
+        f"STORAGE_BACKEND không hợp lệ: '{STORAGE_BACKEND}' (hỗ trợ: {', '.join(BACKENDS)})"
+    )
+
+backend = importlib.import_module(BACKENDS[STORAGE_BACKEND])
+
+_missing = [name for name in STORAGE_API if not hasattr(backend, name)]
+if _missing:
+    raise ImportError(f"Backend '{STORAGE_BACKEND}' thiếu: {', '.join(_missing)}")
+
+globals().update({name: getattr(backend, name) for name in STORAGE_API})
+
+__all__ = ["STORAGE_BACKEND", "backend", *STORAGE_API]
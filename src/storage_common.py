@@ -0,0 +1,618 @@
+"""
+Phần dùng chung của các storage backend (sqlserver_sync, sqlite_sync)
+
+Chỉ gồm phần không phụ thuộc driver: các truy vấn đọc viết bằng SQL chuẩn,
+dựng dict sinh viên từ dòng truy vấn, tham số ghi cho từng bảng, fingerprint
+nội dung và so sánh delta.
+"""
+
+import json
+import hashlib
+
+
+# Mapping course_code -> tên đầy đủ
+COURSE_CODE_TO_NAME = {
+    'NMLT': 'Nhập Môn Lập Trình',
+    'KTLT': 'Kĩ Thuật Lập Trình',
+    'CTDL': 'Cấu trúc Dữ Liệu và Giải Thuật',
+    'OOP': 'Lập Trình Hướng Đối Tượng'
+}
+
+# Thông tin sinh viên + csv_data (JOIN 2 bảng)
+STUDENTS_QUERY = """
+    SELECT s.student_id, s.name, s.class, s.khoa,
+           c.total_score, c.midterm_score, c.final_score, 
+           c.attendance_rate, c.behavior_score_100, 
+           c.late_submissions, c.assignment_completion,
+           c.study_hours_per_week, c.participation_score
+    FROM students s
+    LEFT JOIN student_csv_data c ON s.student_id = c.student_id
+"""
+
+# Điểm các môn học của tất cả sinh viên
+COURSE_SCORES_QUERY = """
+    SELECT student_id, COALESCE(course_code, course_name), score, midterm_score, final_score,
+           homework_score, time_minutes
+    FROM course_scores
+"""
+
+# Sinh viên + csv_data + điểm môn học trong 1 cursor, sắp xếp theo sinh viên
+STUDENTS_WITH_COURSES_QUERY = """
+    SELECT s.student_id, s.name, s.class, s.khoa,
+           c.total_score, c.midterm_score, c.final_score, 
+           c.attendance_rate, c.behavior_score_100, 
+           c.late_submissions, c.assignment_completion,
+           c.study_hours_per_week, c.participation_score,
+           cs.id, COALESCE(cs.course_code, cs.course_name), cs.score, cs.midterm_score, cs.final_score,
+           cs.homework_score, cs.time_minutes
+    FROM students s
+    LEFT JOIN student_csv_data c ON s.student_id = c.student_id
+    LEFT JOIN course_scores cs ON s.student_id = cs.student_id
+    ORDER BY s.student_id
+"""
+
+# Như STUDENTS_WITH_COURSES_QUERY nhưng chỉ các sinh viên trong bảng tạm {id_table} (student_id)
+STUDENTS_BY_IDS_QUERY = """
+    SELECT s.student_id, s.name, s.class, s.khoa,
+           c.total_score, c.midterm_score, c.final_score, 
+           c.attendance_rate, c.behavior_score_100, 
+           c.late_submissions, c.assignment_completion,
+           c.study_hours_per_week, c.participation_score,
+           cs.id, COALESCE(cs.course_code, cs.course_name), cs.score, cs.midterm_score, cs.final_score,
+           cs.homework_score, cs.time_minutes
+    FROM {id_table} ids
+    INNER JOIN students s ON s.student_id = ids.student_id
+    LEFT JOIN student_csv_data c ON s.student_id = c.student_id
+    LEFT JOIN course_scores cs ON s.student_id = cs.student_id
+    ORDER BY s.student_id
+"""
+
+# Số môn của từng sinh viên (phát hiện sinh viên / dòng course_scores bị xóa, watermark không thấy)
+STUDENT_COURSE_COUNTS_QUERY = """
+    SELECT s.student_id, COUNT(DISTINCT COALESCE(cs.course_code, cs.course_name))
+    FROM students s
+    LEFT JOIN course_scores cs ON s.student_id = cs.student_id
+    GROUP BY s.student_id
+"""
+
+# Thống kê theo môn học (chỉ sinh viên đã có kết quả phân loại): số lượng, tổng/min/max điểm,
+# số sinh viên theo mức điểm, tổng thời gian. Nhóm theo mã môn (hoặc tên môn nếu không có mã).
+COURSE_STATISTICS_COLUMNS = (
+    "course_key", "total_students", "score_sum", "min_score", "max_score",
+    "excellent", "good", "average", "weak", "total_time"
+)
+COURSE_STATISTICS_QUERY = """
+    SELECT t.course_key,
+           COUNT(*) AS total_students,
+           SUM(t.score) AS score_sum,
+           MIN(t.score) AS min_score,
+           MAX(t.score) AS max_score,
+           SUM(CASE WHEN t.score >= 8.5 THEN 1 ELSE 0 END) AS excellent,
+           SUM(CASE WHEN t.score >= 7.0 AND t.score < 8.5 THEN 1 ELSE 0 END) AS good,
+           SUM(CASE WHEN t.score >= 5.0 AND t.score < 7.0 THEN 1 ELSE 0 END) AS average,
+           SUM(CASE WHEN t.score < 5.0 THEN 1 ELSE 0 END) AS weak,
+           SUM(t.time_minutes) AS total_time
+    FROM (
+        SELECT COALESCE(cs.course_code, cs.course_name) AS course_key,
+               COALESCE(cs.score, 0) AS score,
+               COALESCE(cs.time_minutes, 0) AS time_minutes
+        FROM course_scores cs
+        WHERE COALESCE(cs.course_code, cs.course_name) IS NOT NULL
+          AND EXISTS (SELECT 1 FROM classifications c WHERE c.student_id = cs.student_id)
+    ) t
+    GROUP BY t.course_key
+"""
+
+# Thống kê theo lớp: điểm trung bình các môn của từng sinh viên -> số lượng, tổng/min/max
+# theo lớp + số sinh viên theo mức phân loại (final_level).
+# Điểm TB = tổng / số môn như bản tính Python (AVG có thể lệch ở chữ số làm tròn, vd 7.49 / 7.5)
+CLASS_STATISTICS_COLUMNS = (
+    "class_name", "total_students", "score_sum", "min_score", "max_score",
+    "xuat_sac", "kha", "trung_binh", "yeu"
+)
+CLASS_STATISTICS_QUERY = """
+    SELECT p.class_name,
+           COUNT(*) AS total_students,
+           SUM(p.avg_score) AS score_sum,
+           MIN(p.avg_score) AS min_score,
+           MAX(p.avg_score) AS max_score,
+           SUM(CASE WHEN c.final_level = 'Xuat sac' THEN 1 ELSE 0 END) AS xuat_sac,
+           SUM(CASE WHEN c.final_level = 'Kha' THEN 1 ELSE 0 END) AS kha,
+           SUM(CASE WHEN c.final_level = 'Trung binh' THEN 1 ELSE 0 END) AS trung_binh,
+           SUM(CASE WHEN c.final_level = 'Yeu' THEN 1 ELSE 0 END) AS yeu
+    FROM (
+        SELECT s.student_id,
+               COALESCE(s.class, 'Unknown') AS class_name,
+               SUM(COALESCE(cs.score, 0)) / COUNT(*) AS avg_score
+        FROM students s
+        INNER JOIN course_scores cs ON cs.student_id = s.student_id
+        GROUP BY s.student_id, s.class
+    ) p
+    INNER JOIN classifications c ON c.student_id = p.student_id
+    GROUP BY p.class_name
+"""
+
+# Bảng xếp hạng sinh viên (công thức của /api/top-students): điểm số 50% + hành vi 50%,
+# hạng toàn trường và hạng trong lớp bằng RANK() theo điểm làm tròn 1 chữ số (như khi hiển thị),
+# tính riêng cho nhóm bất thường / không bất thường. Điểm TB = tổng / số môn (như bảng thống kê theo lớp)
+STUDENT_RANKINGS_COLUMNS = (
+    "student_id", "name", "class_name", "avg_score", "ranking_score", "score_points",
+    "attendance", "attendance_points", "late_submissions", "ontime_points",
+    "total_time_hours", "time_points", "behavior_score", "final_level", "anomaly_detected",
+    "rank_overall", "rank_in_class",
+)
+
+STUDENT_RANKINGS_QUERY = """
+    SELECT r.student_id, r.name, r.class_name, r.avg_score, r.ranking_score, r.score_points,
+           r.attendance, r.attendance_points, r.late_submissions, r.ontime_points,
+           r.total_time_hours, r.time_points, r.behavior_score,
+           CASE WHEN r.avg_score < 5.0 THEN 'Yeu'
+                WHEN r.avg_score < 7.0 THEN 'Trung binh'
+                WHEN r.avg_score < 8.0 THEN 'Kha'
+                ELSE 'Xuat sac' END AS final_level,
+           r.anomaly_detected,
+           RANK() OVER (PARTITION BY r.anomaly_detected
+                        ORDER BY ROUND(r.ranking_score, 1) DESC) AS rank_overall,
+           RANK() OVER (PARTITION BY r.anomaly_detected, r.class_name
+                        ORDER BY ROUND(r.ranking_score, 1) DESC) AS rank_in_class
+    FROM (
+        SELECT q.*,
+               q.attendance_points + q.ontime_points + q.time_points AS behavior_score,
+               q.score_points + (q.attendance_points + q.ontime_points + q.time_points) / 2.0
+                   AS ranking_score
+        FROM (
+            SELECT p.student_id, p.name, p.class_name, p.avg_score, p.attendance,
+                   p.late_submissions, p.anomaly_detected,
+                   p.avg_score / 10.0 * 50 AS score_points,
+                   p.attendance / 100.0 * 40 AS attendance_points,
+                   CASE WHEN p.late_submissions > 30 * p.n_courses THEN 0.0
+                        ELSE CAST(30 * p.n_courses - p.late_submissions AS FLOAT) / (30 * p.n_courses)
+                   END * 30 AS ontime_points,
+                   p.total_time / 60.0 AS total_time_hours,
+                   CASE WHEN p.total_time / 60.0 >= 10 AND p.total_time / 60.0 <= 25 THEN 30
+                        WHEN p.total_time / 60.0 >= 5 THEN 20
+                        WHEN p.total_time / 60.0 >= 2 THEN 10
+                        ELSE 5 END AS time_points
+            FROM (
+                SELECT s.student_id, s.name, COALESCE(s.class, '') AS class_name,
+                       SUM(COALESCE(cs.score, 0)) / COUNT(*) AS avg_score,
+                       COUNT(*) AS n_courses,
+                       SUM(COALESCE(cs.time_minutes, 0)) AS total_time,
+                       CASE WHEN COALESCE(d.attendance_rate, 0) <= 1
+                            THEN COALESCE(d.attendance_rate, 0) * 100
+                            ELSE d.attendance_rate END AS attendance,
+                       COALESCE(d.late_submissions, 0) AS late_submissions,
+                       c.anomaly_detected
+                FROM students s
+                INNER JOIN classifications c ON c.student_id = s.student_id
+                INNER JOIN course_scores cs ON cs.student_id = s.student_id
+                LEFT JOIN student_csv_data d ON d.student_id = s.student_id
+                GROUP BY s.student_id, s.name, s.class, d.attendance_rate, d.late_submissions,
+                         c.anomaly_detected
+            ) p
+        ) q
+    ) r
+"""
+
+# Top N từ bảng xếp hạng (bỏ sinh viên bất thường), {filters} = điều kiện lớp / môn học
+TOP_STUDENTS_FILTERS = {
+    "class_name": "AND r.class_name = ?",
+    "course_name": """AND EXISTS (SELECT 1 FROM course_scores cs
+                                WHERE cs.student_id = r.student_id AND cs.course_name = ?)""",
+}
+
+# Lịch sử phân loại: mỗi lượt phân loại = 1 version trong classification_runs,
+# kết quả từng sinh viên được ghi thêm (append-only) vào classification_history
+CLASSIFICATION_RUN_COLUMNS = (
+    "version", "created_at", "total_students", "anomaly_count", "normalization_method", "note",
+)
+
+CLASSIFICATION_HISTORY_COLUMNS = (
+    "student_id", "kmeans_prediction", "knn_prediction",
+    "final_level", "anomaly_detected", "anomaly_reason",
+)
+
+# So sánh 2 version: chỉ các sinh viên đổi mức / đổi trạng thái bất thường / có ở 1 version.
+# Mỗi vế là 1 range seek trên khóa (version, student_id) rồi merge join theo student_id.
+CLASSIFICATION_DIFF_COLUMNS = (
+    "student_id", "old_level", "new_level", "old_anomaly", "new_anomaly",
+    "old_kmeans", "new_kmeans",
+)
+
+CLASSIFICATION_DIFF_QUERY = """
+    SELECT COALESCE(n.student_id, o.student_id) AS student_id,
+           o.final_level, n.final_level,
+           o.anomaly_detected, n.anomaly_detected,
+           o.kmeans_prediction, n.kmeans_prediction
+    FROM (SELECT student_id, final_level, anomaly_detected, kmeans_prediction
+          FROM classification_history WHERE version = ?) o
+    FULL OUTER JOIN (SELECT student_id, final_level, anomaly_detected, kmeans_prediction
+                     FROM classification_history WHERE version = ?) n
+        ON n.student_id = o.student_id
+    WHERE o.student_id IS NULL OR n.student_id IS NULL
+       OR COALESCE(o.final_level, '') <> COALESCE(n.final_level, '')
+       OR o.anomaly_detected <> n.anomaly_detected
+    ORDER BY 1
+"""
+
+# Dữ liệu cho hệ thống chấm điểm tích hợp: bảng -> (cột, truy vấn).
+# Điểm bài tập được gom ngay trong database (số bài + tổng điểm theo sinh viên, môn,
+# kỹ năng bằng GROUP BY) thay vì đọc từng bài tập; điểm thiếu tính là 0 như khi tính bằng Python.
+INTEGRATED_TABLES = {
+    "students": (
+        ("student_id", "name", "class"),
+        "SELECT student_id, name, class FROM students ORDER BY student_id",
+    ),
+    "student_csv_data": (
+        ("student_id", "midterm_score", "final_score", "homework_score", "total_score",
+         "attendance_rate", "study_hours_per_week", "assignment_completion", "behavior_score_100"),
+        """
+        SELECT student_id, midterm_score, final_score, homework_score, total_score,
+               attendance_rate, study_hours_per_week, assignment_completion, behavior_score_100
+        FROM student_csv_data
+        """,
+    ),
+    "course_scores": (
+        ("student_id", "course_code", "score"),
+        """
+        SELECT student_id, COALESCE(course_code, course_name), score
+        FROM course_scores
+        ORDER BY student_id, 2
+        """,
+    ),
+    "exercise_student_stats": (
+        ("student_id", "exercise_count", "anomaly_count", "score_sum"),
+        """
+        SELECT student_id, COUNT(*),
+               SUM(CASE WHEN is_anomaly = 1 THEN 1 ELSE 0 END),
+               SUM(COALESCE(score, 0))
+        FROM exercise_details
+        GROUP BY student_id
+        ORDER BY student_id
+        """,
+    ),
+    "exercise_course_stats": (
+        ("student_id", "course_code", "exercise_count", "score_sum"),
+        """
+        SELECT student_id, course_code, COUNT(*), SUM(COALESCE(score, 0))
+        FROM exercise_details
+        GROUP BY student_id, course_code
+        ORDER BY student_id, course_code
+        """,
+    ),
+    "exercise_skill_stats": (
+        ("student_id", "course_code", "skill_code", "exercise_count", "score_sum"),
+        """
+        SELECT student_id, course_code, skill_code, COUNT(*), SUM(COALESCE(score, 0))
+        FROM exercise_details
+        GROUP BY student_id, course_code, skill_code
+        ORDER BY student_id, course_code, skill_code
+        """,
+    ),
+}
+
+def _student_from_row(row):
+    """Dựng dict sinh viên từ 1 dòng students JOIN student_csv_data"""
+    return {
+        "student_id": row[0],
+        "name": row[1],
+        "class": row[2],
+        "Khoa": row[3],
+        "csv_data": {
+            "total_score": row[4] or 0,
+            "midterm_score": row[5] or 0,
+            "final_score": row[6] or 0,
+            "attendance_rate": row[7] or 0,
+            "behavior_score_100": row[8] or 50,
+            "late_submissions": row[9] or 0,
+            "assignment_completion": row[10] or 0,
+            "study_hours_per_week": row[11] or 0,
+            "participation_score": row[12] or 0,
+            "class": row[2]
+        },
+        "courses": {}
+    }
+
+def _course_from_row(row):
+    """Dựng (tên môn, dict điểm) từ 1 dòng course_scores (course_code, score, ...)"""
+    course_name = COURSE_CODE_TO_NAME.get(row[0], row[0])
+    return course_name, {
+        "score": row[1] or 0,
+        "midterm_score": row[2] or 0,
+        "final_score": row[3] or 0,
+        "homework_score": row[4] or 0,
+        "time_minutes": row[5] or 0
+    }
+
+def _assemble_students(cursor, chunk_size):
+    """
+    Gom các dòng (sinh viên + 1 môn học) đã sắp xếp theo student_id thành dict sinh viên.
+    Đọc bằng fetchmany(chunk_size), yield từng sinh viên khi đã đủ các môn.
+    """
+    current = None
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for row in rows:
+            if current is None or current["student_id"] != row[0]:
+                if current is not None:
+                    yield current
+                current = _student_from_row(row)
+            # row[13] = course_scores.id, NULL nếu sinh viên chưa có môn nào
+            if row[13] is not None:
+                course_name, course_data = _course_from_row(row[14:])
+                current["courses"][course_name] = course_data
+    
+    if current is not None:
+        yield current
+
+def _classification_row(student):
+    """Tham số INSERT classifications cho 1 sinh viên"""
+    return (
+        student.get("student_id"),
+        student.get("kmeans_prediction"),
+        student.get("knn_prediction"),
+        student.get("final_level"),
+        1 if student.get("anomaly_detected") else 0,
+        student.get("anomaly_reason", "")
+    )
+
+def _batches(rows, batch_size):
+    """Chia danh sách thành các lô batch_size phần tử"""
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+def _student_row(student):
+    """Tham số bảng students cho 1 sinh viên (cùng giá trị mặc định với save_student)"""
+    csv_data = student.get("csv_data", {})
+    return (
+        student.get("student_id"),
+        student.get("name"),
+        student.get("class") or csv_data.get("class"),
+        student.get("Khoa", "Khoa Công Nghệ Thông Tin"),
+        csv_data.get("total_score", 0),
+        csv_data.get("midterm_score", 0),
+        csv_data.get("final_score", 0),
+        csv_data.get("attendance_rate", 0),
+        csv_data.get("behavior_score_100", 50),
+        csv_data.get("late_submissions", 0),
+        csv_data.get("assignment_completion", 0)
+    )
+
+def _course_rows(student):
+    """Tham số bảng course_scores cho các môn học của 1 sinh viên"""
+    return [
+        (
+            student.get("student_id"),
+            course_name,
+            course_data.get("score", 0),
+            course_data.get("midterm_score", 0),
+            course_data.get("final_score", 0),
+            course_data.get("homework_score", 0),
+            course_data.get("time_minutes", 0)
+        )
+        for course_name, course_data in student.get("courses", {}).items()
+    ]
+
+# Các cột của student_csv_data (ngoài student_id), theo thứ tự của _csv_data_row
+CSV_DATA_COLUMNS = (
+    "total_score", "midterm_score", "final_score", "homework_score",
+    "attendance_rate", "behavior_score_100", "late_submissions",
+    "assignment_completion", "study_hours_per_week", "participation_score",
+)
+
+def _csv_data_row(student):
+    """Tham số bảng student_csv_data cho 1 sinh viên"""
+    csv_data = student.get("csv_data", {})
+    return (student.get("student_id"),) + tuple(
+        csv_data.get(column, 50 if column == "behavior_score_100" else 0)
+        for column in CSV_DATA_COLUMNS
+    )
+
+# Các cột của exercise_details, theo thứ tự của _exercise_row
+EXERCISE_COLUMNS = (
+    "student_id", "course_code", "skill_code", "exercise_number",
+    "score", "completion_time", "is_anomaly",
+)
+
+def _exercise_row(exercise):
+    """Tham số bảng exercise_details cho 1 bài tập"""
+    return (
+        exercise.get("student_id"),
+        exercise.get("course_code"),
+        exercise.get("skill_code"),
+        exercise.get("exercise_number"),
+        exercise.get("score", 0),
+        exercise.get("completion_time", 0),
+        1 if exercise.get("is_anomaly") else 0
+    )
+
+def _content_hash(payload):
+    """Mã băm SHA-256 ổn định của dữ liệu (không phụ thuộc thứ tự key)"""
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def student_fingerprint(student):
+    """Fingerprint nội dung sinh viên = đúng các giá trị được ghi vào students + course_scores"""
+    return _content_hash([_student_row(student), sorted(_course_rows(student))])
+
+def classification_fingerprint(student):
+    """Fingerprint kết quả phân loại = đúng các giá trị được ghi vào classifications"""
+    return _content_hash(_classification_row(student))
+
+# Bảng do sync ghi, xóa khi prune (bảng con trước, students sau cùng).
+# student_csv_data / exercise_details là dữ liệu nguồn của import, sync không bao giờ xóa.
+SYNC_OWNED_TABLES = ("classifications", "skill_evaluations", "course_scores", "students")
+
+
+def diff_fingerprints(stored, records, fingerprint_func):
+    """
+    So sánh fingerprint hiện tại với fingerprint đã đồng bộ
+
+    Args:
+        stored: dict {student_id: content_hash} đã đồng bộ (None = không đọc được)
+        records: Bản ghi hiện tại
+        fingerprint_func: student_fingerprint / classification_fingerprint
+
+    Returns:
+        (records cần ghi, danh sách student_id cần xóa, thống kê)
+    """
+    current = {}
+    for record in records:
+        if record.get("student_id") is not None:
+            current[record.get("student_id")] = record
+    
+    if stored is None:
+        # Không đọc được fingerprint -> ghi toàn bộ
+        stats = {"inserted": len(current), "changed": 0, "deleted": 0, "skipped": 0}
+        return list(current.values()), [], stats
+    
+    to_write = []
+    inserted = changed = 0
+    for student_id, record in current.items():
+        old_hash = stored.get(student_id)
+        if old_hash is None:
+            inserted += 1
+            to_write.append(record)
+        elif old_hash != fingerprint_func(record):
+            changed += 1
+            to_write.append(record)
+    
+    # Danh sách rỗng (chưa load dữ liệu) không được hiểu là "xóa tất cả"
+    deleted = [sid for sid in stored if sid not in current] if current else []
+    
+    stats = {
+        "inserted": inserted,
+        "changed": changed,
+        "deleted": len(deleted),
+        "skipped": len(current) - inserted - changed
+    }
+    return to_write, deleted, stats
+
+def _save_row_by_row(records, save_func, table):
+    """
+    Ghi từng bản ghi bằng save_func (đường ghi từng dòng, bulk=False)
+
+    Returns:
+        (list bản ghi đã lưu, dict lỗi cho report["errors"] hoặc None nếu không có bản ghi lỗi)
+    """
+    saved, failed = [], []
+    for record in records:
+        if save_func(record):
+            saved.append(record)
+        else:
+            failed.append(record.get("student_id"))
+    if not failed:
+        return saved, None
+    return saved, {"table": table, "success": False, "student_ids": failed,
+                   "error": f"Không lưu được {len(failed)} bản ghi"}
+
+def _partition_by_id(records, n_parts):
+    """Chia bản ghi thành n_parts khoảng student_id liên tiếp (kích thước gần bằng nhau)"""
+    ordered = sorted(records, key=lambda r: r.get("student_id"))
+    size = -(-len(ordered) // n_parts) if ordered else 0
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)] if size else []
+
+def _fetch_dicts(cursor, columns):
+    """Đọc toàn bộ kết quả của cursor thành list dict theo thứ tự cột columns"""
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+# ============== Đọc / ghi dùng chung (cursor của backend) ==============
+# Paramstyle "?" + tham số dạng tuple chạy được trên cả pyodbc và sqlite3.
+# Phần khác nhau giữa 2 backend (giới hạn số dòng, MERGE / UPSERT) do backend truyền vào.
+
+def _run_on_connection(get_connection, work, error_message, default=None, commit=False):
+    """
+    Chạy work(cursor) trên 1 kết nối lấy từ get_connection của backend
+
+    Args:
+        work: Hàm nhận cursor, trả về kết quả
+        error_message: Thông báo in ra khi lỗi
+        default: Kết quả khi không có kết nối / lỗi
+        commit: True = commit sau work, rollback khi lỗi
+
+    Returns:
+        Kết quả của work, hoặc default
+    """
+    conn = get_connection()
+    if not conn:
+        return default
+    
+    try:
+        result = work(conn.cursor())
+        if commit:
+            conn.commit()
+        return result
+    except Exception as e:
+        conn.discard_if_broken(e)
+        print(f"❌ {error_message}: {e}")
+        if commit:
+            conn.rollback()
+        return default
+    finally:
+        conn.close()
+
+def _read_course_counts(cursor):
+    """dict student_id -> số môn (STUDENT_COURSE_COUNTS_QUERY)"""
+    cursor.execute(STUDENT_COURSE_COUNTS_QUERY)
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+def _rebuild_statistics_summaries(cursor):
+    """Tính lại course_statistics_summary / class_statistics_summary / student_rankings"""
+    for table, columns, query in (
+        ("course_statistics_summary", COURSE_STATISTICS_COLUMNS, COURSE_STATISTICS_QUERY),
+        ("class_statistics_summary", CLASS_STATISTICS_COLUMNS, CLASS_STATISTICS_QUERY),
+        ("student_rankings", STUDENT_RANKINGS_COLUMNS, STUDENT_RANKINGS_QUERY),
+    ):
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) {query}")
+    return True
+
+def _read_statistics(cursor, table, columns, query, live):
+    """Thống kê từ bảng tổng hợp (live=False) hoặc tính trực tiếp bằng GROUP BY (live=True)"""
+    cursor.execute(query if live else f"SELECT {', '.join(columns)} FROM {table}")
+    return _fetch_dicts(cursor, columns)
+
+def _read_top_students(cursor, limit_clause, limit, class_name=None, course_name=None):
+    """
+    Top N sinh viên (không bất thường) từ student_rankings
+
+    Args:
+        limit_clause: Mệnh đề giới hạn số dòng của backend, 1 tham số "?" ở cuối câu lệnh
+                      (vd "LIMIT ?" / "OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY")
+        class_name: Chỉ lấy sinh viên của lớp này (xếp theo rank_in_class)
+        course_name: Chỉ lấy sinh viên có học môn này (tên môn đầy đủ)
+    """
+    filters = {"class_name": class_name, "course_name": course_name}
+    params = [value for value in filters.values() if value]
+    order = "r.rank_in_class" if class_name else "r.rank_overall"
+    cursor.execute(f"""
+        SELECT {', '.join(f'r.{c}' for c in STUDENT_RANKINGS_COLUMNS)}
+        FROM student_rankings r
+        WHERE r.anomaly_detected = 0
+        {' '.join(TOP_STUDENTS_FILTERS[key] for key, value in filters.items() if value)}
+        ORDER BY {order}, r.student_id
+        {limit_clause}
+    """, (*params, limit))
+    return _fetch_dicts(cursor, STUDENT_RANKINGS_COLUMNS)
+
+def _read_import_checkpoint(cursor, job):
+    """Checkpoint của 1 lượt import: dict chunks_done, rows_done (0 nếu chưa có)"""
+    cursor.execute("SELECT chunks_done, rows_done FROM import_checkpoints WHERE job = ?", (job,))
+    row = cursor.fetchone()
+    return {"chunks_done": row[0] if row else 0, "rows_done": row[1] if row else 0}
+
+def _delete_import_checkpoint(cursor, job):
+    cursor.execute("DELETE FROM import_checkpoints WHERE job = ?", (job,))
+    return True
+
+def _read_fingerprints(cursor, entity):
+    """dict {student_id: content_hash} đã đồng bộ của 1 loại dữ liệu"""
+    cursor.execute("SELECT student_id, content_hash FROM sync_fingerprints WHERE entity = ?", (entity,))
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+def _fingerprint_hashes(records, fingerprint_func):
+    """dict {student_id: fingerprint} của các bản ghi có student_id"""
+    return {r.get("student_id"): fingerprint_func(r) for r in records if r.get("student_id") is not None}
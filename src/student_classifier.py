@@ -11,8 +11,12 @@ from sklearn.neighbors import KNeighborsClassifier
 from sklearn.preprocessing import MinMaxScaler, StandardScaler
 from sklearn.model_selection import train_test_split
 import warnings
+import json
+import hashlib
 warnings.filterwarnings('ignore')
 
+from anomaly_rules import get_anomaly_engine
+
 COURSE_SKILLS = {
     "Nhập Môn Lập Trình": ["Biến và Kiểu dữ liệu", "Cấu trúc điều khiển", "Vòng lặp", "Hàm cơ bản"],
     "Kĩ Thuật Lập Trình": ["Mảng và xử lý mảng", "Con trỏ", "Chuỗi ký tự", "File I/O"],
@@ -20,6 +24,273 @@ COURSE_SKILLS = {
     "Lập Trình Hướng Đối Tượng": ["Lớp và Đối tượng", "Kế thừa", "Đa hình", "Đóng gói"]
 }
 
+# Các trường điểm của từng môn (ma trận sinh viên x môn) và các trường hành vi (1 giá trị/sinh viên)
+COURSE_FEATURE_FIELDS = ("score", "midterm_score", "final_score", "homework_score", "time_minutes")
+CSV_FEATURE_FIELDS = ("total_score", "midterm_score", "final_score", "attendance_rate",
+                      "behavior_score_100", "late_submissions", "assignment_completion")
+
+# Giá trị mặc định khi csv_data thiếu trường, dùng khi tính điểm tổng hợp trong predict
+# (features dùng mặc định 0)
+COMPOSITE_CSV_DEFAULTS = {"behavior_score_100": 50.0, "attendance_rate": 0.8}
+
+# Ngưỡng điểm tổng hợp (thang 10) -> xếp loại, dùng với np.digitize
+COMPOSITE_LEVEL_THRESHOLDS = np.array([5.0, 7.0, 8.0])
+COMPOSITE_LEVELS = np.array(["Yeu", "Trung binh", "Kha", "Xuat sac"])
+
+
+def students_to_feature_columns(students):
+    """
+    Dữ liệu dạng cột của nhóm sinh viên cho features_from_columns
+
+    Returns:
+        dict:
+        - course_<trường> (COURSE_FEATURE_FIELDS): mảng (n, k) float, cột j = môn thứ j của
+          sinh viên (theo thứ tự trong courses), phần thừa = 0
+        - course_mask: mảng (n, k) bool, True nếu ô có môn học
+        - course_count: số phần tử của courses (kể cả phần tử không phải dict)
+        - <trường> (CSV_FEATURE_FIELDS): mảng (n,) float từ csv_data (thiếu = 0)
+        - has_<trường> (COMPOSITE_CSV_DEFAULTS): mảng (n,) bool, True nếu csv_data có trường
+    """
+    rows, slots = [], []
+    course_values = {field: [] for field in COURSE_FEATURE_FIELDS}
+    csv_values = {field: [] for field in CSV_FEATURE_FIELDS}
+    csv_present = {field: [] for field in COMPOSITE_CSV_DEFAULTS}
+    course_count = []
+
+    for i, student in enumerate(students):
+        csv_data = student.get("csv_data", {})
+        courses = student.get("courses", {})
+        course_count.append(len(courses))
+        for field in CSV_FEATURE_FIELDS:
+            csv_values[field].append(csv_data.get(field, 0))
+        for field in COMPOSITE_CSV_DEFAULTS:
+            csv_present[field].append(field in csv_data)
+
+        j = 0
+        for course_data in courses.values():
+            if isinstance(course_data, dict):
+                rows.append(i)
+                slots.append(j)
+                for field in COURSE_FEATURE_FIELDS:
+                    course_values[field].append(course_data.get(field, 0))
+                j += 1
+
+    n = len(course_count)
+    k = max(slots) + 1 if slots else 0
+    columns = {"course_mask": np.zeros((n, k), dtype=bool),
+               "course_count": np.asarray(course_count, dtype=np.int64)}
+    columns["course_mask"][rows, slots] = True
+    for field, values in course_values.items():
+        matrix = np.zeros((n, k))
+        matrix[rows, slots] = np.asarray(values, dtype=float)
+        columns[f"course_{field}"] = matrix
+    for field, values in csv_values.items():
+        columns[field] = np.asarray(values, dtype=float)
+    for field, values in csv_present.items():
+        columns[f"has_{field}"] = np.asarray(values, dtype=bool)
+    return columns
+
+
+def _row_sum(values, mask):
+    """
+    Tổng theo từng dòng của các ô có môn học, cộng lần lượt từng cột
+    (cùng thứ tự cộng với sum() trên list điểm của từng sinh viên)
+    """
+    total = np.zeros(values.shape[0])
+    for j in range(values.shape[1]):
+        total = total + np.where(mask[:, j], values[:, j], 0.0)
+    return total
+
+
+def _course_score_std(scores, mask, divisor):
+    """Độ lệch chuẩn điểm các môn (như np.std: trung bình, bình phương độ lệch, chia n, căn)"""
+    score_mean = _row_sum(scores, mask) / divisor
+    deviation = scores - score_mean[:, None]
+    return np.sqrt(_row_sum(deviation * deviation, mask) / divisor)
+
+
+def features_from_columns(columns):
+    """
+    Ma trận 12 features (xem StudentClassifier.extract_features) từ dữ liệu dạng cột
+    (students_to_feature_columns), tính bằng phép toán mảng + mask trên cả nhóm sinh viên
+    """
+    mask = columns["course_mask"]
+    n = len(columns["course_count"])
+    if n == 0:
+        return np.array([])
+
+    n_courses = mask.sum(axis=1)
+    has_courses = n_courses > 0
+    divisor = np.maximum(n_courses, 1)
+
+    def course_mean(field, fallback):
+        return np.where(has_courses, _row_sum(columns[f"course_{field}"], mask) / divisor, fallback)
+
+    # ĐIỂM SỐ - Trung bình các môn (không có môn -> csv_data)
+    total_score = course_mean("score", columns["total_score"])
+    midterm = course_mean("midterm_score", columns["midterm_score"])
+    final = course_mean("final_score", columns["final_score"])
+    homework = course_mean("homework_score", 0.0)
+
+    # HÀNH VI
+    attendance = columns["attendance_rate"]
+    behavior = columns["behavior_score_100"] / 100
+    late_submissions = columns["late_submissions"]
+    assignment = columns["assignment_completion"]
+
+    # THỜI GIAN LÀM BÀI (chia cho số phần tử của courses)
+    total_time = _row_sum(columns["course_time_minutes"], mask)
+    course_count = columns["course_count"]
+    avg_time = np.where(course_count > 0, total_time / np.maximum(course_count, 1), 0.0)
+
+    # Điểm chuyên cần (không nộp muộn = tốt)
+    punctuality = np.maximum(0, 1.0 - (late_submissions / 10.0))
+
+    # Điểm bất thường (điểm cao + thời gian ngắn = xấu) - Ngưỡng nới lỏng
+    anomaly_score = np.select(
+        [(total_score >= 9.5) & (avg_time < 30),
+         (total_score >= 9.0) & (avg_time < 60),
+         (total_score >= 8.5) & (avg_time < 90)],
+        [1.0, 0.6, 0.3],
+        default=0.0
+    )
+
+    score_std = _course_score_std(columns["course_score"], mask, divisor)
+
+    # Vector 12 features chuẩn hóa [0,1]
+    return np.column_stack([
+        total_score / 10.0,                 # 1. Điểm TB các môn
+        midterm / 10.0,                     # 2. Điểm giữa kỳ TB
+        final / 10.0,                       # 3. Điểm cuối kỳ TB
+        homework / 10.0,                    # 4. Điểm bài tập TB
+        behavior,                           # 5. Điểm hành vi
+        attendance,                         # 6. Tỷ lệ tham gia
+        punctuality,                        # 7. Chuyên cần (không nộp muộn)
+        assignment,                         # 8. Hoàn thành bài tập
+        np.minimum(avg_time / 600, 1.0),    # 9. Thời gian làm bài
+        1.0 - anomaly_score,                # 10. Điểm "sạch" (không bất thường)
+        np.minimum(late_submissions / 10, 1.0),  # 11. Tỷ lệ nộp muộn
+        # 12. Độ ổn định điểm (điểm các môn không chênh lệch nhiều)
+        1.0 - np.where(n_courses > 1, score_std / 5.0, 0)
+    ])
+
+
+def composite_levels(columns):
+    """
+    Xếp loại theo điểm tổng hợp (điểm số + hành vi, thang 10) sau khi trừ điểm
+    nộp muộn / vắng / thời gian học ngắn, tính trên cả nhóm sinh viên
+    (dữ liệu dạng cột từ students_to_feature_columns)
+
+    Returns:
+        list xếp loại ("Xuat sac" | "Kha" | "Trung binh" | "Yeu") theo thứ tự sinh viên
+    """
+    mask = columns["course_mask"]
+    if len(columns["course_count"]) == 0:
+        return []
+
+    n_courses = mask.sum(axis=1)
+    has_courses = n_courses > 0
+    divisor = np.maximum(n_courses, 1)
+
+    def course_mean(field, fallback):
+        return np.where(has_courses, _row_sum(columns[f"course_{field}"], mask) / divisor, fallback)
+
+    total_score = course_mean("score", columns["total_score"])
+    midterm_avg = course_mean("midterm_score", 0.0)
+    final_avg = course_mean("final_score", 0.0)
+    homework_avg = course_mean("homework_score", 0.0)
+
+    behavior = np.where(columns["has_behavior_score_100"], columns["behavior_score_100"],
+                        COMPOSITE_CSV_DEFAULTS["behavior_score_100"])
+    attendance = np.where(columns["has_attendance_rate"], columns["attendance_rate"],
+                          COMPOSITE_CSV_DEFAULTS["attendance_rate"])
+    late_submissions = columns["late_submissions"]
+
+    # Điểm tổng hợp = 50% điểm + 50% hành vi
+    # Điểm số: 15% TB + 10% giữa kỳ + 15% cuối kỳ + 10% bài tập
+    # Hành vi: 15% hành vi + 15% tham gia + 10% chuyên cần + 10% ổn định
+    score_component = (
+        total_score * 0.15 +
+        midterm_avg * 0.10 +
+        final_avg * 0.15 +
+        homework_avg * 0.10
+    )
+
+    punctuality = np.maximum(0, 1.0 - (late_submissions / 10.0))
+    score_std = _course_score_std(columns["course_score"], mask, divisor)
+    stability = 1.0 - np.where(n_courses > 1, score_std / 5.0, 0)
+
+    behavior_component = (
+        (behavior / 100) * 10 * 0.15 +
+        attendance * 10 * 0.15 +
+        punctuality * 10 * 0.10 +
+        stability * 10 * 0.10
+    )
+
+    composite = score_component + behavior_component
+
+    # Trừ điểm nếu nộp trễ nhiều
+    late_penalty = np.select(
+        [late_submissions >= 20, late_submissions >= 15, late_submissions >= 10, late_submissions >= 5],
+        [2.0, 1.5, 1.0, 0.5],
+        default=0.0
+    )
+
+    # Trừ điểm nếu vắng nhiều (vắng > 60% | > 50% | > 40% | > 30%)
+    attendance_penalty = np.select(
+        [attendance < 0.4, attendance < 0.5, attendance < 0.6, attendance < 0.7],
+        [2.0, 1.5, 1.0, 0.5],
+        default=0.0
+    )
+
+    # Trừ điểm nếu thời gian học quá ngắn so với điểm số
+    time_hours = _row_sum(columns["course_time_minutes"], mask) / 60
+    time_penalty = np.select(
+        [(total_score >= 8.0) & (time_hours < 5), (total_score >= 8.0) & (time_hours < 8)],
+        [1.5, 0.5],
+        default=0.0
+    )
+
+    # Điểm cuối cùng sau khi trừ penalty (fmax: NaN -> 0 như max(0, ...))
+    total_penalty = late_penalty + attendance_penalty + time_penalty
+    final_composite = np.fmax(0, composite - total_penalty)
+
+    # >= 8: Xuất sắc | 7-7.9: Khá | 5-6.9: Trung bình | < 5: Yếu
+    return COMPOSITE_LEVELS[np.digitize(final_composite, COMPOSITE_LEVEL_THRESHOLDS)].tolist()
+
+
+def anomaly_columns(columns):
+    """
+    Các cột cho bảng luật bất thường (anomaly_rules.ANOMALY_COLUMNS) + avg_time_minutes,
+    từ dữ liệu dạng cột (students_to_feature_columns). Trường csv_data thiếu = 0.
+    """
+    mask = columns["course_mask"]
+    n_courses = mask.sum(axis=1)
+    avg_score = np.where(n_courses > 0, _row_sum(columns["course_score"], mask) / np.maximum(n_courses, 1),
+                         columns["total_score"])
+
+    total_time = _row_sum(columns["course_time_minutes"], mask)
+    course_count = columns["course_count"]
+    time_hours = total_time / 60
+    has_time = time_hours > 0
+
+    attendance = columns["attendance_rate"]
+    late_submissions = columns["late_submissions"]
+    return {
+        "avg_score": avg_score,
+        "time_hours": time_hours,
+        # Tỷ lệ hiệu quả = điểm / giờ (999 nếu không có thời gian)
+        "efficiency": np.where(has_time, avg_score / np.where(has_time, time_hours, 1.0), 999.0),
+        "attendance": attendance,
+        "attendance_pct": attendance * 100,
+        "absence_pct": (1 - attendance) * 100,
+        "behavior": columns["behavior_score_100"],
+        "late_submissions": late_submissions,
+        "late_count": np.trunc(late_submissions),
+        "avg_time_minutes": np.where(course_count > 0, total_time / np.maximum(course_count, 1), 0.0),
+    }
+
+
 class StudentClassifier:
     def __init__(self, n_clusters=4, normalization_method='minmax'):
         self.n_clusters = n_clusters
@@ -29,6 +300,15 @@ class StudentClassifier:
         self.knn = None
         self.cluster_labels = {}
     
+    def config_digest(self):
+        """Digest cấu hình ảnh hưởng kết quả phân loại (n_clusters, chuẩn hóa, bảng luật bất thường)"""
+        config = {
+            'n_clusters': self.n_clusters,
+            'normalization_method': self.normalization_method,
+            'anomaly_rules': get_anomaly_engine().digest,
+        }
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+    
     def _evaluate_skill(self, score, time_minutes, skill_name):
         """Đánh giá kỹ năng + phát hiện gian lận"""
         anomaly = False
@@ -118,67 +398,9 @@ class StudentClassifier:
         - Điểm số (50%): điểm TB, giữa kỳ, cuối kỳ, bài tập từng môn
         - Hành vi (50%): tham gia, hành vi, chuyên cần, hoàn thành bài tập, thời gian làm bài
         Chỉ xử lý sinh viên có đủ dữ liệu.
+        Tính theo mảng trên cả nhóm sinh viên (xem students_to_feature_columns, features_from_columns).
         """
-        features = []
-        for student in students:
-            csv_data = student.get("csv_data", {})
-            courses = student.get("courses", {})
-            
-            # ĐIỂM SỐ - Tính từ các môn học
-            course_scores = []
-            course_midterms = []
-            course_finals = []
-            course_homeworks = []
-            
-            for course_data in courses.values():
-                if isinstance(course_data, dict):
-                    course_scores.append(float(course_data.get("score", 0)))
-                    course_midterms.append(float(course_data.get("midterm_score", 0)))
-                    course_finals.append(float(course_data.get("final_score", 0)))
-                    course_homeworks.append(float(course_data.get("homework_score", 0)))
-            
-            # Tính trung bình
-            total_score = sum(course_scores) / len(course_scores) if course_scores else float(csv_data.get("total_score", 0))
-            midterm = sum(course_midterms) / len(course_midterms) if course_midterms else float(csv_data.get("midterm_score", 0))
-            final = sum(course_finals) / len(course_finals) if course_finals else float(csv_data.get("final_score", 0))
-            homework = sum(course_homeworks) / len(course_homeworks) if course_homeworks else 0
-            
-            # HÀNH VI
-            attendance = float(csv_data.get("attendance_rate", 0))
-            behavior = float(csv_data.get("behavior_score_100", 0)) / 100
-            late_submissions = float(csv_data.get("late_submissions", 0))
-            assignment = float(csv_data.get("assignment_completion", 0))
-            
-            # THỜI GIAN LÀM BÀI
-            total_time = sum(float(c.get("time_minutes", 0)) for c in courses.values() if isinstance(c, dict))
-            avg_time = total_time / len(courses) if courses else 0
-            
-            # Điểm chuyên cần (không nộp muộn = tốt)
-            punctuality = max(0, 1.0 - (late_submissions / 10.0))
-            
-            # Điểm bất thường (điểm cao + thời gian ngắn = xấu) - Ngưỡng nới lỏng
-            anomaly_score = 0
-            if total_score >= 9.5 and avg_time < 30: anomaly_score = 1.0
-            elif total_score >= 9.0 and avg_time < 60: anomaly_score = 0.6
-            elif total_score >= 8.5 and avg_time < 90: anomaly_score = 0.3
-            
-            # Vector 12 features chuẩn hóa [0,1]
-            features.append([
-                total_score / 10.0,           # 1. Điểm TB các môn
-                midterm / 10.0,               # 2. Điểm giữa kỳ TB
-                final / 10.0,                 # 3. Điểm cuối kỳ TB
-                homework / 10.0,              # 4. Điểm bài tập TB
-                behavior,                     # 5. Điểm hành vi
-                attendance,                   # 6. Tỷ lệ tham gia
-                punctuality,                  # 7. Chuyên cần (không nộp muộn)
-                assignment,                   # 8. Hoàn thành bài tập
-                min(avg_time / 600, 1.0),     # 9. Thời gian làm bài
-                1.0 - anomaly_score,          # 10. Điểm "sạch" (không bất thường)
-                min(late_submissions / 10, 1.0),  # 11. Tỷ lệ nộp muộn
-                # 12. Độ ổn định điểm (điểm các môn không chênh lệch nhiều)
-                1.0 - (np.std(course_scores) / 5.0 if len(course_scores) > 1 else 0)
-            ])
-        return np.array(features)
+        return features_from_columns(students_to_feature_columns(students))
     
     def normalize_features(self, features, fit=True):
         if fit: return self.scaler.fit_transform(features)
@@ -294,17 +516,12 @@ class StudentClassifier:
         Dự đoán dựa trên điểm số + hành vi, có điều chỉnh theo bất thường.
         CHỈ phân loại sinh viên có đủ dữ liệu.
         """
-        # Tách sinh viên có đủ dữ liệu và không đủ
-        valid_students = []
-        insufficient_students = []
-        valid_indices = []
-        
-        for i, student in enumerate(students):
-            if self.has_sufficient_data(student):
-                valid_students.append(student)
-                valid_indices.append(i)
-            else:
-                insufficient_students.append(student)
+        # Tách sinh viên có đủ dữ liệu và không đủ (chỉ số theo thứ tự ban đầu)
+        sufficient = np.fromiter((self.has_sufficient_data(s) for s in students), dtype=bool, count=len(students))
+        valid_indices = np.flatnonzero(sufficient)
+        insufficient_indices = np.flatnonzero(~sufficient)
+        valid_students = [students[i] for i in valid_indices]
+        insufficient_students = [students[i] for i in insufficient_indices]
         
         # Nếu không có sinh viên hợp lệ
         if not valid_students:
@@ -319,7 +536,9 @@ class StudentClassifier:
                 "insufficient_data": True
             } for s in students]
         
-        features = self.extract_features(valid_students)
+        # Dữ liệu dạng cột dùng chung cho features và điểm tổng hợp
+        columns = students_to_feature_columns(valid_students)
+        features = features_from_columns(columns)
         features_normalized = self.normalize_features(features, fit=False)
         
         # Dự đoán K-means (tham khảo)
@@ -329,247 +548,65 @@ class StudentClassifier:
         # Dự đoán KNN (tham khảo)
         knn_predictions = self.knn.predict(features_normalized).tolist() if self.knn else kmeans_predictions
         
-        # Tính điểm tổng hợp và phân loại theo ngưỡng (chỉ cho valid_students)
-        composite_predictions = []
-        for i, student in enumerate(valid_students):
-            csv_data = student.get("csv_data", {})
-            courses = student.get("courses", {})
-            
-            # Tính điểm từ các môn học
-            course_scores = []
-            course_midterms = []
-            course_finals = []
-            course_homeworks = []
-            
-            for course_data in courses.values():
-                if isinstance(course_data, dict):
-                    course_scores.append(float(course_data.get("score", 0)))
-                    course_midterms.append(float(course_data.get("midterm_score", 0)))
-                    course_finals.append(float(course_data.get("final_score", 0)))
-                    course_homeworks.append(float(course_data.get("homework_score", 0)))
-            
-            total_score = sum(course_scores) / len(course_scores) if course_scores else float(csv_data.get("total_score", 0))
-            midterm_avg = sum(course_midterms) / len(course_midterms) if course_midterms else 0
-            final_avg = sum(course_finals) / len(course_finals) if course_finals else 0
-            homework_avg = sum(course_homeworks) / len(course_homeworks) if course_homeworks else 0
-            
-            behavior = float(csv_data.get("behavior_score_100", 50))
-            attendance = float(csv_data.get("attendance_rate", 0.8))
-            late_submissions = float(csv_data.get("late_submissions", 0))
-            
-            # Điểm tổng hợp = 50% điểm + 50% hành vi
-            # Điểm số: 15% TB + 10% giữa kỳ + 15% cuối kỳ + 10% bài tập
-            # Hành vi: 15% hành vi + 15% tham gia + 10% chuyên cần + 10% ổn định
-            score_component = (
-                total_score * 0.15 +
-                midterm_avg * 0.10 +
-                final_avg * 0.15 +
-                homework_avg * 0.10
-            )
-            
-            punctuality = max(0, 1.0 - (late_submissions / 10.0))
-            stability = 1.0 - (np.std(course_scores) / 5.0 if len(course_scores) > 1 else 0)
-            
-            behavior_component = (
-                (behavior / 100) * 10 * 0.15 +
-                attendance * 10 * 0.15 +
-                punctuality * 10 * 0.10 +
-                stability * 10 * 0.10
-            )
-            
-            composite = score_component + behavior_component
-            
-            # PHÂN LOẠI THEO ĐIỂM TỔNG HỢP (điểm số + hành vi)
-            # Điểm tổng hợp tối đa = 5 (điểm) + 5 (hành vi) = 10
-            
-            # Trừ điểm nếu nộp trễ nhiều
-            late_penalty = 0
-            if late_submissions >= 20:
-                late_penalty = 2.0
-            elif late_submissions >= 15:
-                late_penalty = 1.5
-            elif late_submissions >= 10:
-                late_penalty = 1.0
-            elif late_submissions >= 5:
-                late_penalty = 0.5
-            
-            # Trừ điểm nếu vắng nhiều
-            attendance_penalty = 0
-            if attendance < 0.4:
-                attendance_penalty = 2.0  # Vắng > 60%: trừ 2 điểm
-            elif attendance < 0.5:
-                attendance_penalty = 1.5  # Vắng > 50%: trừ 1.5 điểm
-            elif attendance < 0.6:
-                attendance_penalty = 1.0  # Vắng > 40%: trừ 1 điểm
-            elif attendance < 0.7:
-                attendance_penalty = 0.5  # Vắng > 30%: trừ 0.5 điểm
-            
-            # Trừ điểm nếu thời gian học quá ngắn so với điểm số
-            time_hours = sum(float(c.get("time_minutes", 0)) for c in courses.values() if isinstance(c, dict)) / 60
-            time_penalty = 0
-            if total_score >= 8.0 and time_hours < 5:
-                time_penalty = 1.5  # Điểm cao + thời gian ngắn
-            elif total_score >= 8.0 and time_hours < 8:
-                time_penalty = 0.5
-            
-            # Điểm cuối cùng sau khi trừ penalty
-            total_penalty = late_penalty + attendance_penalty + time_penalty
-            final_composite = max(0, composite - total_penalty)
-            
-            # Phân loại theo điểm tổng hợp (thang 10)
-            # >= 8: Xuất sắc | 7-7.9: Khá | 5-6.9: Trung bình | < 5: Yếu
-            if final_composite >= 8.0:
-                level = "Xuat sac"
-            elif final_composite >= 7.0:
-                level = "Kha"
-            elif final_composite >= 5.0:
-                level = "Trung binh"
-            else:
-                level = "Yeu"
-            
-            composite_predictions.append(level)
+        # Tính điểm tổng hợp và phân loại theo ngưỡng (chỉ cho valid_students, xem composite_levels)
+        composite_predictions = composite_levels(columns)
+        
+        # PHÁT HIỆN BẤT THƯỜNG - Dựa trên mối quan hệ điểm-thời gian-hành vi (bảng luật anomaly_rules)
+        anomaly_values = anomaly_columns(columns)
+        anomaly_detected, anomaly_severity, anomaly_reasons = get_anomaly_engine().evaluate(anomaly_values)
+        
+        # ĐIỀU CHỈNH XẾP LOẠI theo bất thường
+        # Severity 1: hạ 1 bậc (nộp muộn 5-9 lần, vắng nhẹ)
+        # Severity 2: hạ 2 bậc (nộp muộn 10-14 lần, vắng nhiều)
+        # Severity 3: hạ xuống Yếu (nghi gian lận, nộp muộn >= 15)
+        level_order = ["Xuat sac", "Kha", "Trung binh", "Yeu"]
+        level_idx = np.array([level_order.index(level) for level in composite_predictions])
+        level_idx = np.select(
+            [anomaly_detected & (anomaly_severity >= 3),
+             anomaly_detected & (anomaly_severity >= 2),
+             anomaly_detected & (anomaly_severity >= 1)],
+            [3, np.minimum(level_idx + 2, 3), np.minimum(level_idx + 1, 3)],
+            default=level_idx
+        )
+        final_levels = [level_order[idx] for idx in level_idx.tolist()]
+        
+        total_scores = columns["total_score"].tolist()
+        midterm_scores = columns["midterm_score"].tolist()
+        final_scores = columns["final_score"].tolist()
+        attendance_rates = (columns["attendance_rate"] * 100).tolist()
+        behaviors = columns["behavior_score_100"].tolist()
+        late_submissions = columns["late_submissions"].tolist()
+        avg_times = anomaly_values["avg_time_minutes"].tolist()
+        anomaly_detected = anomaly_detected.tolist()
+        anomaly_severity = anomaly_severity.tolist()
         
         # Xử lý kết quả cho valid_students
         valid_results = []
         for i, student in enumerate(valid_students):
-            csv_data = student.get("csv_data", {})
-            courses = student.get("courses", {})
-            
-            total_score = float(csv_data.get("total_score", 0))
-            late_submissions = float(csv_data.get("late_submissions", 0))
-            attendance = float(csv_data.get("attendance_rate", 0))
-            behavior = float(csv_data.get("behavior_score_100", 0))
-            
             # Đánh giá kỹ năng từng môn
             skill_evaluations = {}
             for course_name in COURSE_SKILLS.keys():
                 skill_evaluations[course_name] = self.evaluate_course_skills(student, course_name)
             
-            # Tính thời gian làm bài
-            total_time = sum(float(c.get("time_minutes", 0)) for c in courses.values() if isinstance(c, dict))
-            avg_time = total_time / len(courses) if courses else 0
-            
-            # Tính điểm trung bình từ các môn học
-            course_scores = [float(c.get("score", 0)) for c in courses.values() if isinstance(c, dict)]
-            avg_course_score = sum(course_scores) / len(course_scores) if course_scores else total_score
-            
-            # Tính thời gian theo giờ
-            time_hours = total_time / 60
-            
-            # PHÁT HIỆN BẤT THƯỜNG - Dựa trên mối quan hệ điểm-thời gian-hành vi
-            anomaly_detected = False
-            anomaly_reasons = []
-            anomaly_severity = 0
-            
-            # Tính tỷ lệ hiệu quả (efficiency ratio) = điểm / thời gian
-            # Sinh viên bình thường: ~0.8-1.2 điểm/giờ
-            # Nghi ngờ: > 1.5 điểm/giờ với điểm >= 8
-            efficiency_ratio = avg_course_score / time_hours if time_hours > 0 else 999
-            
-            # 1. Điểm cao + thời gian quá ngắn (nghi gian lận/dùng AI)
-            if avg_course_score >= 8.5 and time_hours < 5:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 3)
-                anomaly_reasons.append(f"Điểm {avg_course_score:.1f}/10 nhưng thời gian chỉ {time_hours:.1f}h (nghi gian lận)")
-            elif avg_course_score >= 8.0 and time_hours < 4:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 3)
-                anomaly_reasons.append(f"Điểm {avg_course_score:.1f}/10 nhưng thời gian chỉ {time_hours:.1f}h (đáng nghi)")
-            # MỚI: Phát hiện dựa trên tỷ lệ hiệu quả bất thường
-            elif avg_course_score >= 8.0 and efficiency_ratio > 1.5:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 2)
-                anomaly_reasons.append(f"Tỷ lệ điểm/thời gian cao bất thường ({efficiency_ratio:.1f} điểm/h) - cần xem xét")
-            
-            # 2. Điểm cao + vắng nhiều (nghi gian lận) - QUAN TRỌNG
-            if avg_course_score >= 8.0 and attendance < 0.5:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 3)
-                anomaly_reasons.append(f"Điểm cao ({avg_course_score:.1f}/10) nhưng vắng {(1-attendance)*100:.0f}% (nghi gian lận)")
-            elif avg_course_score >= 8.0 and attendance < 0.7:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 2)
-                anomaly_reasons.append(f"Điểm cao ({avg_course_score:.1f}/10) nhưng vắng {(1-attendance)*100:.0f}%")
-            
-            # 3. Điểm cao + thời gian ngắn + vắng nhiều = RẤT ĐÁNG NGỜ
-            if avg_course_score >= 8.0 and time_hours < 6 and attendance < 0.7:
-                anomaly_severity = max(anomaly_severity, 3)
-                if not any("nghi gian lận" in r for r in anomaly_reasons):
-                    anomaly_reasons.append(f"Kết hợp: điểm cao + thời gian ngắn + vắng nhiều (rất đáng ngờ)")
-            
-            # 4. Nộp muộn nhiều - phạt theo mức độ
-            if late_submissions >= 20:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 3)
-                anomaly_reasons.append(f"Nộp muộn quá nhiều ({int(late_submissions)} lần)")
-            elif late_submissions >= 15:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 3)
-                anomaly_reasons.append(f"Nộp muộn rất nhiều ({int(late_submissions)} lần)")
-            elif late_submissions >= 10:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 2)
-                anomaly_reasons.append(f"Nộp muộn nhiều ({int(late_submissions)} lần)")
-            elif late_submissions >= 5:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 1)
-                anomaly_reasons.append(f"Nộp muộn {int(late_submissions)} lần")
-            
-            # 5. Vắng rất nhiều (< 50%)
-            if attendance < 0.5:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 2)
-                if not any("vắng" in r.lower() for r in anomaly_reasons):
-                    anomaly_reasons.append(f"Tham gia chỉ {attendance*100:.0f}%")
-            
-            # 5. Điểm thấp nhưng chăm chỉ (cần hỗ trợ)
-            if avg_course_score < 5.0 and behavior >= 85 and attendance >= 0.95:
-                anomaly_detected = True
-                anomaly_severity = max(anomaly_severity, 1)
-                anomaly_reasons.append(f"Điểm thấp ({avg_course_score:.1f}) nhưng rất chăm chỉ - cần hỗ trợ")
-            
-            # Sử dụng phân loại theo điểm tổng hợp
-            final_level = composite_predictions[i]
-            level_order = ["Xuat sac", "Kha", "Trung binh", "Yeu"]
-            
-            # ĐIỀU CHỈNH XẾP LOẠI theo bất thường
-            # Severity 1: hạ 1 bậc (nộp muộn 5-9 lần, vắng nhẹ)
-            # Severity 2: hạ 2 bậc (nộp muộn 10-14 lần, vắng nhiều)
-            # Severity 3: hạ xuống Yếu (nghi gian lận, nộp muộn >= 15)
-            if anomaly_detected and anomaly_severity >= 1:
-                current_idx = level_order.index(final_level) if final_level in level_order else 0
-                
-                if anomaly_severity >= 3:
-                    # Nghiêm trọng: hạ xuống Yếu
-                    new_idx = 3
-                elif anomaly_severity >= 2:
-                    # Trung bình: hạ 2 bậc
-                    new_idx = min(current_idx + 2, 3)
-                else:
-                    # Nhẹ: hạ 1 bậc
-                    new_idx = min(current_idx + 1, 3)
-                
-                final_level = level_order[new_idx]
-            
             valid_results.append({
                 **student,
                 "kmeans_prediction": kmeans_predictions[i],
                 "knn_prediction": knn_predictions[i],
-                "final_level": final_level,
+                "final_level": final_levels[i],
                 "skill_evaluations": skill_evaluations,
-                "anomaly_detected": anomaly_detected,
-                "anomaly_reason": " | ".join(anomaly_reasons),
-                "anomaly_reasons": anomaly_reasons,
-                "anomaly_severity": anomaly_severity,
+                "anomaly_detected": anomaly_detected[i],
+                "anomaly_reason": " | ".join(anomaly_reasons[i]),
+                "anomaly_reasons": anomaly_reasons[i],
+                "anomaly_severity": anomaly_severity[i],
                 "insufficient_data": False,
                 "detailed_scores": {
-                    "total_score": total_score,
-                    "midterm_score": float(csv_data.get("midterm_score", 0)),
-                    "final_score": float(csv_data.get("final_score", 0)),
-                    "attendance_rate": attendance * 100,
-                    "behavior_score": behavior,
-                    "late_submissions": int(late_submissions),
-                    "avg_time_minutes": avg_time
+                    "total_score": total_scores[i],
+                    "midterm_score": midterm_scores[i],
+                    "final_score": final_scores[i],
+                    "attendance_rate": attendance_rates[i],
+                    "behavior_score": behaviors[i],
+                    "late_submissions": int(late_submissions[i]),
+                    "avg_time_minutes": avg_times[i]
                 }
             })
         
@@ -591,16 +628,11 @@ class StudentClassifier:
             })
         
         # Kết hợp kết quả theo thứ tự ban đầu
-        all_results = []
-        valid_idx = 0
-        insuff_idx = 0
-        for i, student in enumerate(students):
-            if i in valid_indices:
-                all_results.append(valid_results[valid_idx])
-                valid_idx += 1
-            else:
-                all_results.append(insufficient_results[insuff_idx])
-                insuff_idx += 1
+        all_results = [None] * len(students)
+        for i, result in zip(valid_indices.tolist(), valid_results):
+            all_results[i] = result
+        for i, result in zip(insufficient_indices.tolist(), insufficient_results):
+            all_results[i] = result
         
         return all_results
 
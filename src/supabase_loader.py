@@ -0,0 +1,294 @@
+"""
+Load bảng từ Supabase (PostgREST) theo trang, song song
+
+- Mỗi request chỉ lấy 1 khoảng dòng (header Range) nên không bị PostgREST cắt bớt
+  (giới hạn max-rows, mặc định 1000 dòng/response)
+- Trang đầu của mỗi bảng lấy kèm tổng số dòng (Prefer: count=exact), các trang còn lại
+  của tất cả các bảng chạy song song trên 1 thread pool nhỏ
+- Chỉ lấy các cột cần dùng (select=...), sắp xếp theo khóa để phân trang ổn định
+- Chỉ dùng thư viện chuẩn (urllib), base URL cấu hình được nên có thể chạy với
+  1 HTTP server giả lập ở local
+- load_tables_cached: dùng cache trên đĩa (table_cache), chỉ tải lại bảng đã thay đổi
+  (probe: số dòng + giá trị lớn nhất của 1 cột id, + updated_at lớn nhất nếu bảng có cột này).
+  Số dòng + id lớn nhất chỉ thấy dòng thêm / xóa; UPDATE tại chỗ chỉ thấy qua updated_at,
+  bảng không có updated_at được tải lại khi entry quá TABLE_CACHE_MAX_AGE
+"""
+
+import os
+import json
+import hashlib
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv('SUPABASE_URL', '')
+SUPABASE_KEY = os.getenv('SUPABASE_KEY', '')
+
+# Số dòng mỗi trang (không lớn hơn max-rows của PostgREST)
+SUPABASE_PAGE_SIZE = int(os.getenv('SUPABASE_PAGE_SIZE', '1000'))
+
+# Số request chạy song song
+SUPABASE_LOAD_WORKERS = int(os.getenv('SUPABASE_LOAD_WORKERS', '4'))
+
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', '30'))
+
+# Bảng -> (cột cần lấy, thứ tự sắp xếp để phân trang ổn định)
+SUPABASE_TABLES = {
+    'students': (
+        ('student_id', 'name', 'class'),
+        ('student_id',),
+    ),
+    'student_csv_data': (
+        ('student_id', 'midterm_score', 'final_score', 'homework_score', 'total_score',
+         'attendance_rate', 'study_hours_per_week', 'assignment_completion', 'behavior_score_100'),
+        ('student_id',),
+    ),
+    'course_scores': (
+        ('student_id', 'course_code', 'score'),
+        ('student_id', 'course_code'),
+    ),
+    'exercise_details': (
+        ('student_id', 'course_code', 'skill_code', 'score', 'completion_time', 'is_anomaly'),
+        ('student_id', 'course_code', 'skill_code', 'exercise_number'),
+    ),
+}
+
+# Bảng -> cột tăng dần dùng cho probe (số dòng + giá trị lớn nhất của cột này)
+SUPABASE_PROBE_COLUMNS = {
+    'students': 'student_id',
+    'student_csv_data': 'student_id',
+    'course_scores': 'id',
+    'exercise_details': 'id',
+}
+
+# Cột thời điểm cập nhật (được set khi UPDATE) dùng thêm cho probe, để trống để tắt.
+# Bảng không có cột này được phát hiện ở lần probe đầu (PostgREST trả 400) và bỏ qua
+SUPABASE_UPDATED_AT_COLUMN = os.getenv('SUPABASE_UPDATED_AT_COLUMN', 'updated_at')
+
+_tables_without_updated_at = set()
+
+
+class SupabaseLoadError(Exception):
+    """Không load được đầy đủ 1 bảng từ Supabase"""
+
+
+def _parse_total(content_range):
+    """Tổng số dòng từ header Content-Range ('0-999/15234', '*/0'), None nếu không có"""
+    if not content_range or '/' not in content_range:
+        return None
+    total = content_range.rsplit('/', 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+def fetch_page(table, columns, order, start, end, count=False,
+               base_url=None, api_key=None, timeout=None):
+    """
+    Lấy các dòng [start, end] của 1 bảng
+
+    Returns:
+        (list dòng, tổng số dòng của bảng hoặc None nếu không yêu cầu count)
+    """
+    base_url = (base_url or SUPABASE_URL).rstrip('/')
+    api_key = api_key if api_key is not None else SUPABASE_KEY
+    query = urllib.parse.urlencode({
+        'select': ','.join(columns),
+        'order': ','.join(f'{c}.asc' for c in order),
+    }, safe=',.')
+    headers = {
+        'apikey': api_key,
+        'Authorization': f'Bearer {api_key}',
+        'Accept': 'application/json',
+        'Range-Unit': 'items',
+        'Range': f'{start}-{end}',
+    }
+    if count:
+        headers['Prefer'] = 'count=exact'
+
+    request = urllib.request.Request(f'{base_url}/rest/v1/{table}?{query}', headers=headers)
+    with urllib.request.urlopen(request, timeout=timeout or SUPABASE_TIMEOUT) as response:
+        rows = json.loads(response.read().decode('utf-8'))
+        total = _parse_total(response.headers.get('Content-Range')) if count else None
+    return rows, total
+
+
+def load_tables(tables=None, page_size=None, workers=None, base_url=None, api_key=None):
+    """
+    Load nhiều bảng theo trang, song song giữa các bảng và các trang
+
+    Args:
+        tables: dict bảng -> (cột, thứ tự) (mặc định SUPABASE_TABLES)
+        page_size: Số dòng mỗi trang (mặc định SUPABASE_PAGE_SIZE)
+        workers: Số request song song (mặc định SUPABASE_LOAD_WORKERS)
+        base_url, api_key: Mặc định SUPABASE_URL / SUPABASE_KEY
+
+    Returns:
+        dict bảng -> list dòng (đúng thứ tự sắp xếp)
+
+    Raises:
+        SupabaseLoadError: nếu số dòng nhận được khác tổng số dòng của bảng
+    """
+    tables = tables or SUPABASE_TABLES
+    page_size = page_size or SUPABASE_PAGE_SIZE
+    workers = max(1, workers or SUPABASE_LOAD_WORKERS)
+    start_time = time.perf_counter()
+
+    def fetch(table, start, count=False, size=page_size):
+        columns, order = tables[table]
+        return fetch_page(table, columns, order, start, start + size - 1, count=count,
+                          base_url=base_url, api_key=api_key)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Trang đầu của mỗi bảng (kèm tổng số dòng)
+        first_pages = {table: executor.submit(fetch, table, 0, True) for table in tables}
+        pages = {}
+        totals = {}
+        steps = {}
+        for table, future in first_pages.items():
+            rows, total = future.result()
+            pages[table] = [rows]
+            totals[table] = total if total is not None else len(rows)
+            # Server trả ít hơn page_size (max-rows nhỏ hơn) -> phân trang theo số dòng thực nhận
+            steps[table] = len(rows) if 0 < len(rows) < min(page_size, totals[table]) else page_size
+
+        # Các trang còn lại của tất cả các bảng
+        rest = {
+            table: [executor.submit(fetch, table, start, size=steps[table])
+                    for start in range(steps[table], totals[table], steps[table])]
+            for table in tables
+        }
+        for table, futures in rest.items():
+            pages[table] += [future.result()[0] for future in futures]
+
+    result = {}
+    for table, table_pages in pages.items():
+        rows = [row for page in table_pages for row in page]
+        if len(rows) != totals[table]:
+            raise SupabaseLoadError(
+                f"{table}: nhận {len(rows)}/{totals[table]} dòng (dữ liệu thay đổi trong lúc load?)"
+            )
+        result[table] = rows
+
+    print(f"✓ Load {sum(len(r) for r in result.values())} dòng từ {len(result)} bảng Supabase "
+          f"({time.perf_counter() - start_time:.2f}s)")
+    return result
+
+
+def _fetch_max(table, column, count=False, base_url=None, api_key=None, timeout=None):
+    """
+    Giá trị lớn nhất của column (1 request trả về tối đa 1 dòng)
+
+    Returns:
+        (giá trị lớn nhất hoặc None, tổng số dòng hoặc None nếu không yêu cầu count)
+    """
+    base_url = (base_url or SUPABASE_URL).rstrip('/')
+    api_key = api_key if api_key is not None else SUPABASE_KEY
+    query = urllib.parse.urlencode({'select': column, 'order': f'{column}.desc.nullslast'}, safe=',.')
+    headers = {
+        'apikey': api_key,
+        'Authorization': f'Bearer {api_key}',
+        'Accept': 'application/json',
+        'Range-Unit': 'items',
+        'Range': '0-0',
+    }
+    if count:
+        headers['Prefer'] = 'count=exact'
+    request = urllib.request.Request(f'{base_url}/rest/v1/{table}?{query}', headers=headers)
+    with urllib.request.urlopen(request, timeout=timeout or SUPABASE_TIMEOUT) as response:
+        rows = json.loads(response.read().decode('utf-8'))
+        total = _parse_total(response.headers.get('Content-Range')) if count else None
+    return (rows[0][column] if rows else None), total
+
+
+def probe_table(table, column, updated_column=None, base_url=None, api_key=None, timeout=None):
+    """
+    Probe rẻ để biết bảng có thay đổi không
+
+    Số dòng + giá trị lớn nhất của column chỉ thấy dòng thêm / xóa. Nếu bảng có updated_column
+    thì lấy thêm giá trị lớn nhất của cột đó (thấy cả UPDATE tại chỗ)
+
+    Args:
+        updated_column: Cột thời điểm cập nhật (mặc định SUPABASE_UPDATED_AT_COLUMN, '' = bỏ qua)
+
+    Returns:
+        [tổng số dòng, giá trị lớn nhất của column(, giá trị lớn nhất của updated_column)]
+    """
+    max_id, total = _fetch_max(table, column, count=True,
+                               base_url=base_url, api_key=api_key, timeout=timeout)
+    probe = [total, max_id]
+
+    updated_column = SUPABASE_UPDATED_AT_COLUMN if updated_column is None else updated_column
+    if updated_column and table not in _tables_without_updated_at:
+        try:
+            max_updated, _ = _fetch_max(table, updated_column,
+                                        base_url=base_url, api_key=api_key, timeout=timeout)
+            probe.append(max_updated)
+        except urllib.error.HTTPError as e:
+            # 400: bảng không có cột updated_column
+            if e.code != 400:
+                raise
+            _tables_without_updated_at.add(table)
+    return probe
+
+
+def _cache_key(table, columns, order, base_url):
+    """Khóa cache của 1 bảng: đổi nguồn hoặc đổi cột cần lấy -> entry khác"""
+    spec = json.dumps([base_url, list(columns), list(order)])
+    return f"supabase-{table}-{hashlib.sha1(spec.encode('utf-8')).hexdigest()[:12]}"
+
+
+def load_tables_cached(tables=None, cache=None, page_size=None, workers=None, base_url=None, api_key=None):
+    """
+    Như load_tables nhưng dùng cache trên đĩa cho từng bảng
+
+    - Entry còn hạn TTL: dùng luôn, không gọi Supabase
+    - Entry hết hạn / chưa có: probe bảng (số dòng + id lớn nhất + updated_at lớn nhất nếu có);
+      probe không đổi thì dùng entry cũ, ngược lại tải lại (các bảng cần tải được tải song song
+      như load_tables)
+    - Entry tải quá TABLE_CACHE_MAX_AGE: luôn tải lại (bảng không có updated_at thì UPDATE
+      tại chỗ chỉ được thấy sau thời gian này)
+
+    Args:
+        cache: TableCache (mặc định TableCache() với TABLE_CACHE_DIR)
+
+    Returns:
+        dict bảng -> list dòng
+    """
+    from table_cache import TableCache
+
+    tables = tables or SUPABASE_TABLES
+    cache = cache or TableCache()
+    source = (base_url or SUPABASE_URL).rstrip('/')
+    start_time = time.perf_counter()
+
+    result, probes, stale = {}, {}, {}
+    for table, (columns, order) in tables.items():
+        key = _cache_key(table, columns, order, source)
+        if not cache.fresh(key):
+            column = SUPABASE_PROBE_COLUMNS.get(table, order[0])
+            try:
+                probes[table] = probe_table(table, column, base_url=base_url, api_key=api_key)
+            except Exception as e:
+                print(f"⚠️ Không probe được bảng {table}: {e}")
+                probes[table] = None
+        rows = cache.get(key, probes.get(table))
+        if rows is None:
+            stale[table] = (columns, order)
+        else:
+            result[table] = rows
+
+    if stale:
+        loaded = load_tables(stale, page_size=page_size, workers=workers, base_url=base_url, api_key=api_key)
+        for table, rows in loaded.items():
+            columns, order = stale[table]
+            cache.put(_cache_key(table, columns, order, source), rows, columns,
+                      probe=probes.get(table), table=table)
+            result[table] = rows
+
+    print(f"✓ {len(tables) - len(stale)}/{len(tables)} bảng Supabase lấy từ cache "
+          f"({time.perf_counter() - start_time:.2f}s)")
+    return {table: result[table] for table in tables}
@@ -0,0 +1,222 @@
+"""
+Cache trên đĩa cho các bảng tải từ nguồn từ xa (Supabase)
+
+Mỗi bảng tải về là 1 entry trong thư mục cache:
+- <key>.npz: các cột của bảng (nén). Cột số/bool không có giá trị thiếu lưu bằng mảng
+  NumPy, các cột khác lưu dạng JSON UTF-8 (uint8)
+- index.json: thông tin các entry (bảng, số dòng, kích thước, thời điểm tải, lần gia hạn cuối,
+  lần dùng cuối, giá trị probe của nguồn lúc tải)
+
+- Entry còn hạn (TABLE_CACHE_TTL giây) được dùng ngay, không gọi nguồn
+- Entry hết hạn được dùng tiếp nếu probe rẻ của nguồn (vd: số dòng + id lớn nhất) không đổi,
+  khi đó hạn được gia hạn; ngược lại người gọi tải lại và put() entry mới
+- Probe số dòng + id lớn nhất chỉ thấy dòng thêm / xóa, không thấy UPDATE tại chỗ: entry
+  tải quá TABLE_CACHE_MAX_AGE giây luôn bị tải lại, dù probe không đổi
+- Tổng kích thước vượt TABLE_CACHE_MAX_MB -> xóa entry dùng lâu nhất (LRU)
+"""
+
+import os
+import json
+import threading
+import time
+
+import numpy as np
+
+# Thư mục cache (mặc định: <project>/cache/tables), để trống để tắt cache
+TABLE_CACHE_DIR = os.getenv(
+    "TABLE_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'tables')
+)
+
+# Thời gian dùng entry mà không kiểm tra nguồn (giây)
+TABLE_CACHE_TTL = float(os.getenv("TABLE_CACHE_TTL", "3600"))
+
+# Tuổi tối đa của entry kể từ lần tải (giây): quá tuổi thì tải lại dù probe không đổi
+# (giới hạn thời gian bỏ sót UPDATE tại chỗ), 0 = không giới hạn
+TABLE_CACHE_MAX_AGE = float(os.getenv("TABLE_CACHE_MAX_AGE", "86400"))
+
+# Tổng dung lượng tối đa của cache (MB)
+TABLE_CACHE_MAX_MB = float(os.getenv("TABLE_CACHE_MAX_MB", "256"))
+
+
+def _encode_column(values):
+    """Mảng NumPy cho 1 cột: kiểu gốc nếu toàn bool/int/float, ngược lại JSON UTF-8"""
+    for kind, dtype in ((bool, np.bool_), (int, np.int64), (float, np.float64)):
+        if values and all(type(v) is kind for v in values):
+            return dtype.__name__, np.asarray(values, dtype=dtype)
+    data = json.dumps(values, ensure_ascii=False).encode("utf-8")
+    return "json", np.frombuffer(data, dtype=np.uint8)
+
+
+def _decode_column(kind, array):
+    if kind == "json":
+        return json.loads(array.tobytes().decode("utf-8"))
+    return array.tolist()
+
+
+def _normalize_probe(probe):
+    """Giá trị probe sau khi qua JSON (tuple -> list) để so sánh với giá trị đã lưu"""
+    return json.loads(json.dumps(probe, default=str))
+
+
+class TableCache:
+    """Cache bảng trên đĩa với TTL, tuổi tối đa, giới hạn dung lượng và xóa theo LRU"""
+
+    def __init__(self, directory=None, ttl=None, max_mb=None, max_age=None):
+        self.directory = directory or TABLE_CACHE_DIR
+        self.ttl = TABLE_CACHE_TTL if ttl is None else ttl
+        self.max_age = TABLE_CACHE_MAX_AGE if max_age is None else max_age
+        self.max_bytes = int((TABLE_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = self._read_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.directory, "index.json"), encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Bỏ các entry mất file dữ liệu
+        return {key: entry for key, entry in index.items() if os.path.exists(self._path(key))}
+
+    def _write_index(self):
+        path = os.path.join(self.directory, "index.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def _drop(self, key):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def fresh(self, key):
+        """True nếu có entry key và entry còn hạn TTL"""
+        entry = self._index.get(key)
+        return (entry is not None and not self.expired(key)
+                and time.time() - entry["fetched_at"] <= self.ttl)
+
+    def expired(self, key):
+        """True nếu entry key đã tải quá max_age giây (không được gia hạn nữa)"""
+        entry = self._index.get(key)
+        if entry is None or not self.max_age:
+            return False
+        return time.time() - entry.get("loaded_at", entry["fetched_at"]) > self.max_age
+
+    def get(self, key, probe=None):
+        """
+        Đọc entry key nếu còn hạn, hoặc hết hạn nhưng probe của nguồn không đổi
+        (khi đó gia hạn entry, tối đa đến max_age kể từ lần tải)
+
+        Args:
+            probe: Giá trị probe hiện tại của nguồn (None = không kiểm tra được)
+
+        Returns:
+            list dòng (dict), hoặc None nếu không có / đã cũ / đọc lỗi
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or self.expired(key):
+                return None
+            renew = False
+            if not self.fresh(key):
+                if probe is None or _normalize_probe(probe) != entry.get("probe"):
+                    return None
+                renew = True
+
+            try:
+                with np.load(self._path(key)) as data:
+                    columns = [(name, _decode_column(kind, data[name])) for name, kind in entry["columns"]]
+            except Exception as e:
+                print(f"⚠️ Entry cache {key} hỏng, bỏ qua: {e}")
+                self._drop(key)
+                self._write_index()
+                return None
+
+            now = time.time()
+            entry["last_used"] = now
+            if renew:
+                entry["fetched_at"] = now
+            self._write_index()
+
+        if not entry["rows"]:
+            return []
+        names = [name for name, _ in columns]
+        return [dict(zip(names, values)) for values in zip(*(values for _, values in columns))]
+
+    def put(self, key, rows, columns, probe=None, table=None):
+        """
+        Ghi entry key (ghi file tạm rồi đổi tên), sau đó xóa LRU nếu vượt dung lượng
+
+        Args:
+            rows: list dòng (dict)
+            columns: Tên các cột cần lưu (theo thứ tự)
+            probe: Giá trị probe của nguồn lúc tải (đọc trước khi tải)
+            table: Tên bảng (chỉ để hiển thị trong index.json)
+        """
+        encoded = {}
+        kinds = []
+        for name in columns:
+            kind, array = _encode_column([row.get(name) for row in rows])
+            encoded[name] = array
+            kinds.append([name, kind])
+
+        with self._lock:
+            tmp_path = self._path(f"{key}.tmp")
+            try:
+                with open(tmp_path, "wb") as f:
+                    np.savez_compressed(f, **encoded)
+                os.replace(tmp_path, self._path(key))
+            except OSError as e:
+                print(f"⚠️ Không ghi được cache {key}: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return False
+
+            now = time.time()
+            self._index[key] = {
+                "table": table,
+                "rows": len(rows),
+                "columns": kinds,
+                "size": os.path.getsize(self._path(key)),
+                "loaded_at": now,
+                "fetched_at": now,
+                "last_used": now,
+                "probe": _normalize_probe(probe),
+            }
+            self._evict()
+            self._write_index()
+        return True
+
+    def _evict(self):
+        """Xóa entry dùng lâu nhất cho đến khi tổng dung lượng <= max_bytes"""
+        total = sum(entry["size"] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._index[key]["size"]
+            self._drop(key)
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            for key in list(self._index):
+                self._drop(key)
+            self._write_index()
+
+    def stats(self):
+        """Số entry và tổng dung lượng (byte)"""
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "size": sum(entry["size"] for entry in self._index.values()),
+                "max_size": self.max_bytes,
+            }